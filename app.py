@@ -12,6 +12,8 @@ from app.components.header import header
 from app.components.fetch_data_modal import fetch_data_modal
 from app.utils.background_callback import callback
 from app.utils.wrmxpress_gui_obj import WrmXpressGui
+from app.utils.tile_pyramid import register_tile_routes
+from app.utils.run_stream import register_run_stream_routes
 
 # Diskcache
 import diskcache
@@ -28,6 +30,12 @@ app = Dash(
     suppress_callback_exceptions=True,
 )
 
+# Serve image pyramid tiles for the tiled viewer, see tile_pyramid.py
+register_tile_routes(app.server)
+
+# Push run progress to the run page as Server-Sent Events, see run_stream.py
+register_run_stream_routes(app.server)
+
 # In[2]: App Layout
 
 sidebar = html.Div(
@@ -135,11 +143,12 @@ app.layout = html.Div(
     progress=[
         Output("progress-bar-run-page", "value"),
         Output("progress-bar-run-page", "max"),
-        Output("image-analysis-preview", "figure"),
+        # Log lines and preview figure as deltas, merged clientside (see run_progress.py)
+        Output("run-progress-update", "data"),
         Output("progress-message-run-page-for-analysis", "children"),
-        Output("progress-message-run-page-markdown", "children"),
         Output("first-view-of-analysis-alert", "is_open"),
         Output("before-first-view-of-analysis-alert", "is_open"),
+        Output("plate-montage-update", "data"),
     ],
     prevent_initial_call=True,
     allow_duplicate=True,
@@ -226,7 +235,7 @@ def background_callback(set_progress, n_clicks, store_data):
             well_selection_list=store_data["wrmXpress_gui_obj"]["well_selection_list"],
         )
 
-        error_occured, _, _, _ = wrmXpress_gui_obj.validate()
+        error_occured, _, _, _ = wrmXpress_gui_obj.validate(preflight=True)
 
         if error_occured:
 
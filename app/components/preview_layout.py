@@ -7,6 +7,12 @@
 import dash_bootstrap_components as dbc
 from dash import dcc, html
 from app.utils.styling import layout, clear_alert_style
+from app.utils.composite import (
+    CHANNEL_COLORS,
+    DEFAULT_CHANNEL_COLORS,
+    DEFAULT_CHANNEL_GAIN,
+    COMPOSITE_MAX_CHANNELS,
+)
 
 ########################################################################
 ####                                                                ####
@@ -113,6 +119,23 @@ preview_layout = dbc.ModalBody(
                                                             color="#3b4d61",  # Color of the loading element (wrmXpress) blue
                                                             style={"padding": "0px"},
                                                         ),
+                                                        html.Div(
+                                                            # Frame slider for AVI inputs
+                                                            id="input-preview-frame-div",
+                                                            children=[
+                                                                dcc.Slider(
+                                                                    id="input-preview-frame",
+                                                                    min=0,
+                                                                    max=0,
+                                                                    step=1,
+                                                                    value=0,
+                                                                    marks=None,
+                                                                    tooltip={"placement": "bottom"},
+                                                                    updatemode="drag",
+                                                                ),
+                                                            ],
+                                                            style={"display": "none"},
+                                                        ),
                                                     ],
                                                     style={"padding": "0px"},
                                                 ),
@@ -300,6 +323,48 @@ preview_layout = dbc.ModalBody(
                                                 "margin-top": "10px",
                                             },
                                         ),
+                                        html.Div(
+                                            # Colour and gain of each channel of the composite view
+                                            id="composite-controls",
+                                            children=[
+                                                dbc.Row(
+                                                    [
+                                                        dbc.Col(
+                                                            html.H6(
+                                                                f"w{channel}",
+                                                                className="card-subtitle",
+                                                                style={"margin-top": "7px"},
+                                                            ),
+                                                            width=2,
+                                                        ),
+                                                        dbc.Col(
+                                                            dcc.Dropdown(
+                                                                id=f"composite-color-w{channel}",
+                                                                options=list(CHANNEL_COLORS),
+                                                                value=DEFAULT_CHANNEL_COLORS[channel - 1],
+                                                                clearable=False,
+                                                            ),
+                                                            width=4,
+                                                        ),
+                                                        dbc.Col(
+                                                            dcc.Slider(
+                                                                id=f"composite-gain-w{channel}",
+                                                                min=0,
+                                                                max=3,
+                                                                step=0.1,
+                                                                value=DEFAULT_CHANNEL_GAIN,
+                                                                marks={0: "0", 1: "1", 2: "2", 3: "3"},
+                                                                updatemode="mouseup",
+                                                            ),
+                                                            width=6,
+                                                        ),
+                                                    ],
+                                                    style={"margin-bottom": "10px"},
+                                                )
+                                                for channel in range(1, COMPOSITE_MAX_CHANNELS + 1)
+                                            ],
+                                            style={"display": "none"},
+                                        ),
                                     ]
                                 ),
                                 style={"height": "99%"},
@@ -108,6 +108,11 @@ run_layout = dbc.ModalBody(
                                         ),
                                         dbc.Row(
                                             [
+                                                # Progress deltas from the running analysis and what has been merged so far
+                                                dcc.Store(id="run-progress-update"),
+                                                dcc.Store(id="run-progress-state"),
+                                                # Run whose progress is pushed over Server-Sent Events
+                                                dcc.Store(id="run-progress-stream"),
                                                 html.Div(
                                                     # Progress message for analysis
                                                     id="progress-message-run-page",
@@ -136,6 +141,26 @@ run_layout = dbc.ModalBody(
                                                 "margin-top": "10px",
                                             },
                                         ),
+                                        dbc.Row(
+                                            [
+                                                # Changed wells pushed by the running analysis, see plate_montage.py
+                                                dcc.Store(id="plate-montage-update"),
+                                                dcc.Graph(
+                                                    # Plate overview, filled in as wells finish
+                                                    id="plate-montage",
+                                                    figure={"layout": layout},
+                                                    config={"displayModeBar": False},
+                                                    style={
+                                                        "padding": "0px",
+                                                        "width": "100%",
+                                                    },
+                                                ),
+                                            ],
+                                            style={
+                                                "margin-bottom": "10px",
+                                                "margin-top": "10px",
+                                            },
+                                        ),
                                     ]
                                 ),
                                 style={"height": "99%"},
@@ -196,6 +221,37 @@ run_layout = dbc.ModalBody(
                                                 "margin-top": "10px",
                                             },
                                         ),
+                                        dbc.Row(
+                                            [
+                                                dbc.Col(
+                                                    html.H6(
+                                                        # Contrast
+                                                        "Contrast (percentiles):",
+                                                        className="card-subtitle",
+                                                        style={"margin-top": "7px"},
+                                                    ),
+                                                    width=4,
+                                                ),
+                                                dbc.Col(
+                                                    dcc.RangeSlider(
+                                                        # Display window of the analysis image
+                                                        id="analysis-contrast",
+                                                        min=0,
+                                                        max=100,
+                                                        step=0.1,
+                                                        value=[0.1, 99.9],
+                                                        marks={0: "0", 50: "50", 100: "100"},
+                                                        tooltip={"placement": "bottom"},
+                                                        updatemode="mouseup",
+                                                    ),
+                                                    width=8,
+                                                ),
+                                            ],
+                                            style={
+                                                "margin-bottom": "10px",
+                                                "margin-top": "10px",
+                                            },
+                                        ),
                                         dbc.Row(
                                             [
                                                 dbc.Row(
@@ -254,12 +310,6 @@ run_layout = dbc.ModalBody(
                                         ),
                                         dbc.Row(
                                             [
-                                                # Invisible interval to force loading
-                                                dcc.Interval(
-                                                    id="loading-interval",
-                                                    interval=500,
-                                                    n_intervals=0,
-                                                ),
                                                 dbc.Alert(
                                                     id="before-first-view-of-analysis-alert",
                                                     color="light",
@@ -268,27 +318,21 @@ run_layout = dbc.ModalBody(
                                                         dcc.Loading(
                                                             id="before-first-loading-img-run-analysis",
                                                             type="cube",
+                                                            # Always spinning while the alert is open
+                                                            display="show",
                                                             color="#3b4d61",
                                                             children=[
-                                                                html.Div(
-                                                                    [
-                                                                        dcc.Graph(
-                                                                            # Image analysis preview
-                                                                            id="image-analysis-preview",
-                                                                            figure={
-                                                                                "layout": layout
-                                                                            },
-                                                                            style={
-                                                                                "padding": "0px",
-                                                                                "height": "100%",
-                                                                                "width": "100%",
-                                                                            },
-                                                                        ),
-                                                                    ],
-                                                                    id = "force-loading-output",
+                                                                dcc.Graph(
+                                                                    # Image analysis preview
+                                                                    id="image-analysis-preview",
+                                                                    figure={"layout": layout},
+                                                                    style={
+                                                                        "padding": "0px",
+                                                                        "height": "100%",
+                                                                        "width": "100%",
+                                                                    },
                                                                 ),
-                                                                    ],
-
+                                                            ],
                                                             style={"padding": "0px"},
                                                         ),
                                                     ],
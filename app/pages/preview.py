@@ -1,7 +1,7 @@
 # In[1]: Imports
 
 import dash
-from dash import callback, Input, Output, State
+from dash import callback, clientside_callback, ClientsideFunction, Input, Output, State
 import time
 from pathlib import Path
 import os
@@ -9,6 +9,13 @@ import os
 # importing utils
 from app.utils.callback_functions import create_figure_from_filepath, wait_for_file
 from app.utils.preview_callback_functions import preview_callback_functions
+from app.utils.tile_pyramid import use_tiled_viewer, create_tiled_figure
+from app.utils.avi_reader import find_avi_source, get_avi_reader
+from app.utils.composite import (
+    COMPOSITE_MAX_CHANNELS,
+    create_composite_figure,
+    find_channel_files,
+)
 from app.components.preview_layout import preview_layout
 from app.utils.wrmxpress_gui_obj import WrmXpressGui
 
@@ -84,6 +91,12 @@ def update_analysis_preview_image(selection, nclicks, store):
             return None, True, False, False, False, True, False, f"```{str(e)}```"
 
         if nclicks:
+            if selection == "composite":
+                fig, channel_paths = create_well_composite(store)
+                if fig is None:
+                    return None, True, False, False, False, True, True, "```No channel images found```"
+                paths_message = "\n".join(str(path) for path in channel_paths)
+                return fig, False, True, False, "", False, True, f"```{paths_message}```"
             if selection == 'straightened_worms':
                 img_path = Path(
                     f"{volume}/output/cellprofiler/img/{plate_base}_{wells[0]}_{wavelength}.tiff")
@@ -93,7 +106,11 @@ def update_analysis_preview_image(selection, nclicks, store):
                     )
             if os.path.exists(img_path):
                 scale = "inferno" if selection == "optical_flow" else "gray"
-                fig = create_figure_from_filepath(img_path, scale=scale)
+                # Large outputs (e.g. straightened worms) open in the tiled viewer
+                if use_tiled_viewer(img_path):
+                    fig = create_tiled_figure(img_path, "analysis-preview-other-img", scale)
+                else:
+                    fig = create_figure_from_filepath(img_path, scale=scale)
                 return (
                     fig,
                     False,
@@ -111,17 +128,94 @@ def update_analysis_preview_image(selection, nclicks, store):
         return None, True, False, False, False, True, False, f"```{str(e)}```"
 
 
+def create_well_composite(store, colors=None, gains=None):
+    """
+    This function creates the multi-wavelength composite of the first selected well
+    from the raw input images. Returns the figure (or None) and the channel paths.
+    """
+    gui_obj = store["wrmXpress_gui_obj"]
+    platename = gui_obj["plate_name"]
+    plate_base = platename.split("_", 1)[0]
+    first_well = gui_obj["well_selection_list"][0].replace(", ", "")
+
+    channels = find_channel_files(
+        Path(gui_obj["mounted_volume"], platename, "TimePoint_1"), plate_base, first_well
+    )
+    channel_paths = list(channels.values())
+    return create_composite_figure(channel_paths, colors, gains), channel_paths
+
+
+@callback(
+    output=Output("analysis-preview-other-img", "figure", allow_duplicate=True),
+    inputs=dict(
+        colors=[
+            Input(f"composite-color-w{channel}", "value")
+            for channel in range(1, COMPOSITE_MAX_CHANNELS + 1)
+        ],
+        gains=[
+            Input(f"composite-gain-w{channel}", "value")
+            for channel in range(1, COMPOSITE_MAX_CHANNELS + 1)
+        ],
+    ),
+    state=dict(
+        selection=State("preview-dropdown", "value"),
+        store=State("store", "data"),
+    ),
+    prevent_initial_call=True,
+)
+def update_composite_channels(colors, gains, selection, store):
+    """
+    This function re-blends the composite when a channel colour or gain changes.
+    Channels and their lookup tables are cached, so only the blend is redone.
+    """
+    if selection != "composite" or not store:
+        return dash.no_update
+    try:
+        fig, _ = create_well_composite(store, colors, gains)
+    except Exception as e:
+        print(f"Error creating composite: {e}")
+        return dash.no_update
+    return fig if fig is not None else dash.no_update
+
+
+@callback(
+    Output("composite-controls", "style"),
+    Input("preview-dropdown", "value"),
+)
+def toggle_composite_controls(selection):
+    """
+    This function shows the channel controls when the composite view is selected.
+    """
+    return {"display": "block"} if selection == "composite" else {"display": "none"}
+
+
+# Load the tiles in view whenever the tiled viewer is zoomed or panned
+clientside_callback(
+    ClientsideFunction(namespace="tiles", function_name="update_tiles"),
+    Output("analysis-preview-other-img", "figure", allow_duplicate=True),
+    Input("analysis-preview-other-img", "relayoutData"),
+    State("analysis-preview-other-img", "figure"),
+    prevent_initial_call=True,
+)
+
+
 @callback(
     Output("input-path-output", "children"),
     Output("input-preview", "figure"),
+    Output("input-preview-frame", "max"),
+    Output("input-preview-frame", "value"),
+    Output("input-preview-frame-div", "style"),
     Input("submit-val", "n_clicks"),
     State("store", "data"),
     prevent_initial_call=True,
 )
 def update_preview_image(n_clicks, store):
     """
-    This function updates the input preview image
+    This function updates the input preview image.
+    AVI inputs are decoded directly and get a frame slider.
     """
+    hidden_slider = (0, 0, {"display": "none"})
+
     # Obtaining the store data
     wells = store["wrmXpress_gui_obj"]["well_selection_list"]  # Get the wells
     first_well = wells[0].replace(", ", "")  # Get the first well
@@ -130,7 +224,7 @@ def update_preview_image(n_clicks, store):
     try:
         plate_base = platename.split("_", 1)[0]  # Get the plate base
     except Exception as e:
-        return "```Please finish setting up the configuration```", {}
+        return "```Please finish setting up the configuration```", {}, *hidden_slider
 
     volume = store["wrmXpress_gui_obj"]["mounted_volume"]  # Get the volume
     file_structure = store["wrmXpress_gui_obj"][
@@ -149,7 +243,7 @@ def update_preview_image(n_clicks, store):
             if os.path.exists(img_path) or wait_for_file(img_path, interval=15):
                 # Open the image and create a figure
                 fig = create_figure_from_filepath(img_path)
-                return f"```{img_path}```", fig  # Return the path and the figure
+                return f"```{img_path}```", fig, *hidden_slider  # Return the path and the figure
 
             else:  # checking for other file extensions
                 # img_path_s1 = Path(
@@ -165,28 +259,68 @@ def update_preview_image(n_clicks, store):
                 if os.path.exists(img_path_w1) or wait_for_file(img_path_w1):
                     # Open the image and create a figure
                     fig = create_figure_from_filepath(img_path_w1)
-                    return f"```{img_path_w1}```", fig
+                    return f"```{img_path_w1}```", fig, *hidden_slider
 
         elif file_structure == "avi":
             # assumes AVI-like file structure
             # TODO: this shows the entire AVI; if cropping is selected, it won't show the cropped well
+            # Decode the source AVI directly instead of waiting for wrmXpress to extract frames
+            avi_path = find_avi_source(volume, platename, first_well)
+            if avi_path:
+                try:
+                    reader = get_avi_reader(avi_path)
+                    fig = reader.create_figure(0)
+                    if fig is not None:
+                        return (
+                            f"```{avi_path}```",
+                            fig,
+                            max(reader.frame_count - 1, 0),
+                            0,
+                            {"display": "block"},
+                        )
+                except Exception as e:
+                    print(f"Error reading {avi_path}: {e}")
+
+            # Fall back on the frame extracted by wrmXpress, if it is already there
             img_path = Path(
                 volume, "input", f"{platename}/TimePoint_1/{platename}_{first_well}_w1.TIF"
             )
-
-            # Should try and figure out an alternative to this
-            # potential brick mechanism for the user
-            while not os.path.exists(img_path):
-                time.sleep(1)
-
             if os.path.exists(img_path):
                 # Open the image and create a figure
                 fig = create_figure_from_filepath(img_path)
-                return f"```{img_path}```", fig
+                return f"```{img_path}```", fig, *hidden_slider
 
     # Default return if no conditions are met
     print('img not found')
-    return "", {}
+    return "", {}, *hidden_slider
+
+
+@callback(
+    Output("input-preview", "figure", allow_duplicate=True),
+    Input("input-preview-frame", "value"),
+    State("store", "data"),
+    prevent_initial_call=True,
+)
+def update_preview_frame(frame, store):
+    """
+    This function shows the selected frame of the AVI input.
+    """
+    if not store or frame is None:
+        return dash.no_update
+
+    gui_obj = store["wrmXpress_gui_obj"]
+    if gui_obj["file_structure"] != "avi":
+        return dash.no_update
+
+    first_well = gui_obj["well_selection_list"][0].replace(", ", "")
+    avi_path = find_avi_source(
+        gui_obj["mounted_volume"], gui_obj["plate_name"], first_well
+    )
+    if not avi_path:
+        return dash.no_update
+
+    fig = get_avi_reader(avi_path).create_figure(frame)
+    return fig if fig is not None else dash.no_update
 
 
 @callback(
@@ -271,6 +405,9 @@ def get_options_preview(nclicks, store_data):
 
     if nclicks is not None:
         options = [{'label': key, 'value': value} for key, value in selection_dict.items()]
+        # All wavelengths of a well blended into one image
+        if wrmXpress_gui_obj.file_structure == "imagexpress":
+            options.append({"label": "composite", "value": "composite"})
         return options
     else:
         return {"raw": "raw"}
@@ -1,14 +1,15 @@
 # In[1]: Imports
 
-from dash import callback, Input, Output, State
+from dash import callback, clientside_callback, ClientsideFunction, Input, Output, State
 from pathlib import Path
 import os
 import dash
 from dash.long_callback import DiskcacheLongCallbackManager
-import time
 
 # importing utils
 from app.utils.callback_functions import send_ctrl_c, create_figure_from_filepath, construct_img_path
+from app.utils.tile_pyramid import use_tiled_viewer, create_tiled_figure
+from app.utils.contrast import DEFAULT_CONTRAST
 from app.components.run_layout import run_layout
 from app.utils.wrmxpress_gui_obj import WrmXpressGui
 
@@ -27,15 +28,6 @@ layout = run_layout
 # In[3]: Callbacks
 
 
-# Callback to keep updating the dummy component
-@callback(
-    Output("force-loading-output", "children"), Input("loading-interval", "n_intervals")
-)
-def keep_loading(n):
-    time.sleep(0.5)
-    return f""
-
-
 @callback(Output("cancel-analysis", "n_clicks"), Input("cancel-analysis", "n_clicks"))
 def cancel_analysis(n_clicks):
     """
@@ -64,13 +56,15 @@ def cancel_analysis(n_clicks):
     Output("run-page-file-paths-alert-update", "is_open"),
     State("analysis-dropdown", "value"),
     Input("load-analysis-img", "n_clicks"),
+    Input("analysis-contrast", "value"),
     State("store", "data"),
     allow_duplicate=True,
     # prevent_initial_call=True,
 )
-def load_analysis_img(selection, n_clicks, store_data):
+def load_analysis_img(selection, n_clicks, contrast, store_data):
     """
     Load and display the analysis image based on the user's selection.
+    Moving the contrast slider re-windows the cached image without re-reading it.
     """
     # print("selection", selection)
 
@@ -101,7 +95,13 @@ def load_analysis_img(selection, n_clicks, store_data):
         if img_path and img_path.exists():
             # print(f"Image path found: {img_path}")"
             scale = "inferno" if selection == "optical_flow" else "gray"
-            fig = create_figure_from_filepath(img_path, scale)
+            # Large outputs (e.g. straightened worms, static dx) open in the tiled viewer
+            if use_tiled_viewer(img_path):
+                fig = create_tiled_figure(img_path, "analysis-postview", scale)
+            else:
+                fig = create_figure_from_filepath(
+                    img_path, scale, contrast=contrast or DEFAULT_CONTRAST
+                )
             return (
                 fig,
                 f"```{str(img_path)}```",
@@ -120,6 +120,49 @@ def load_analysis_img(selection, n_clicks, store_data):
         return {}, "", True, False, True, True, True, False
 
 
+# Merge the new log lines and preview image of the running analysis
+clientside_callback(
+    ClientsideFunction(namespace="progress", function_name="merge_update"),
+    Output("run-progress-state", "data"),
+    Output("progress-message-run-page-markdown", "children", allow_duplicate=True),
+    Output("image-analysis-preview", "figure", allow_duplicate=True),
+    Input("run-progress-update", "data"),
+    State("run-progress-state", "data"),
+    prevent_initial_call=True,
+)
+
+
+# Open the progress stream of the running analysis (log lines and progress
+# events are pushed into run-progress-update as they come, see run_stream.py)
+clientside_callback(
+    ClientsideFunction(namespace="progress", function_name="open_stream"),
+    Output("run-progress-stream", "data"),
+    Input("run-progress-update", "data"),
+    State("run-progress-stream", "data"),
+    prevent_initial_call=True,
+)
+
+
+# Merge the wells reported by the running analysis into the plate montage
+clientside_callback(
+    ClientsideFunction(namespace="montage", function_name="merge_tiles"),
+    Output("plate-montage", "figure"),
+    Input("plate-montage-update", "data"),
+    State("plate-montage", "figure"),
+    prevent_initial_call=True,
+)
+
+
+# Load the tiles in view whenever the tiled viewer is zoomed or panned
+clientside_callback(
+    ClientsideFunction(namespace="tiles", function_name="update_tiles"),
+    Output("analysis-postview", "figure", allow_duplicate=True),
+    Input("analysis-postview", "relayoutData"),
+    State("analysis-postview", "figure"),
+    prevent_initial_call=True,
+)
+
+
 @callback(
     Output("analysis-dropdown", "options"),
     # update the option dropdown when the run analysis is clicked
@@ -0,0 +1,298 @@
+# In[1]: Imports
+
+import os
+import struct
+import bisect
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.utils.contrast import apply_window
+from app.utils.image_cache import ImageCache
+from app.utils.image_rendering import (
+    PREVIEW_DISPLAY_MAX_SIDE,
+    PREVIEW_RENDER_MODE,
+    PREVIEW_JPEG_QUALITY,
+    create_encoded_figure,
+    downsample_to_display,
+)
+
+# In[2]: Settings
+
+# Memory budget (in bytes) for decoded frames kept at display resolution
+AVI_FRAME_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Number of open video files kept per process
+MAX_OPEN_VIDEOS = 4
+
+# Frames further ahead than this are reached with a seek instead of decoding forward
+MAX_FORWARD_DECODE = 32
+
+# Largest channel difference (on a sample of pixels) still treated as grayscale,
+# to allow for chroma noise from lossy codecs
+GRAYSCALE_TOLERANCE = 8
+
+# idx1 entry flag of chunks that start a keyframe (AVIIF_KEYFRAME, from vfw.h)
+AVIIF_KEYFRAME = 0x10
+
+_open_videos = OrderedDict()
+_open_videos_lock = threading.Lock()
+
+# In[3]: AVI Frame Reader
+
+
+class AviFrameReader:
+    """
+    Random-access frame reader for a single AVI file.
+
+    The seek index (frame count, frame rate, dimensions, whether the container
+    supports accurate frame seeks and the keyframes listed in the AVI idx1
+    index) is built once when the file is opened. Frames close ahead of the
+    current position are reached by decoding forward; anything else is a direct
+    seek, or for containers that cannot seek accurately, a seek to the closest
+    keyframe before the frame and a forward decode from there (a rewind to the
+    first frame only if the file has no usable index). Decoded frames are kept
+    at display resolution in an LRU, so scrubbing back and forth only decodes
+    each frame once.
+    """
+
+    def __init__(self, avi_path, display_max_side=PREVIEW_DISPLAY_MAX_SIDE):
+        self.avi_path = Path(avi_path).resolve()
+        self.display_max_side = display_max_side
+        self.frames = ImageCache(max_bytes=AVI_FRAME_CACHE_MAX_BYTES)
+        self._lock = threading.Lock()
+
+        self._capture = cv2.VideoCapture(str(self.avi_path))
+        if not self._capture.isOpened():
+            raise IOError(f"Cannot open {self.avi_path}")
+
+        self.frame_count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS)
+        self.width = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.seekable = self._check_seekable()
+        self.keyframes = [] if self.seekable else read_avi_keyframes(self.avi_path)
+        self._position = 0
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _check_seekable(self):
+        """
+        Seek to the middle of the file and check the decoder actually lands there.
+        """
+        if self.frame_count < 2:
+            return True
+        target = self.frame_count // 2
+        if not self._capture.set(cv2.CAP_PROP_POS_FRAMES, target):
+            return False
+        return int(self._capture.get(cv2.CAP_PROP_POS_FRAMES)) == target
+
+    def keyframe_before(self, frame_index):
+        """
+        Return the last keyframe at or before `frame_index` (0 without an index).
+        """
+        position = bisect.bisect_right(self.keyframes, frame_index) - 1
+        return self.keyframes[position] if position >= 0 else 0
+
+    def _seek(self, frame_index):
+        """
+        Seek to `frame_index` and check the decoder lands there (the caller
+        holds the lock). Returns False if it did not.
+        """
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        self._position = int(self._capture.get(cv2.CAP_PROP_POS_FRAMES))
+        return self._position == frame_index
+
+    def _decode(self, frame_index):
+        """
+        Decode `frame_index` from the open capture (the caller holds the lock).
+        """
+        ahead = frame_index - self._position
+        if not 0 <= ahead <= MAX_FORWARD_DECODE:
+            if self.seekable:
+                self._seek(frame_index)
+            else:
+                keyframe = self.keyframe_before(frame_index)
+                # Decoding on from the current position is cheaper when it is
+                # already past that keyframe
+                if not keyframe <= self._position <= frame_index:
+                    if not self._seek(keyframe):
+                        self._seek(0)
+
+        # grab() skips frames without converting them to images
+        while self._position < frame_index:
+            if not self._capture.grab():
+                return None
+            self._position += 1
+
+        ok, frame = self._capture.read()
+        if not ok:
+            return None
+        self._position += 1
+        return frame
+
+    def read_frame(self, frame_index):
+        """
+        Return `frame_index` as a display-resolution array (2D for grayscale
+        video, RGB otherwise), or None if it cannot be decoded.
+        """
+        frame_index = min(max(int(frame_index), 0), max(self.frame_count - 1, 0))
+        with self._lock:
+            frame = self._decode(frame_index)
+        if frame is None:
+            return None
+
+        # Microscope AVIs are grayscale stored as 3 (near-)identical channels
+        if frame.ndim == 3 and is_grayscale(frame):
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        elif frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        frame, _ = downsample_to_display(frame, self.display_max_side)
+        return frame
+
+    def create_figure(
+        self,
+        frame_index,
+        scale="gray",
+        render=PREVIEW_RENDER_MODE,
+        quality=PREVIEW_JPEG_QUALITY,
+    ):
+        """
+        This function creates a figure for `frame_index`, reusing the cached
+        frame and figure if the frame was shown before.
+        """
+        frame_index = min(max(int(frame_index), 0), max(self.frame_count - 1, 0))
+        cache_key = (frame_index, scale, render, quality)
+        cached_fig = self.frames.get_figure(cache_key)
+        if cached_fig is not None:
+            return cached_fig
+
+        frame = self.read_frame(frame_index)
+        if frame is None:
+            return None
+
+        if frame.ndim == 2:
+            frame = apply_window(frame)
+        fig, _ = create_encoded_figure(
+            frame, scale=scale, render=render, quality=quality
+        )
+
+        # Axes are in display pixels; scale them back to the source frame
+        pixel_scale = self.width / frame.shape[1] if frame.shape[1] else 1.0
+        fig.update_traces(dx=pixel_scale, dy=pixel_scale)
+        fig.update_layout(
+            coloraxis_showscale=False,
+            margin=dict(l=0, r=0, t=0, b=0),
+            xaxis=dict(showticklabels=False),
+            yaxis=dict(showticklabels=False),
+            plot_bgcolor="white",
+            paper_bgcolor="white",
+        )
+
+        self.frames.put(cache_key, frame, fig)
+        return fig
+
+    def close(self):
+        with self._lock:
+            self._capture.release()
+
+
+# In[4]: Helper functions
+
+
+def is_grayscale(frame):
+    """
+    This function checks (on a strided sample) whether a BGR frame is grayscale.
+    """
+    sample = frame[::8, ::8].astype(np.int16)
+    return (
+        np.abs(sample[:, :, 0] - sample[:, :, 1]).max() <= GRAYSCALE_TOLERANCE
+        and np.abs(sample[:, :, 1] - sample[:, :, 2]).max() <= GRAYSCALE_TOLERANCE
+    )
+
+
+def read_avi_keyframes(avi_path):
+    """
+    This function reads the keyframes of the first video stream from the idx1
+    index of an AVI file (without decoding anything). Returns a sorted list of
+    frame indices, or [] if the file has no idx1 index (e.g. OpenDML files that
+    only have per-stream indexes) or cannot be parsed.
+    """
+    try:
+        with open(avi_path, "rb") as f:
+            riff, _, form = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or form != b"AVI ":
+                return []
+
+            # Walk the top-level chunks (skipping the movi data) up to idx1
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return []
+                chunk_id, size = struct.unpack("<4sI", header)
+                if chunk_id == b"idx1":
+                    index = f.read(size)
+                    break
+                f.seek(size + (size & 1), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return []
+
+    keyframes = []
+    video_stream = None
+    frame = 0
+    entries = struct.iter_unpack("<4sIII", index[: len(index) // 16 * 16])
+    for chunk_id, flags, _, _ in entries:
+        # Video chunks are "##dc" (compressed) or "##db" (uncompressed)
+        if chunk_id[2:] not in [b"dc", b"db"]:
+            continue
+        if video_stream is None:
+            video_stream = chunk_id[:2]
+        elif chunk_id[:2] != video_stream:
+            continue
+        if flags & AVIIF_KEYFRAME:
+            keyframes.append(frame)
+        frame += 1
+    return keyframes
+
+
+def get_avi_reader(avi_path):
+    """
+    This function returns the (shared) reader for `avi_path`, opening it and
+    building its seek index on first use. Readers are re-opened if the file changes.
+    """
+    stat = os.stat(avi_path)
+    key = (str(Path(avi_path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+    with _open_videos_lock:
+        if key in _open_videos:
+            _open_videos.move_to_end(key)
+            return _open_videos[key]
+
+    reader = AviFrameReader(avi_path)
+
+    with _open_videos_lock:
+        _open_videos[key] = reader
+        while len(_open_videos) > MAX_OPEN_VIDEOS:
+            _, evicted = _open_videos.popitem(last=False)
+            evicted.close()
+    return reader
+
+
+def find_avi_source(volume, platename, well):
+    """
+    This function locates the source AVI for a well: either one AVI for the whole
+    plate (`<plate>/<plate>.avi`) or one AVI per well (`<plate>/<plate>_<well>*.avi`).
+    Returns None if no AVI is found.
+    """
+    img_dir = Path(volume, platename)
+    plate_avi = Path(img_dir, f"{platename}.avi")
+    if plate_avi.exists():
+        return plate_avi
+
+    well_avis = sorted(img_dir.glob(f"{platename}_{well}*.[aA][vV][iI]"))
+    if well_avis:
+        return well_avis[0]
+    return None
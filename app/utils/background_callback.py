@@ -5,7 +5,6 @@ from pathlib import Path
 import os
 import subprocess
 import time
-import shlex
 import re
 import dash
 import plotly.graph_objects as go
@@ -15,8 +14,16 @@ from app.utils.callback_functions import (
     clean_and_create_directories,
     copy_files_to_input_directory,
     create_figure_from_filepath,
+    find_well_images,
 )
+from app.utils.plate_index import get_plate_index
 from app.utils.wrmxpress_gui_obj import WrmXpressGui
+from app.utils.plate_montage import create_plate_montage
+from app.utils.run_progress import ProgressPublisher, ProgressStream, RunLog
+from app.utils.run_events import RunEta, RunEventStream, WELL_STARTED, events_path
+from app.utils.run_stream import register_run
+from app.utils.wrmxpress_process import run_wrmxpress, wrmxpress_command
+from app.utils.run_lock import RunLock, RunLockError
 
 # In[2]: Main Callback Function
 
@@ -43,7 +50,10 @@ def callback(set_progress, store, wrmXpress_gui_obj):
         # obtain the necessary data from the store
         # pipeline_selection = store["wrmXpress_gui_obj"]["pipeline_selection"]
 
-        return run_wrmXpress_analysis(store, set_progress, wrmXpress_gui_obj)
+        # Runs clean the volume's work/ and output/: one run per volume at a time
+        # (including command line runs, see plate_pipeline.py)
+        with RunLock(store["mount"], [store["platename"]]):
+            return run_wrmXpress_analysis(store, set_progress, wrmXpress_gui_obj)
 
         # TODO: # Update this if avi is selected and above method doesnt work
 
@@ -56,6 +66,16 @@ def callback(set_progress, store, wrmXpress_gui_obj):
 
         # TODO: What if multiple pipelines are selected?
 
+    except RunLockError as e:
+        return (
+            {},
+            True,
+            True,
+            "Another analysis is running on this volume. Please wait for it to finish and run again.",
+            f"```{e}```",
+            None,
+        )
+
     except Exception as e:
         # Log the error to your output file or a dedicated log file
         error_message = f"An error occurred: {str(e)}"
@@ -77,127 +97,172 @@ def run_wrmXpress_analysis(store, set_progress, wrmXpress_gui_obj):
     regardless of the pipeline selection.
     """
     if store["file_structure"] == "imagexpress":
-        new_store = preamble_run_wrmXpress_imagexpress_selection(store)
+        new_store = preamble_run_wrmXpress_imagexpress_selection(store, set_progress)
 
     elif store["file_structure"] == "avi":
-        new_store = preamble_run_wrmXpress_avi_selection(store)
+        new_store = preamble_run_wrmXpress_avi_selection(store, set_progress)
+
+    # Do not launch wrmXpress on incomplete input
+    if new_store["staging_failures"]:
+        failures = "\n".join(
+            f"{well}: {', '.join(file_names)}"
+            for well, file_names in new_store["staging_failures"].items()
+        )
+        return (
+            {},
+            True,
+            True,
+            "Some input files could not be staged or failed verification. Please check the source files and run again.",
+            f"```Staging failed for:\n{failures}```",
+            None,
+        )
 
     # while not os.path.exists(new_store["output_folder"]):
     #     time.sleep(1)
 
-    with open(new_store["output_file"], "w") as file:
-        process = subprocess.Popen(
-            new_store["wrmxpress_command_split"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
-        print("Running wrmXpress.")
-
-        docker_output = []
-        fig = None
+    # Bounded in memory; the complete output goes to the output file
+    docker_output = RunLog(new_store["output_file"])
+    fig = None
+
+    # Define the figure with the GIF
+    empty_fig = go.Figure()
+    empty_fig.update_layout(
+        xaxis={"visible": False},
+        yaxis={"visible": False},
+        plot_bgcolor="rgba(0,0,0,0)",  # Transparent background
+        paper_bgcolor="rgba(0,0,0,0)",  # Transparent background
+    )
 
-        # Define the figure with the GIF
-        empty_fig = go.Figure()
-        empty_fig.update_layout(
-            xaxis={"visible": False},
-            yaxis={"visible": False},
-            plot_bgcolor="rgba(0,0,0,0)",  # Transparent background
-            paper_bgcolor="rgba(0,0,0,0)",  # Transparent background
+    # Add the GIF to the figure
+    empty_fig.add_layout_image(
+        dict(
+            source="/assets/gummy.gif",  # Ensure the GIF is in the assets folder
+            x=0.5,
+            y=0.5,
+            xref="paper",
+            yref="paper",
+            sizex=3,
+            sizey=3,
+            xanchor="center",
+            yanchor="middle",
+            layer="below",
         )
-
-        # Add the GIF to the figure
-        empty_fig.add_layout_image(
-            dict(
-                source="/assets/gummy.gif",  # Ensure the GIF is in the assets folder
-                x=0.5,
-                y=0.5,
-                xref="paper",
-                yref="paper",
-                sizex=3,
-                sizey=3,
-                xanchor="center",
-                yanchor="middle",
-                layer="below",
-            )
+    )
+    wrmXpress_gui_obj.set_progress_image_path = "Please wait while wrmXpress initializes and pre-processes input images......"
+
+    # Plate overview, filled in well by well as wrmXpress reports them
+    montage = create_plate_montage(store)
+
+    # Output is parsed once into typed events, written next to the run log
+    # (work/<plate>_run.events.jsonl) and shared with the consumers below
+    events = RunEventStream(events_path(new_store["output_file"]), new_store["wells"])
+
+    # Log lines and preview image are sent to the browser as deltas; the log
+    # and events are also pushed as they come through /run-stream/<run id>
+    run_id = register_run(new_store["output_file"], events.path)
+    stream = ProgressStream(docker_output, run=run_id)
+    stream.set_image(empty_fig)
+    eta = RunEta(len(new_store["wells"]))
+    events.subscribe(eta)
+    events.start()
+
+    # Updates are coalesced over a short window; well transitions go out at once
+    publisher = ProgressPublisher(set_progress)
+
+    def running_progress():
+        seconds_left = eta.seconds_left()
+        time_left = (
+            f" (about {max(round(seconds_left / 60), 1)} min left)"
+            if seconds_left is not None
+            else ""
+        )
+        return (
+            wrmXpress_gui_obj.set_progress_current_number,
+            wrmXpress_gui_obj.set_progress_total_number,
+            stream.update(),
+            f"```{wrmXpress_gui_obj.set_progress_image_path}{time_left}```", # image path -- update this if we want a message about waiting for wrmxpress while running
+            bool(fig),
+            not bool(fig),
+            montage.update() if montage else dash.no_update,
         )
-        wrmXpress_gui_obj.set_progress_image_path = "Please wait while wrmXpress initializes and pre-processes input images......"
 
-        # Process all lines from the subprocess
-        for line in iter(process.stdout.readline, ""):
-            wrmXpress_gui_obj.set_progress_running = True
-            docker_output.append(line)
-            file.write(line)
-            file.flush()
+    def on_line(line):
+        nonlocal fig
+        wrmXpress_gui_obj.set_progress_running = True
+        line_seq = docker_output.append(line)
 
+        for event in events.feed(line, line_seq):
+            if event.kind != WELL_STARTED:
+                continue
             try:
-                if (
-                    len(re.findall(r"\b" + "|".join(new_store["wells"]) + r"\b", line))
-                    == 1
-                ):
-
-                    fig = updated_running_wells(
-                        set_progress, line, store, docker_output, wrmXpress_gui_obj
-                    )
-
+                fig = updated_running_wells(
+                    publisher,
+                    event,
+                    store,
+                    stream,
+                    wrmXpress_gui_obj,
+                    montage,
+                )
             except Exception as e:
-                # print(f"Error: {e}") error is likely due to the line not containing the necessary information for processing
-                continue
+                print(f"Failed to show well {event.well} because {e}")
 
-            if wrmXpress_gui_obj.set_progress_running:
-                docker_output_formatted = "".join(docker_output)
-
-                set_progress(
-                    (
-                        wrmXpress_gui_obj.set_progress_current_number,
-                        wrmXpress_gui_obj.set_progress_total_number,
-                        fig if fig else empty_fig,
-                        f"```{wrmXpress_gui_obj.set_progress_image_path}```", # image path -- update this if we want a message about waiting for wrmxpress while running
-                        f"```{docker_output_formatted}```",
-                        bool(fig),
-                        not bool(fig),
-                    )
-                )
-        # Ensure all output is processed and the subprocess has finished
-        process.communicate()
+        if wrmXpress_gui_obj.set_progress_running:
+            publisher.publish(running_progress)
 
-        if process.returncode == 0:
-            print("wrmXpress process successful.")
-            wrmXpress_gui_obj.check_for_output_files()
+    # The complete output goes to the output file, line by line
+    print("Running wrmXpress.")
+    returncode = run_wrmxpress(
+        new_store["wrmxpress_command_split"], new_store["output_file"], on_line
+    )
+    events.finish(returncode)
+    events.close()
+    publisher.flush()
+    print(
+        f"Progress updates: {publisher.published} published, "
+        f"{publisher.dropped} coalesced."
+    )
 
-            if wrmXpress_gui_obj.output_files_exist:
-                return updated_thumbnail_generation(wrmXpress_gui_obj, docker_output)
+    if returncode == 0:
+        print("wrmXpress process successful.")
+        wrmXpress_gui_obj.check_for_output_files()
 
-            # TODO: Implement thumbnail generation
-            return None
+        if wrmXpress_gui_obj.output_files_exist:
+            return updated_thumbnail_generation(wrmXpress_gui_obj, docker_output)
 
-        else:
-            print("wrmXpress process failed.")
-            wrmXpress_gui_obj.check_for_output_files()
-            if wrmXpress_gui_obj.output_files_exist:
-                return updated_thumbnail_generation(wrmXpress_gui_obj, docker_output)
+        # TODO: Implement thumbnail generation
+        return None
 
-            # TODO: Implement failure handling
-            return None
+    else:
+        print("wrmXpress process failed.")
+        wrmXpress_gui_obj.check_for_output_files()
+        if wrmXpress_gui_obj.output_files_exist:
+            return updated_thumbnail_generation(wrmXpress_gui_obj, docker_output)
 
+        # TODO: Implement failure handling
+        return None
 
-def updated_running_wells(set_progress, line, store, docker_output, wrmXpress_gui_obj):
 
-    well_being_analyzed, progress = line.split(" ")
-    current_number, total_number = progress.split("/")
+def updated_running_wells(
+    set_progress, event, store, stream, wrmXpress_gui_obj, montage=None
+):
+    """
+    This function shows the well of a "well_started" run event (see
+    run_events.py) in the progress view.
+    """
+    well_being_analyzed = event.well
+    current_number, total_number = event.current, event.total
     plate_base = store["platename"].split("_", 1)[0] if "_" in store["platename"] else store["platename"]
     well_base_path = Path(
         store["wrmXpress_gui_obj"]["mounted_volume"], "input",
         f"{store['wrmXpress_gui_obj']['plate_name']}/TimePoint_1/{plate_base}_{well_being_analyzed}",
     )
-    # Use rglob with case-insensitive pattern matching for .TIF and .tif
-    file_paths = list(
-        well_base_path.parent.rglob(well_base_path.name + "*[._][tT][iI][fF]")
+    # Look the well up in the (cached) index of the staged plate instead of globbing per line
+    plate_index = get_plate_index(well_base_path.parent.parent, plate_base)
+    file_paths_sorted = find_well_images(
+        plate_index, well_being_analyzed, well_base_path.parent.name
     )
-    
-    # Sort the matching files to find the one with the lowest suffix number
-    if file_paths:
-        file_paths_sorted = sorted(file_paths, key=lambda x: x.stem)
+
+    if file_paths_sorted:
         # Select the first file (with the lowest number) if multiple matches are found
         img_path = file_paths_sorted[0]
 
@@ -207,17 +272,20 @@ def updated_running_wells(set_progress, line, store, docker_output, wrmXpress_gu
 
     if img_path.exists():
         fig = create_figure_from_filepath(img_path)
-        docker_output_formatted = "".join(docker_output)
+        stream.set_image(fig)
+
+        if montage:
+            montage.add_well(well_being_analyzed, img_path)
 
         set_progress(
             (
                 str(current_number),
                 str(total_number),
-                fig,
+                stream.update(),
                 f"```{str(img_path)}```",
-                f"```{docker_output_formatted}```",
                 True,
-                False
+                False,
+                montage.update() if montage else dash.no_update,
             )
         )
 
@@ -227,9 +295,33 @@ def updated_running_wells(set_progress, line, store, docker_output, wrmXpress_gu
         return fig
 
 
-def preamble_run_wrmXpress_avi_selection(store):
+def staging_progress(set_progress):
+    """
+    This function returns a staging progress callback (see staging.stage_files)
+    that reports bytes and files staged through the run page progress bar.
+    """
+
+    def report(files_done, files_total, bytes_done, bytes_total):
+        set_progress(
+            (
+                str(bytes_done),
+                str(max(bytes_total, 1)),
+                None,
+                f"```Staging input files: {files_done}/{files_total} files "
+                f"({bytes_done / 1e6:.1f}/{bytes_total / 1e6:.1f} MB)```",
+                False,
+                True,
+                None,
+            )
+        )
+
+    return report
+
+
+def preamble_run_wrmXpress_avi_selection(store, set_progress=None):
     """
     The purpose of this function is to prepare the necessary files and directories for wrmXpress for avi files.
+    If `set_progress` is given, staging progress is reported through it.
     """
     volume = store["mount"]
     platename = store["platename"]
@@ -254,7 +346,7 @@ def preamble_run_wrmXpress_avi_selection(store):
         output_path=Path(volume, "output"),
     )
 
-    copy_files_to_input_directory(
+    staging_failures = copy_files_to_input_directory(
         platename_input_dir=platename_input_dir,
         htd_file=None,
         img_dir=img_dir,
@@ -262,17 +354,10 @@ def preamble_run_wrmXpress_avi_selection(store):
         plate_base=platename,
         platename=platename,
         file_structure=store["file_structure"],
+        progress_callback=staging_progress(set_progress) if set_progress else None,
     )
 
-    # Command message
-    command_message = (
-        f"```python /root/wrmXpress/wrapper.py {platename}.yml {platename}```"
-    )
-
-    wrmxpress_command = (
-        f"python -u /root/wrmXpress/wrapper.py {volume}/{platename}.yml {platename}"
-    )
-    wrmxpress_command_split = shlex.split(wrmxpress_command)
+    wrmxpress_command_split, command_message = wrmxpress_command(volume, platename)
     output_folder = Path(volume, "work", platename)
     output_file = Path(
         volume, "work", f"{platename}_run.log"
@@ -290,13 +375,15 @@ def preamble_run_wrmXpress_avi_selection(store):
         "platename": platename,
         "wells_analyzed": wells_analyzed,
         "tracking_well": tracking_well,
+        "staging_failures": staging_failures,
     }
     return new_store
 
 
-def preamble_run_wrmXpress_imagexpress_selection(store):
+def preamble_run_wrmXpress_imagexpress_selection(store, set_progress=None):
     """
     The purpose of this function is to prepare the necessary files and directories for wrmXpress for imagexpress formatted files.
+    If `set_progress` is given, staging progress is reported through it.
     """
     volume = store["mount"]
     platename = store["platename"]
@@ -326,7 +413,7 @@ def preamble_run_wrmXpress_imagexpress_selection(store):
 
     htd_file = Path(img_dir, f"{plate_base}.HTD")
 
-    copy_files_to_input_directory(
+    staging_failures = copy_files_to_input_directory(
         platename_input_dir=platename_input_dir,
         htd_file=htd_file,
         img_dir=img_dir,
@@ -334,16 +421,9 @@ def preamble_run_wrmXpress_imagexpress_selection(store):
         plate_base=plate_base,
         platename=platename,
         file_structure=store["file_structure"],
+        progress_callback=staging_progress(set_progress) if set_progress else None,
     )
-    # Command message
-    command_message = (
-        f"```python /root/wrmXpress/wrapper.py {platename}.yml {platename}```"
-    )
-
-    wrmxpress_command = (
-        f"python -u /root/wrmXpress/wrapper.py {volume}/{platename}.yml {platename}"
-    )
-    wrmxpress_command_split = shlex.split(wrmxpress_command)
+    wrmxpress_command_split, command_message = wrmxpress_command(volume, platename)
     output_folder = Path(volume, "work", platename)
     output_file = Path(
         volume, "work", f"{platename}_run.log"
@@ -361,6 +441,7 @@ def preamble_run_wrmXpress_imagexpress_selection(store):
         "platename": platename,
         "wells_analyzed": wells_analyzed,
         "tracking_well": tracking_well,
+        "staging_failures": staging_failures,
     }
     return new_store
 
@@ -373,7 +454,7 @@ def updated_thumbnail_generation(wrmXpress_gui_obj, docker_output):
     output_figure_path = wrmXpress_gui_obj.output_files[0]
     fig_1 = create_figure_from_filepath(output_figure_path)
     docker_output.append("Thumbnail generation completed successfully.")
-    docker_output_formatted = "".join(docker_output)
+    docker_output_formatted = docker_output.text()
     return (
         fig_1,
         False,
@@ -415,154 +496,6 @@ def tracking_wrmXpress_run(store, set_progress):
         )
 
 
-def motility_or_segment_run(store, set_progress, wrmXpress_gui_obj):
-    """
-    The purpose of this function is to run wrmXpress for motility and segment and return the figure, open status, and command message.
-    """
-    try:
-        file_structure = store["file_structure"]
-
-        if file_structure == "avi":
-            new_store = preamble_run_wrmXpress_avi_selection(store)
-            return run_wrmXpress_avi_selection_motility(new_store, set_progress)
-
-        elif file_structure == "imagexpress":
-            new_store = preamble_run_wrmXpress_imagexpress_selection(store)
-            return run_wrmXpress_imagexpress_selection_motility(
-                new_store, set_progress, store, wrmXpress_gui_obj
-            )
-
-    except Exception as e:
-        # Log the error to your output file or a dedicated log file
-        error_message = f"An error occurred: {str(e)}"
-
-        # Return an error indication to the callback
-        return (
-            {},
-            True,
-            True,
-            "An error has occurred. Please see the log file for more information.",
-            f"```{error_message}```",
-            None,
-        )
-
-
-def fecundity_run(store, set_progress, wrmXpress_gui_obj):
-    """
-    The purpose of this function is to run wrmXpress for fecundity and return the figure, open status, and command message.
-    """
-    try:
-        file_structure = store["file_structure"]
-
-        if file_structure == "avi":
-            new_store = preamble_run_wrmXpress_avi_selection(
-                store
-            )  # Including this information for now
-            # however we do not currently allow for avi and fecundity to be run together
-
-        elif file_structure == "imagexpress":
-            new_store = preamble_run_wrmXpress_imagexpress_selection(store)
-
-        wrmxpress_command_split = new_store["wrmxpress_command_split"]
-        output_folder = new_store["output_folder"]
-        output_file = new_store["output_file"]
-        wells = new_store["wells"]
-        volume = new_store["volume"]
-        platename = new_store["platename"]
-        plate_base = platename.split("_", 1)[0]
-
-        # Should try and figure out an alternative to this
-        # potential brick mechanism for the user
-        while not os.path.exists(output_folder):
-            time.sleep(1)
-
-        with open(output_file, "w") as file:
-            process = subprocess.Popen(
-                wrmxpress_command_split,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-            )
-
-            print("Running wrmXpress.")
-
-            docker_output = []
-            # wells_analyzed = []
-
-            for line in iter(process.stdout.readline, ""):
-                docker_output.append(line)
-                file.write(line)
-                file.flush()
-
-                # check if any of the wells in well_selection_list are being analyzed
-                # the line must contain only one of the wells in the selection list, if contains more disregard it
-                # the line looks something like "{well} {number}/{total number of wells}"
-                if len(re.findall(r"\b" + "|".join(wells) + r"\b", line)) == 1:
-
-                    updated_running_wells(set_progress, line, store, docker_output)
-                # if "Running" in line:
-
-                #     process_running_wells(
-                #         line,
-                #         wells_analyzed,
-                #         wells,
-                #         volume,
-                #         platename,
-                #         plate_base,
-                #         set_progress,
-                #         docker_output,
-                #     )
-
-            process.wait()
-
-            if process.returncode == 0:
-
-                print("wrmXpress process successful.")
-
-                # check for output files
-                wrmXpress_gui_obj.check_for_output_files()
-
-                if wrmXpress_gui_obj.output_files_exist:
-                    return updated_thumbnail_generation(
-                        wrmXpress_gui_obj, docker_output
-                    )
-
-                # TODO: Implement thumbnail generation
-                return handle_thumbnail_generation(
-                    volume,
-                    platename,
-                    docker_output,
-                    output_file,
-                    pipeline="segmentation",
-                )
-
-            else:
-                print("wrmXpress process failed.")
-                wrmXpress_gui_obj.check_for_output_files()
-
-                if wrmXpress_gui_obj.output_files_exist:
-                    return updated_thumbnail_generation(
-                        wrmXpress_gui_obj, docker_output
-                    )
-
-                # TODO: Implement failure handling
-                return handle_failure(docker_output, output_file)
-
-    except Exception as e:
-        # Log the error to your output file or a dedicated log file
-        error_message = f"An error occurred (this): {str(e)}"
-
-        # Return an error indication to the callback
-        return (
-            {},
-            True,
-            True,
-            "An error has occurred. Please see the log file for more information.",
-            f"```{error_message}```",
-            None,
-        )
-
-
 def cellprofiler_wormsize_run(store, set_progress):
     """
     The purpose of this function is to run wrmXpress for wormsize and return the figure, open status, and command message.
@@ -600,7 +533,7 @@ def cellprofiler_wormsize_run(store, set_progress):
                 stderr=subprocess.STDOUT,
                 text=True,
             )
-            docker_output = []
+            docker_output = RunLog(output_file)
 
             print("Running wrmXpress.")
 
@@ -691,7 +624,7 @@ def cellprofiler_wormsize_intesity_cellpose_run(store, set_progress):
 
             print("Running wrmXpress.")
 
-            docker_output = []
+            docker_output = RunLog(output_file)
             info_and_percent_wells = []
             wells_analyzed = []
 
@@ -793,7 +726,7 @@ def cellprofiler_mf_celltox_run(store, set_progress):
                 stderr=subprocess.STDOUT,
                 text=True,
             )
-            docker_output = []
+            docker_output = RunLog(output_file)
             wells_analyzed = []
 
             print("Running wrmXpress.")
@@ -888,7 +821,7 @@ def cellprofiler_feeding_run(store, set_progress):
                 stderr=subprocess.STDOUT,
                 text=True,
             )
-            docker_output = []
+            docker_output = RunLog(output_file)
             wells_analyzed = []
 
             print("Running wrmXpress.")
@@ -970,7 +903,7 @@ def run_wrmXpress_avi_selection_tracking(new_store, set_progress):
 
         print("Running wrmXpress.")
         # Create an empty list to store the docker output
-        docker_output = []
+        docker_output = RunLog(output_file)
         reconfigure_wells = []
 
         for line in iter(process.stdout.readline, ""):
@@ -1044,7 +977,7 @@ def run_wrmXpress_imagexpress_selection_tracking(new_store, set_progress):
             text=True,
         )
         print("Running wrmXpress.")
-        docker_output = []
+        docker_output = RunLog(log_file)
 
         # Real-time processing of subprocess output
         for line in iter(process.stdout.readline, ""):
@@ -1074,155 +1007,6 @@ def run_wrmXpress_imagexpress_selection_tracking(new_store, set_progress):
             return handle_failure(docker_output, log_file)
 
 
-def run_wrmXpress_avi_selection_motility(new_store, set_progress):
-    wrmxpress_command_split = new_store["wrmxpress_command_split"]
-    output_folder = new_store["output_folder"]
-    log_file_path = new_store["output_file"]  # Rename for clarity
-    wells = new_store["wells"]
-    volume = new_store["volume"]
-    platename = new_store["platename"]
-    plate_base = platename.split("_", 1)[0]
-
-    # Should try and figure out an alternative to this
-    # potential brick mechanism for the user
-    while not os.path.exists(output_folder):
-        time.sleep(1)
-
-    with open(log_file_path, "w") as log_file:  # Use 'log_file' for clarity
-        process = subprocess.Popen(
-            wrmxpress_command_split,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
-        print("Running wrmXpress.")
-
-        docker_output = []
-        wells_analyzed = []
-        reconfiguring_well = []
-
-        # Handle the output line by line
-        for line in iter(process.stdout.readline, ""):
-
-            docker_output.append(line)
-            log_file.write(line)
-            log_file.flush()
-
-            if "Reconfiguring" in line:
-                process_reconfiguring_wells(
-                    line,
-                    reconfiguring_well,
-                    wells,
-                    volume,
-                    platename,
-                    plate_base,
-                    set_progress,
-                    docker_output,
-                    multiplier=2,
-                )
-            elif "Running" in line:
-                process_running_wells(
-                    line,
-                    wells_analyzed,
-                    wells,
-                    volume,
-                    platename,
-                    plate_base,
-                    set_progress,
-                    docker_output,
-                    multiplier=2,
-                    other_pipeline_wells=reconfiguring_well,
-                )
-
-        process.wait()  # Ensure the subprocess has finished
-
-        if process.returncode == 0:
-            return handle_thumbnail_generation(
-                volume, platename, docker_output, log_file
-            )
-        else:
-            return handle_failure(docker_output, log_file_path)
-
-
-def run_wrmXpress_imagexpress_selection_motility(
-    new_store, set_progress, store, wrmXpress_gui_obj
-):
-    wrmxpress_command_split = new_store["wrmxpress_command_split"]
-    output_folder = new_store["output_folder"]
-    output_file = new_store["output_file"]
-    wells = new_store["wells"]
-    volume = new_store["volume"]
-    platename = new_store["platename"]
-    # plate_base = platename.split("_", 1)[0]
-
-    # Should try and figure out an alternative to this
-    # potential brick mechanism for the user
-    while not os.path.exists(output_folder):
-        time.sleep(1)
-
-    with open(output_file, "w") as file:
-        process = subprocess.Popen(
-            wrmxpress_command_split,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
-        print("Running wrmXpress.")
-
-        docker_output = []
-        # wells_analyzed = []
-
-        # Process all output from the subprocess
-        for line in iter(process.stdout.readline, ""):
-            docker_output.append(line)
-            file.write(line)
-            file.flush()
-
-            # check if any of the wells in well_selection_list are being analyzed
-            # the line must contain only one of the wells in the selection list, if contains more disregard it
-            # the line looks something like "{well} {number}/{total number of wells}"
-            if len(re.findall(r"\b" + "|".join(wells) + r"\b", line)) == 1:
-
-                updated_running_wells(set_progress, line, store, docker_output)
-
-            # Process 'Running' lines to update progress
-            # if "Running" in line:
-            #     process_running_wells(
-            #         line,
-            #         wells_analyzed,
-            #         wells,
-            #         volume,
-            #         platename,
-            #         plate_base,
-            #         set_progress,
-            #         docker_output,
-            #     )
-
-        # Wait for the subprocess to complete its execution
-        process.communicate()  # Ensure all output has been processed and subprocess has finished
-
-        if process.returncode == 0:
-            wrmXpress_gui_obj.check_for_output_files()
-            if wrmXpress_gui_obj.output_files_exist:
-                return updated_thumbnail_generation(wrmXpress_gui_obj, docker_output)
-
-            # TODO: Implement thumbnail generation, finish this when backend is finished
-            return handle_thumbnail_generation(
-                volume, platename, docker_output, output_file
-            )
-
-        else:
-
-            print("wrmXpress has failed.")
-
-            wrmXpress_gui_obj.check_for_output_files()
-            if wrmXpress_gui_obj.output_files_exist:
-                return updated_thumbnail_generation(wrmXpress_gui_obj, docker_output)
-
-            # TODO: Implement failure handling
-            return handle_failure(docker_output, output_file)
-
-
 def process_reconfiguring_wells(
     line,
     reconfiguring_well,
@@ -1254,7 +1038,7 @@ def process_reconfiguring_wells(
 
     # create figure from file path
     fig = create_figure_from_filepath(current_well_path)
-    docker_output_formatted = "".join(docker_output)
+    docker_output_formatted = docker_output.text()
     set_progress(
         (
             str(len(reconfiguring_well)),
@@ -1302,7 +1086,7 @@ def process_running_wells(
 
         if img_path.exists():
             fig = create_figure_from_filepath(img_path)
-            docker_output_formatted = "".join(docker_output)
+            docker_output_formatted = docker_output.text()
 
             set_progress(
                 (
@@ -1353,7 +1137,7 @@ def process_tracking_wells(
 
     # create figure from file path
     fig = create_figure_from_filepath(current_well_path)
-    docker_output_formatted = "".join(docker_output)
+    docker_output_formatted = docker_output.text()
     set_progress(
         (
             str(len(tracking_well) + len(additional_wells)),
@@ -1423,7 +1207,7 @@ def process_img_number(
 
         if img_path.exists():
             fig = create_figure_from_filepath(img_path)
-            docker_output_formatted = "".join(docker_output)
+            docker_output_formatted = docker_output.text()
 
             set_progress(
                 (
@@ -1462,7 +1246,7 @@ def process_info_and_percent(
 
         if os.path.exists(img_path):
             fig = create_figure_from_filepath(img_path)
-            docker_output_formatted = "".join(docker_output)
+            docker_output_formatted = docker_output.text()
 
             set_progress(
                 (
@@ -1482,7 +1266,7 @@ def process_info_and_percent(
         )
         if os.path.exists(img_path):
             fig = create_figure_from_filepath(img_path, "gray")
-            docker_output_formatted = "".join(docker_output)
+            docker_output_formatted = docker_output.text()
             set_progress(
                 (
                     str(info_well_analyzed),
@@ -1520,7 +1304,7 @@ def handle_thumbnail_generation(
         print("wrmXpress finished.")
         fig_1 = create_figure_from_filepath(output_path)
         docker_output.append("Thumbnail generation completed successfully.")
-        docker_output_formatted = "".join(docker_output)
+        docker_output_formatted = docker_output.text()
         return (
             fig_1,
             False,
@@ -1533,7 +1317,7 @@ def handle_thumbnail_generation(
     else:
 
         error_message = f"Thumbnail generation failed, please check the {output_file}."
-        docker_output_formatted = "".join(docker_output)
+        docker_output_formatted = docker_output.text()
         return (
             None,
             True,
@@ -1546,7 +1330,7 @@ def handle_thumbnail_generation(
 
 def handle_failure(docker_output, output_file):
     error_message = f"wrmXpress has failed, please check the {output_file} for more information. Then clear the `work` directory and try again."
-    docker_output_formatted = "".join(docker_output)
+    docker_output_formatted = docker_output.text()
     return (
         None,
         True,
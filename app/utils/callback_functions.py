@@ -17,7 +17,26 @@ import tifffile as tiff
 from skimage import exposure
 from zenodo_get import zenodo_get
 import subprocess
+import threading
 import time
+import plotly.io as pio
+from collections import Counter
+
+from app.utils.image_cache import image_cache
+from app.utils.thumbnail_store import get_thumbnail_store
+from app.utils.image_rendering import (
+    PREVIEW_RENDER_MODE,
+    PREVIEW_JPEG_QUALITY,
+    PREVIEW_DISPLAY_MAX_SIDE,
+    ENCODED_RENDER_MODES,
+    create_encoded_figure,
+)
+from app.utils.image_io import image_dimensions, read_tiff_strided
+from app.utils.contrast import DEFAULT_CONTRAST, apply_window, raw_image_cache
+from app.utils.staging import STAGING_STRATEGY, STAGING_VERIFY, stage_file, stage_files
+from app.utils.plate_index import get_plate_index, well_from_filename
+from app.utils.staging_manifest import StagingManifest
+from app.utils.trash import trash_reaper
 
 # In[2]: Helper functions
 
@@ -402,37 +421,42 @@ def clean_and_create_directories(input_path, work_path, output_path=False):
     """
     The purpose of this function is to clean and create the input, work, and output directories.
     That is to say, it will delete the contents of the input, work, and output directories (if they exist)
-    and then recreate them.
+    and then recreate them. Staged input files that are still current are kept (see clean_input_directory).
+    Old trees are renamed to the trash and deleted in the background (see trash.py).
     """
     # wipe previous runs
-    if os.path.exists(work_path):
-        shutil.rmtree(work_path)
-        work_path.mkdir(parents=True, exist_ok=True)
-    else:
-        work_path.mkdir(parents=True, exist_ok=True)
+    trash_reaper.move_to_trash(work_path)
+    work_path.mkdir(parents=True, exist_ok=True)
 
-    if os.path.exists(input_path):
-        shutil.rmtree(input_path)
-        input_path.mkdir(parents=True, exist_ok=True)
-    else:
-        input_path.mkdir(parents=True, exist_ok=True)
+    clean_input_directory(input_path)
     if output_path != False:
         # wipe contents of output (different logic because backend doesn't put all output in a platename dir)
         if os.path.exists(output_path):
-            for filename in os.listdir(output_path):
-                file_path = os.path.join(output_path, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print("Failed to delete %s because %s" % (file_path, e))
+            trash_reaper.empty_into_trash(output_path)
         else:
             output_path.mkdir(parents=True, exist_ok=True)
 
 
-def copy_files_to_input_directory(
+def clean_input_directory(input_path):
+    """
+    The purpose of this function is to clean and create the input directory of a plate.
+    If the staging manifest shows the staged files are all still there, only the
+    files it does not account for are deleted, and copy_files_to_input_directory
+    later stages just what changed. Otherwise the directory is wiped.
+    """
+    input_path = Path(input_path)
+    manifest = StagingManifest.load(input_path)
+
+    if input_path.exists() and manifest.is_intact():
+        manifest.remove_untracked()
+        return
+
+    trash_reaper.move_to_trash(input_path)
+    input_path.mkdir(parents=True, exist_ok=True)
+    manifest.delete()
+
+
+def collect_staging_jobs(
     platename_input_dir,
     htd_file,
     img_dir,
@@ -443,7 +467,9 @@ def copy_files_to_input_directory(
     file_types=None,
 ):
     """
-    The purpose of this function is to copy the input files to the input directory.
+    This function lists the input files of the selected wells as (source file,
+    destination directory) staging jobs, from a single scan of the plate.
+    The HTD file is not included.
     """
     if file_types is None:
         file_types = [".tif", ".avi", ".TIF"]  # Default file types
@@ -451,74 +477,308 @@ def copy_files_to_input_directory(
     # Ensure wells is a list
     wells = wells if isinstance(wells, list) else [wells]
 
+    # One directory scan for the whole plate instead of a glob per (time point, well, file type)
+    plate_index = get_plate_index(img_dir, plate_base if htd_file else platename)
+
+    jobs = []
+    if file_structure == "imagexpress":
+        time_points = plate_index.timepoints if htd_file else [None]
+        for time_point in time_points:
+            dest_dir = (
+                Path(platename_input_dir, time_point)
+                if time_point
+                else Path(platename_input_dir)
+            )
+            for well in wells:
+                for file_path in plate_index.paths(
+                    well, timepoint=time_point, suffixes=file_types
+                ):
+                    jobs.append((file_path, dest_dir))
+    elif file_structure == "avi":
+        # One AVI for a whole plate
+        if Path(img_dir, f"{plate_base}.avi").exists():
+            jobs.append((Path(img_dir, f"{plate_base}.avi"), Path(platename_input_dir)))
+        # One AVI per well
+        else:
+            for well in wells:
+                for file_path in plate_index.paths(
+                    well, timepoint=None, suffixes=file_types
+                ):
+                    jobs.append((file_path, Path(platename_input_dir)))
+    return jobs
+
+
+def copy_files_to_input_directory(
+    platename_input_dir,
+    htd_file,
+    img_dir,
+    plate_base,
+    wells,
+    platename,
+    file_structure,
+    file_types=None,
+    staging_strategy=STAGING_STRATEGY,
+    progress_callback=None,
+    verify=STAGING_VERIFY,
+):
+    """
+    The purpose of this function is to copy the input files to the input directory.
+    Files are staged with `staging_strategy` (copy, hardlink, reflink or symlink),
+    several at a time, see staging.py. With "symlink" the HTD file is linked too,
+    so the input directory is a pure link farm. `progress_callback(files_done,
+    files_total, bytes_done, bytes_total)` is called as staging progresses.
+    Files already staged from an unchanged source (per the staging manifest) are
+    kept, and previously staged files that are no longer wanted are removed.
+    With `verify`, staged copies are hashed against their source (see
+    StagingManifest.verify). Returns the files that failed staging or
+    verification, grouped by well ("unassigned" for files without a well).
+    """
+    failed_files = {}
+
+    # Ensure wells is a list
+    wells = wells if isinstance(wells, list) else [wells]
+
     if htd_file:
-        shutil.copy(htd_file, platename_input_dir)
+        # Never copy through a link left by a previous preview (it would overwrite the source)
+        stage_file(
+            htd_file,
+            platename_input_dir,
+            "symlink" if staging_strategy == "symlink" else "copy",
+        )
 
     try:
-        if file_structure == "imagexpress":
-            time_points = (
-                [
-                    item
-                    for item in os.listdir(img_dir)
-                    if os.path.isdir(Path(img_dir, item))
-                ]
-                if htd_file
-                else [None]
+        # Collect every (file, destination) first, then stage them all in parallel
+        jobs = collect_staging_jobs(
+            platename_input_dir,
+            htd_file,
+            img_dir,
+            plate_base,
+            wells,
+            platename,
+            file_structure,
+            file_types,
+        )
+
+        # Only stage what changed since the last preview/run of this plate
+        manifest = StagingManifest.load(platename_input_dir)
+        to_stage, to_remove = manifest.diff(jobs, staging_strategy)
+        manifest.remove(to_remove)
+
+        used_strategies = {}
+        failed = set(
+            stage_files(
+                to_stage,
+                staging_strategy,
+                progress_callback=progress_callback,
+                used_strategies=used_strategies,
             )
-            for time_point in time_points:
-                for well in wells:
-                    for file_type in file_types:
-                        pattern = (
-                            f"{plate_base}_{well}*"
-                            if htd_file
-                            else f"{platename}_{well}*"
-                        )
-                        search_pattern = Path(
-                            img_dir,
-                            time_point if time_point else "",
-                            pattern + file_type,
-                        )
-                        for file_path in glob.glob(str(search_pattern)):
-                            dest_dir = (
-                                Path(platename_input_dir, time_point)
-                                if time_point
-                                else platename_input_dir
-                            )
-                            dest_dir.mkdir(parents=True, exist_ok=True)
-                            shutil.copy(file_path, dest_dir)
-        elif file_structure == "avi":
-            # One AVI for a whole plate
-            if Path(img_dir, f"{plate_base}.avi").exists():
-                dest_dir = platename_input_dir
-                dest_dir.mkdir(parents=True, exist_ok=True)
-                shutil.copy(Path(img_dir, f"{plate_base}.avi"), dest_dir)
-            # One AVI per well
-            else:
-                for well in wells:
-                    for file_type in file_types:
-                        pattern = (
-                                f"{plate_base}_{well}*"
-                                if htd_file
-                                else f"{platename}_{well}*"
-                            )
-                        search_pattern = Path(
-                                img_dir,
-                                pattern + file_type,
-                            )
-                        for file_path in glob.glob(str(search_pattern)):
-                                dest_dir = (
-                                    Path(platename_input_dir)
-                                )
-                                dest_dir.mkdir(parents=True, exist_ok=True)
-                                shutil.copy(file_path, dest_dir)
+        )
+        report_staging_strategies(staging_strategy, used_strategies)
+        manifest.record(
+            [
+                (src, dest_dir)
+                for src, dest_dir in to_stage
+                if (Path(src), Path(dest_dir)) not in failed
+            ],
+            staging_strategy,
+            used_strategies,
+        )
+        if verify:
+            failed |= {
+                (Path(src), Path(dest_dir)) for src, dest_dir in manifest.verify(jobs)
+            }
+        manifest.save()
+
+        # Files whose name carries no well (e.g. the HTD file) are grouped apart
+        for src, _ in sorted(failed):
+            well = well_from_filename(src.name) or "unassigned"
+            failed_files.setdefault(well, []).append(src.name)
+        for well, file_names in failed_files.items():
+            print(f"Staging failed for well {well}: {', '.join(file_names)}")
     except Exception as e:
         print(f"Error copying files to input directory: {e}")
 
+    if file_structure == "imagexpress":
+        warm_staged_thumbnails(
+            platename_input_dir, wells, plate_base if htd_file else platename
+        )
+
+    return failed_files
+
+
+def report_staging_strategies(staging_strategy, used_strategies):
+    """
+    This function prints how many files were staged with each strategy, so
+    fallbacks (e.g. hardlinks that became copies across devices) are visible.
+    """
+    if not used_strategies:
+        return
+    counts = Counter(used_strategies.values())
+    summary = ", ".join(f"{count} {used}" for used, count in sorted(counts.items()))
+    fallback = (
+        f" (fallback from {staging_strategy})"
+        if set(counts) != {staging_strategy}
+        else ""
+    )
+    print(f"Staged {len(used_strategies)} files: {summary}{fallback}")
+
+
+def find_well_images(plate_index, well, time_point=Ellipsis):
+    """
+    This function returns the TIFF images of a well from a plate index, sorted
+    by name (so the first one is the lowest site/wavelength).
+    """
+    return sorted(
+        (
+            record.path
+            for record in plate_index.find(well, timepoint=time_point)
+            if record.suffix.lower() in [".tif", ".tiff"]
+        ),
+        key=lambda x: x.stem,
+    )
+
+
+def warm_staged_thumbnails(platename_input_dir, wells, file_prefix):
+    """
+    The purpose of this function is to render the thumbnails of freshly staged wells
+    in a background thread, so they are already in the thumbnail store when the
+    preview and progress views ask for them.
+    For each well, the first image of the first time point is rendered (the same
+    image the progress view shows).
+    """
 
-def create_figure_from_filepath(img_path, scale="gray", max_pixels=178956970):
+    def warm():
+        plate_index = get_plate_index(platename_input_dir, file_prefix)
+        time_points = [
+            time_point
+            for time_point in plate_index.timepoints
+            if time_point.startswith("TimePoint_")
+        ]
+        time_point = time_points[0] if time_points else None
+
+        for well in wells:
+            well_images = find_well_images(plate_index, well, time_point)
+            if not well_images:
+                continue
+            try:
+                create_figure_from_filepath(well_images[0])
+            except Exception as e:
+                print(f"Error warming thumbnail for {well_images[0]}: {e}")
+
+    warmer = threading.Thread(target=warm, name="thumbnail-warmer", daemon=True)
+    warmer.start()
+    return warmer
+
+
+def create_figure_from_filepath(
+    img_path,
+    scale="gray",
+    max_pixels=178956970,
+    render=PREVIEW_RENDER_MODE,
+    quality=PREVIEW_JPEG_QUALITY,
+    display_max_side=PREVIEW_DISPLAY_MAX_SIDE,
+    contrast=DEFAULT_CONTRAST,
+):
     """
     This function creates a figure from the input file path.
     If the image size exceeds `max_pixels`, it is resized.
+    With `render` set to "png" or "jpeg" the image is downsampled to
+    `display_max_side` and shipped as a compressed image source; "heatmap"
+    sends the full pixel matrix through px.imshow.
+    Intensities are windowed to uint8 between the (low, high) percentiles given
+    by `contrast`; the decoded image and its histogram are cached so a new
+    contrast setting does not re-read the file.
+    Decoded images and figures are kept in an LRU cache keyed on the file
+    identity and rendering options, so repeated requests for the same image
+    skip decoding entirely. A go.Figure is returned on every path (cached
+    figures are rebuilt from their JSON), or None if the image cannot be read.
+    Encoded figures are also kept in the persistent thumbnail store, shared
+    across sessions, worker processes and restarts.
+    """
+
+    contrast = tuple(contrast)
+    cache_key = image_cache.make_key(
+        img_path, scale, max_pixels, render, quality, display_max_side, contrast
+    )
+    cached_fig = image_cache.get_figure(cache_key)
+    if cached_fig is not None:
+        return cached_fig
+
+    store_key = None
+    if render in ENCODED_RENDER_MODES:
+        thumbnail_store = get_thumbnail_store()
+        store_key = thumbnail_store.make_key(
+            img_path, scale, max_pixels, render, quality, display_max_side, contrast
+        )
+        stored_fig = thumbnail_store.get_figure(store_key)
+        if stored_fig is not None:
+            return stored_fig
+
+    max_side = display_max_side if render in ENCODED_RENDER_MODES else None
+    raw_entry = load_raw_image(img_path, max_pixels, max_side)
+    if raw_entry is None:
+        return None
+    img, histogram = raw_entry
+
+    # Percentile windowing for grayscale and high bit-depth images (8-bit colour is kept as-is)
+    if img.ndim == 2 or img.dtype != np.uint8:
+        img = apply_window(img, contrast, histogram)
+
+    # Proceed with creating the figure using plotly
+    if render in ENCODED_RENDER_MODES:
+        # The image may have been read at a stride: keep the axes in source pixels
+        fig, img = create_encoded_figure(
+            img,
+            scale=scale,
+            render=render,
+            quality=quality,
+            display_max_side=display_max_side,
+            source_shape=image_dimensions(img_path),
+        )
+    else:
+        fig = px.imshow(img, color_continuous_scale=scale)
+    fig.update_layout(
+        coloraxis_showscale=False,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(showticklabels=False),
+        yaxis=dict(showticklabels=False),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+    )
+
+    figure_json = pio.to_json(fig, validate=False)
+    image_cache.put(cache_key, img, figure_json)
+    if store_key is not None:
+        thumbnail_store.put(store_key, figure_json)
+
+    return fig
+
+
+def load_raw_image(img_path, max_pixels=178956970, max_side=None):
+    """
+    This function returns the decoded image (native dtype) and its histogram,
+    from the raw image cache when possible. Decoded images only depend on the
+    file and the resolution they were read at, so every contrast setting or
+    composite that uses the file shares the same entry.
+    Returns None if the image cannot be read.
+    """
+    raw_key = image_cache.make_key(img_path, "raw", max_pixels, max_side)
+    raw_entry = raw_image_cache.get(raw_key)
+    if raw_entry is not None:
+        return raw_entry
+
+    img = read_image_from_filepath(img_path, max_pixels, max_side)
+    if img is None:
+        return None
+    return raw_image_cache.put(raw_key, img)
+
+
+def read_image_from_filepath(img_path, max_pixels=178956970, max_side=None):
+    """
+    This function decodes an image file into a numpy array in its native dtype.
+    Uncompressed TIFFs are read as a strided subsample (bounded by `max_side`
+    and `max_pixels`); other files are decoded with PIL, OpenCV or tifffile and
+    resized if they exceed `max_pixels`. Returns None if every reader fails.
     """
 
     img = None
@@ -527,18 +787,24 @@ def create_figure_from_filepath(img_path, scale="gray", max_pixels=178956970):
     warnings.filterwarnings("ignore", category=Image.DecompressionBombWarning)
     Image.MAX_IMAGE_PIXELS = 1000000000  # Increase the limit to 1 billion pixels
 
-    # Try opening the image with PIL
+    # Fast path for uncompressed TIFFs: memory-map the file and read only a
+    # strided subsample at the target resolution instead of decoding everything
+    if img_extension in [".tif", ".tiff"]:
+        img = read_tiff_strided(img_path, max_side=max_side, max_pixels=max_pixels)
 
-    try:
-        img = Image.open(img_path)
-        # Calculate thumbnail size to limit memory use but maintain aspect ratio
-        if img.width * img.height > max_pixels:
-            scale = (max_pixels / (img.width * img.height)) ** 0.5
-            thumbnail_size = (int(img.width * scale), int(img.height * scale))
-            img.thumbnail(thumbnail_size, Image.LANCZOS)
-        img = np.array(img)
-    except Exception as e:
-        print(f"Error opening {img_path} with PIL: {e}")
+    # Try opening the image with PIL
+    if img is None:
+        try:
+            img = Image.open(img_path)
+            # Calculate thumbnail size to limit memory use but maintain aspect ratio
+            if img.width * img.height > max_pixels:
+                ratio = (max_pixels / (img.width * img.height)) ** 0.5
+                thumbnail_size = (int(img.width * ratio), int(img.height * ratio))
+                img.thumbnail(thumbnail_size, Image.LANCZOS)
+            img = np.array(img)
+        except Exception as e:
+            img = None
+            print(f"Error opening {img_path} with PIL: {e}")
 
     # Try opening with OpenCV if PIL fails
     if img is None and img_extension not in [".tif", ".tiff"]:
@@ -563,10 +829,6 @@ def create_figure_from_filepath(img_path, scale="gray", max_pixels=178956970):
             # Handle 3D shape if necessary
             if len(img.shape) == 3 and img.shape[2] == 2:
                 img = img[:, :, 0]
-            if img.dtype != np.uint8:
-                img = exposure.rescale_intensity(img, out_range=(0, 255)).astype(
-                    np.uint8
-                )
         except Exception as e:
             print(f"Error opening {img_path} with tifffile: {e}")
             return None
@@ -582,18 +844,7 @@ def create_figure_from_filepath(img_path, scale="gray", max_pixels=178956970):
         print(f"Resizing image to {new_size} due to size {total_pixels} > {max_pixels}")
         img = np.array(Image.fromarray(img).resize(new_size, Image.ANTIALIAS))
 
-    # Proceed with creating the figure using plotly
-    fig = px.imshow(img, color_continuous_scale=scale)
-    fig.update_layout(
-        coloraxis_showscale=False,
-        margin=dict(l=0, r=0, t=0, b=0),
-        xaxis=dict(showticklabels=False),
-        yaxis=dict(showticklabels=False),
-        plot_bgcolor="white",
-        paper_bgcolor="white",
-    )
-
-    return fig
+    return img
 
 
 def update_yaml_file(input_full_yaml, output_full_yaml, updates):
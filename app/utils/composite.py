@@ -0,0 +1,215 @@
+# In[1]: Imports
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from plotly.colors import hex_to_rgb
+
+from app.utils.callback_functions import load_raw_image
+from app.utils.contrast import DEFAULT_CONTRAST, apply_window, window_lut
+from app.utils.image_cache import image_cache
+from app.utils.plate_index import get_plate_index
+from app.utils.image_rendering import (
+    PREVIEW_DISPLAY_MAX_SIDE,
+    PREVIEW_RENDER_MODE,
+    PREVIEW_JPEG_QUALITY,
+    create_encoded_figure,
+)
+
+# In[2]: Settings
+
+# Colours offered for each channel, and the default colour of w1, w2, ...
+CHANNEL_COLORS = {
+    "Blue": "#0000FF",
+    "Green": "#00FF00",
+    "Red": "#FF0000",
+    "Magenta": "#FF00FF",
+    "Cyan": "#00FFFF",
+    "Yellow": "#FFFF00",
+    "Gray": "#FFFFFF",
+}
+DEFAULT_CHANNEL_COLORS = ["Blue", "Green", "Red", "Magenta"]
+DEFAULT_CHANNEL_GAIN = 1.0
+
+# Number of channels with colour/gain controls in the preview page
+COMPOSITE_MAX_CHANNELS = 4
+
+# Number of channels loaded concurrently
+COMPOSITE_MAX_WORKERS = 4
+
+# Number of per-channel lookup tables kept around
+MAX_CACHED_LUTS = 64
+
+_luts = OrderedDict()
+_luts_lock = threading.Lock()
+
+# In[3]: Helper functions
+
+
+def find_channel_files(timepoint_dir, plate_base, well):
+    """
+    This function finds the w1..wN images of a well (first site only), keyed by wavelength.
+    """
+    timepoint_dir = Path(timepoint_dir)
+    plate_index = get_plate_index(timepoint_dir.parent, plate_base)
+
+    channels = {}
+    for record in plate_index.find(well, timepoint=timepoint_dir.name):
+        # Skip thumbnails and other derived files (<plate>_<well>_w1_thumb....tif)
+        if (
+            record.wavelength
+            and record.path.stem.endswith(record.wavelength)
+            and record.suffix.lower() in [".tif", ".tiff"]
+        ):
+            channels.setdefault(record.wavelength, record.path)
+    return dict(sorted(channels.items(), key=lambda item: int(item[0][1:])))
+
+
+def channel_lut(img_path, histogram, contrast, max_side):
+    """
+    This function returns the windowing lookup table of a channel, cached per
+    file identity and contrast setting.
+    """
+    key = image_cache.make_key(img_path, "lut", max_side, tuple(contrast))
+    with _luts_lock:
+        if key is not None and key in _luts:
+            _luts.move_to_end(key)
+            return _luts[key]
+
+    lut = window_lut(histogram, contrast)
+
+    with _luts_lock:
+        if key is not None:
+            _luts[key] = lut
+            while len(_luts) > MAX_CACHED_LUTS:
+                _luts.popitem(last=False)
+    return lut
+
+
+def load_channel(img_path, contrast=DEFAULT_CONTRAST, max_side=PREVIEW_DISPLAY_MAX_SIDE):
+    """
+    This function loads one channel at display resolution and windows it to uint8.
+    Returns None if the image cannot be read.
+    """
+    raw_entry = load_raw_image(img_path, max_side=max_side)
+    if raw_entry is None:
+        return None
+    img, histogram = raw_entry
+
+    # Composites are built from single-channel images
+    if img.ndim == 3:
+        img = img[:, :, :3].mean(axis=2).astype(img.dtype)
+        histogram = None
+
+    if histogram is None:
+        return apply_window(img, contrast)
+    return apply_window(img, lut=channel_lut(img_path, histogram, contrast, max_side))
+
+
+def blend_channels(channels, colors, gains):
+    """
+    This function blends uint8 channels into an RGB image: every channel is
+    tinted with its colour, scaled by its gain and added, saturating at 255.
+    Each channel goes through a (256, 3) colour lookup table, so the blend is
+    one integer gather-and-add per channel.
+    """
+    height, width = channels[0].shape
+    planes = np.zeros((3, height, width), dtype=np.uint16)
+    levels = np.arange(256, dtype=np.float32)
+
+    for channel, color, gain in zip(channels, colors, gains):
+        if channel.shape != (height, width):
+            channel = np.array(
+                Image.fromarray(channel).resize((width, height), Image.BILINEAR)
+            )
+        weights = hex_to_rgb(CHANNEL_COLORS.get(color, color))
+        for plane, weight in zip(planes, weights):
+            if weight and gain:
+                lut = np.clip(levels * (weight * float(gain) / 255.0), 0, 255)
+                plane += np.take(lut.astype(np.uint16), channel)
+
+    np.minimum(planes, 255, out=planes)
+    return np.ascontiguousarray(planes.astype(np.uint8).transpose(1, 2, 0))
+
+
+# In[4]: Composite figure
+
+
+def create_composite_figure(
+    channel_paths,
+    colors=None,
+    gains=None,
+    contrast=DEFAULT_CONTRAST,
+    render=PREVIEW_RENDER_MODE,
+    quality=PREVIEW_JPEG_QUALITY,
+    display_max_side=PREVIEW_DISPLAY_MAX_SIDE,
+):
+    """
+    This function creates a single RGB figure from the channels of a well.
+    Channels are loaded in parallel and windowed with their cached lookup
+    tables; `colors` and `gains` are per channel (in the order of `channel_paths`).
+    Returns None if no channel could be read.
+    """
+    channel_paths = list(channel_paths)
+    if not channel_paths:
+        return None
+    colors = list(colors or [])
+    gains = list(gains or [])
+    colors += DEFAULT_CHANNEL_COLORS[len(colors) : len(channel_paths)]
+    colors += ["Gray"] * (len(channel_paths) - len(colors))
+    gains += [DEFAULT_CHANNEL_GAIN] * (len(channel_paths) - len(gains))
+    gains = [DEFAULT_CHANNEL_GAIN if gain is None else gain for gain in gains]
+    contrast = tuple(contrast)
+
+    # Key on the identity of every channel file, so any rewritten channel is picked up
+    file_keys = tuple(image_cache.make_key(path) for path in channel_paths)
+    cache_key = None
+    if None not in file_keys:
+        cache_key = (
+            "composite",
+            file_keys,
+            tuple(colors),
+            tuple(gains),
+            contrast,
+            render,
+            quality,
+            display_max_side,
+        )
+    cached_fig = image_cache.get_figure(cache_key)
+    if cached_fig is not None:
+        return cached_fig
+
+    with ThreadPoolExecutor(max_workers=COMPOSITE_MAX_WORKERS) as executor:
+        channels = list(
+            executor.map(
+                lambda path: load_channel(path, contrast, display_max_side),
+                channel_paths,
+            )
+        )
+
+    loaded = [
+        (channel, color, gain)
+        for channel, color, gain in zip(channels, colors, gains)
+        if channel is not None
+    ]
+    if not loaded:
+        return None
+    rgb = blend_channels(*zip(*loaded))
+
+    fig, _ = create_encoded_figure(
+        rgb, render=render, quality=quality, display_max_side=display_max_side
+    )
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(showticklabels=False),
+        yaxis=dict(showticklabels=False),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+    )
+
+    image_cache.put(cache_key, rgb, fig)
+    return fig
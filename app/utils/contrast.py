@@ -0,0 +1,172 @@
+# In[1]: Imports
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# In[2]: Settings
+
+# Default display window, as percentiles of the image histogram. Clipping the
+# extreme tails keeps a single hot pixel from washing out the whole image.
+DEFAULT_LOW_PERCENTILE = 0.1
+DEFAULT_HIGH_PERCENTILE = 99.9
+DEFAULT_CONTRAST = (DEFAULT_LOW_PERCENTILE, DEFAULT_HIGH_PERCENTILE)
+
+# Memory budget (in bytes) for decoded images kept around for re-windowing
+RAW_IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# In[3]: Windowing functions
+
+
+def to_histogram_domain(img):
+    """
+    This function maps an image onto non-negative integers that can be counted
+    with np.bincount: uint8/uint16 are used as-is, anything else (signed, 32-bit,
+    float) is linearly rescaled to uint16.
+    """
+    if img.dtype in [np.uint8, np.uint16]:
+        return img
+    if img.dtype == bool:
+        return img.astype(np.uint8)
+
+    low, high = float(np.min(img)), float(np.max(img))
+    if high <= low:
+        return np.zeros(img.shape, dtype=np.uint16)
+    return ((img.astype(np.float64) - low) * (65535.0 / (high - low))).astype(
+        np.uint16
+    )
+
+
+def compute_histogram(img):
+    """
+    This function computes the full-resolution intensity histogram of an image
+    in a single pass (256 bins for uint8 images, 65536 bins otherwise).
+    """
+    img = to_histogram_domain(img)
+    bins = 256 if img.dtype == np.uint8 else 65536
+    return np.bincount(img.ravel(), minlength=bins)
+
+
+def percentile_limits(histogram, low_percentile, high_percentile):
+    """
+    This function derives the (low, high) clip limits at the given percentiles
+    from a histogram, without touching the pixels again.
+    """
+    cdf = np.cumsum(histogram)
+    total = cdf[-1]
+    if total == 0:
+        return 0, len(histogram) - 1
+
+    low = int(np.searchsorted(cdf, total * low_percentile / 100.0, side="left"))
+    high = int(np.searchsorted(cdf, total * high_percentile / 100.0, side="left"))
+    high = min(high, len(histogram) - 1)
+
+    # Fall back to the full occupied range for (nearly) flat images
+    if high <= low:
+        occupied = np.flatnonzero(histogram)
+        low, high = int(occupied[0]), int(occupied[-1])
+    return low, high
+
+
+def build_lut(low, high, bins):
+    """
+    This function builds a lookup table mapping every input level to uint8,
+    stretching [low, high] to [0, 255] and clipping outside it.
+    """
+    if high <= low:
+        return np.zeros(bins, dtype=np.uint8)
+    levels = np.arange(bins, dtype=np.float32)
+    return np.clip((levels - low) * (255.0 / (high - low)), 0, 255).astype(np.uint8)
+
+
+def window_lut(histogram, contrast=DEFAULT_CONTRAST):
+    """
+    This function builds the uint8 lookup table for a percentile window of a histogram.
+    """
+    low, high = percentile_limits(histogram, *contrast)
+    return build_lut(low, high, len(histogram))
+
+
+def window_limits(img, contrast=DEFAULT_CONTRAST):
+    """
+    This function returns the (low, high) percentile window of an image in its
+    own intensity units, e.g. to window several reads of one image alike.
+    """
+    low, high = percentile_limits(compute_histogram(img), *contrast)
+    if img.dtype in [np.uint8, np.uint16, bool]:
+        return float(low), float(high)
+
+    # Map the limits back from the uint16 rescaling of to_histogram_domain
+    img_low, img_high = float(np.min(img)), float(np.max(img))
+    step = (img_high - img_low) / 65535.0
+    return img_low + low * step, img_low + high * step
+
+
+def apply_window(img, contrast=DEFAULT_CONTRAST, histogram=None, lut=None):
+    """
+    This function converts an image to uint8 with a percentile window, using a
+    single lookup-table pass. Pass a precomputed `histogram` (or `lut`) to
+    change the window without re-scanning the pixels.
+    """
+    img = to_histogram_domain(img)
+    if lut is None:
+        if histogram is None:
+            histogram = compute_histogram(img)
+        lut = window_lut(histogram, contrast)
+    return lut[img]
+
+
+# In[4]: Raw Image Cache
+
+
+class RawImageCache:
+    """
+    Bounded LRU cache of decoded (not yet windowed) images and their histograms,
+    so a new contrast setting can be applied without re-reading the file.
+    """
+
+    def __init__(self, max_bytes=RAW_IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (image, histogram) for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, img):
+        """
+        Store a decoded image under `key` together with its histogram.
+        Returns the (image, histogram) pair.
+        """
+        histogram = compute_histogram(img)
+        if key is None:
+            return img, histogram
+
+        nbytes = img.nbytes + histogram.nbytes
+        if nbytes > self.max_bytes:
+            return img, histogram
+
+        with self._lock:
+            if key in self._entries:
+                old_img, old_histogram = self._entries.pop(key)
+                self.current_bytes -= old_img.nbytes + old_histogram.nbytes
+            self._entries[key] = (img, histogram)
+            self.current_bytes += nbytes
+
+            while self.current_bytes > self.max_bytes:
+                _, (old_img, old_histogram) = self._entries.popitem(last=False)
+                self.current_bytes -= old_img.nbytes + old_histogram.nbytes
+
+        return img, histogram
+
+
+# Process-wide cache used by create_figure_from_filepath
+raw_image_cache = RawImageCache()
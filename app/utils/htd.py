@@ -0,0 +1,210 @@
+# In[1]: Imports
+
+import csv
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+# In[2]: Settings
+
+# Encodings tried, in order, when reading an HTD file
+HTD_ENCODINGS = ["utf-8", "utf-16", "iso-8859-1"]
+
+# Number of parsed HTD files kept per process
+MAX_CACHED_HTD = 32
+
+# In[3]: HTD data classes
+
+
+@dataclass(frozen=True)
+class HtdWavelength:
+    """One wavelength of an HTD file ("WaveName<n>" / "WaveCollect<n>")."""
+
+    index: int
+    name: str
+    collect: bool = True
+
+    @property
+    def id(self):
+        """File name tag of the wavelength, e.g. "w1"."""
+        return f"w{self.index}"
+
+
+@dataclass(frozen=True)
+class HtdInfo:
+    """
+    Contents of a MetaXpress plate description (.HTD) file.
+
+    `wells_selection[row][col]` and `sites_selection[y][x]` are the selection
+    masks of the acquisition; `fields` holds every key of the file with its raw
+    values, for keys without a dedicated attribute.
+    """
+
+    path: str
+    description: str = None
+    plate_type: int = None
+    time_points: int = 1
+    z_steps: int = 1
+    x_wells: int = None
+    y_wells: int = None
+    wells_selection: tuple = ()
+    sites: bool = False
+    x_sites: int = 1
+    y_sites: int = 1
+    sites_selection: tuple = ()
+    waves: bool = False
+    wavelengths: tuple = ()
+    fields: tuple = ()
+
+    @property
+    def selected_wells(self):
+        """Return the acquired wells, e.g. ["A01", "A02", ...]."""
+        return [
+            f"{chr(ord('A') + row)}{col + 1:02d}"
+            for row, selection in enumerate(self.wells_selection)
+            for col, selected in enumerate(selection)
+            if selected
+        ]
+
+    @property
+    def n_sites(self):
+        """Return the number of acquired sites per well."""
+        if not self.sites:
+            return 1
+        if self.sites_selection:
+            return sum(sum(row) for row in self.sites_selection) or 1
+        return self.x_sites * self.y_sites
+
+    @property
+    def wavelength_ids(self):
+        """Return the file name tags of the acquired wavelengths, e.g. ["w1", "w2"]."""
+        if not self.waves:
+            return []
+        return [wavelength.id for wavelength in self.wavelengths if wavelength.collect]
+
+    def expected_files_per_well(self):
+        """Return the number of images per well and time point."""
+        return self.n_sites * max(len(self.wavelength_ids), 1)
+
+    def expected_file_count(self, wells=None):
+        """
+        Return the number of images expected for `wells` (all acquired wells by
+        default) over all time points.
+        """
+        n_wells = len(self.selected_wells if wells is None else wells)
+        return n_wells * self.time_points * self.expected_files_per_well()
+
+    def get(self, key, default=None):
+        """Return the raw values of any key of the file."""
+        for field_key, values in self.fields:
+            if field_key == key:
+                return values
+        return default
+
+
+# In[4]: Parsing
+
+
+def _convert(value):
+    value = value.strip()
+    if value.upper() == "TRUE":
+        return True
+    if value.upper() == "FALSE":
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _read_text(path):
+    for encoding in HTD_ENCODINGS:
+        try:
+            with open(path, "r", encoding=encoding) as f:
+                text = f.read()
+            # A UTF-16 file read as UTF-8 raises; one read as latin-1 is full of NULs
+            if "\x00" not in text:
+                return text
+        except UnicodeError:
+            continue
+    raise ValueError(f"Could not decode {path} (tried {', '.join(HTD_ENCODINGS)})")
+
+
+def parse_htd_text(text, path=""):
+    """
+    This function parses the text of an HTD file: one `"Key", value, ...`
+    record per line, where values are quoted strings, integers or TRUE/FALSE.
+    """
+    fields = []
+    for row in csv.reader(text.splitlines(), skipinitialspace=True):
+        if not row or not row[0].strip():
+            continue
+        fields.append((row[0].strip(), tuple(_convert(value) for value in row[1:])))
+    values = dict(fields)
+
+    def first(key, default=None):
+        return values[key][0] if values.get(key) else default
+
+    def selection(prefix, rows):
+        return tuple(
+            tuple(bool(value) for value in values.get(f"{prefix}{row + 1}", ()))
+            for row in range(rows or 0)
+            if f"{prefix}{row + 1}" in values
+        )
+
+    y_wells = first("YWells")
+    y_sites = first("YSites", 1)
+    wavelengths = tuple(
+        HtdWavelength(
+            index=index,
+            name=str(first(f"WaveName{index}", f"w{index}")),
+            collect=bool(first(f"WaveCollect{index}", True)),
+        )
+        for index in range(1, (first("NWavelengths", 0) or 0) + 1)
+    )
+
+    return HtdInfo(
+        path=str(path),
+        description=first("Description"),
+        plate_type=first("PlateType"),
+        time_points=first("TimePoints", 1) or 1,
+        z_steps=first("ZSteps", 1) or 1,
+        x_wells=first("XWells"),
+        y_wells=y_wells,
+        wells_selection=selection("WellsSelection", y_wells),
+        sites=bool(first("Sites", False)),
+        x_sites=first("XSites", 1),
+        y_sites=y_sites,
+        sites_selection=selection("SiteSelection", y_sites),
+        waves=bool(first("Waves", False)),
+        wavelengths=wavelengths,
+        fields=tuple(fields),
+    )
+
+
+@lru_cache(maxsize=MAX_CACHED_HTD)
+def _read_htd_cached(path, mtime_ns, size):
+    return parse_htd_text(_read_text(path), path)
+
+
+def read_htd(path):
+    """
+    This function returns the parsed HTD file at `path`. Parsed files are
+    memoized by (path, mtime, size), so they are read again only when they change.
+    Raises OSError if the file cannot be read and ValueError if it cannot be decoded.
+    """
+    path = str(Path(path))
+    stat = os.stat(path)
+    return _read_htd_cached(path, stat.st_mtime_ns, stat.st_size)
+
+
+def find_htd_file(plate_dir, plate_base):
+    """
+    This function returns the HTD file of a plate (<plate_base>.HTD or .htd), or None.
+    """
+    for suffix in [".HTD", ".htd"]:
+        htd_file = Path(plate_dir, f"{plate_base}{suffix}")
+        if htd_file.exists():
+            return htd_file
+    return None
@@ -0,0 +1,136 @@
+# In[1]: Imports
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import plotly.io as pio
+
+# In[2]: Settings
+
+# Memory budget (in bytes) shared by every decoded image and figure held in the cache
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# In[3]: Image Cache
+
+
+class ImageCache:
+    """
+    Bounded in-process LRU cache for decoded preview images.
+
+    Each entry holds the downsampled uint8 array and the serialized plotly
+    figure built from it. Entries are keyed on the file identity (path, mtime
+    and size) plus the rendering options, so an image that is rewritten on disk
+    is never served stale. The least recently used entries are evicted once the
+    total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(img_path, *options):
+        """
+        Build a cache key from the file identity and the rendering options.
+        Returns None if the file cannot be stat'ed.
+        """
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return None
+        return (
+            str(Path(img_path).resolve()),
+            stat.st_mtime_ns,
+            stat.st_size,
+            *options,
+        )
+
+    def get(self, key):
+        """
+        Return the cached entry for `key` (a dict with "array" and "figure"),
+        or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get_figure(self, key):
+        """
+        Return the cached figure for `key` as a new go.Figure (the same type as
+        a freshly built figure, so callers may modify it), or None on a miss.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        return pio.from_json(entry["figure"], skip_invalid=True)
+
+    def put(self, key, array, figure):
+        """
+        Store the decoded array and the figure (serialized to JSON unless it
+        already is) under `key`, evicting least recently used entries until the
+        cache fits its budget.
+        """
+        if key is None:
+            return
+
+        figure_json = (
+            figure if isinstance(figure, str) else pio.to_json(figure, validate=False)
+        )
+        nbytes = array.nbytes + len(figure_json)
+
+        # Entries larger than the whole budget are never cached
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)["nbytes"]
+
+            self._entries[key] = {
+                "array": array,
+                "figure": figure_json,
+                "nbytes": nbytes,
+            }
+            self.current_bytes += nbytes
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted["nbytes"]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Return the hit/miss counters and the current memory use of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Process-wide cache used by create_figure_from_filepath
+image_cache = ImageCache()
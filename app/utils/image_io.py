@@ -0,0 +1,79 @@
+# In[1]: Imports
+
+import math
+import numpy as np
+import tifffile as tiff
+from PIL import Image
+
+# In[2]: Helper functions
+
+
+def open_tiff_memmap(img_path):
+    """
+    This function memory-maps an uncompressed TIFF so that pixels are only read
+    from disk when they are accessed. Returns None for compressed, tiled or
+    otherwise non-contiguous TIFFs, which tifffile cannot map.
+    """
+    try:
+        return tiff.memmap(img_path, mode="r")
+    except Exception:
+        return None
+
+
+def image_dimensions(img_path):
+    """
+    This function returns the (height, width) of an image from its header,
+    without decoding the pixels. Returns None if the file cannot be read.
+    """
+    try:
+        with tiff.TiffFile(img_path) as tif:
+            shape = tif.pages[0].shape
+            # Planar (channel-first) pages are (samples, height, width)
+            planar = len(shape) == 3 and shape[0] in [2, 3, 4]
+            if planar and shape[2] not in [2, 3, 4]:
+                return shape[1], shape[2]
+            return shape[0], shape[1]
+    except Exception:
+        pass
+    try:
+        with Image.open(img_path) as img:
+            return img.height, img.width
+    except Exception:
+        return None
+
+
+def strided_step(height, width, max_side=None, max_pixels=None):
+    """
+    This function returns the smallest integer stride that brings an image of
+    `height` x `width` within `max_side` (longest side) and `max_pixels`.
+    """
+    step = 1
+    if max_side:
+        step = max(step, math.ceil(max(height, width) / max_side))
+    if max_pixels and height * width > max_pixels:
+        step = max(step, math.ceil(math.sqrt(height * width / max_pixels)))
+    return step
+
+
+def read_tiff_strided(img_path, max_side=None, max_pixels=None):
+    """
+    This function reads a strided subsample of an uncompressed TIFF through a
+    memory map, so only the sampled rows are paged in and peak memory scales
+    with the target resolution rather than with the image size.
+    Returns None if the TIFF cannot be memory-mapped (callers fall back to a full decode).
+    """
+    source = open_tiff_memmap(img_path)
+    if source is None:
+        return None
+
+    # Only plain 2D images and channel-last images are handled here
+    if source.ndim == 3 and source.shape[2] == 2:
+        source = source[:, :, 0]
+    elif source.ndim != 2 and not (source.ndim == 3 and source.shape[2] in [3, 4]):
+        return None
+
+    height, width = source.shape[:2]
+    step = strided_step(height, width, max_side, max_pixels)
+
+    # np.array copies the sampled pixels out of the map so the file can be closed
+    return np.array(source[::step, ::step])
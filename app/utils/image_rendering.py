@@ -0,0 +1,147 @@
+# In[1]: Imports
+
+import io
+import base64
+import numpy as np
+from PIL import Image
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.colors import sample_colorscale
+from skimage import exposure
+
+# In[2]: Settings
+
+# How preview figures are shipped to the browser:
+#   "png"/"jpeg" encode a display-resolution image once, server-side
+#   "heatmap" sends the full pixel matrix as a plotly z-matrix (legacy behaviour)
+PREVIEW_RENDER_MODE = "png"
+PREVIEW_JPEG_QUALITY = 85
+PREVIEW_DISPLAY_MAX_SIDE = 2048
+
+ENCODED_RENDER_MODES = ["png", "jpeg"]
+
+# In[3]: Helper functions
+
+
+def to_uint8(img):
+    """
+    This function converts an image of any dtype to uint8 by stretching its intensity range.
+    """
+    if img.dtype == np.uint8:
+        return img
+    if img.dtype == bool:
+        return img.astype(np.uint8) * 255
+    return exposure.rescale_intensity(img, out_range=(0, 255)).astype(np.uint8)
+
+
+def downsample_to_display(img, display_max_side=PREVIEW_DISPLAY_MAX_SIDE):
+    """
+    This function shrinks an image so that its longest side is at most `display_max_side`.
+    Returns the (possibly) resized image and the scaling factor back to the original pixels.
+    """
+    height, width = img.shape[:2]
+    longest_side = max(height, width)
+    if not display_max_side or longest_side <= display_max_side:
+        return img, 1.0
+
+    ratio = display_max_side / longest_side
+    new_size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+    resized = np.array(Image.fromarray(img).resize(new_size, Image.LANCZOS))
+    return resized, width / new_size[0]
+
+
+def apply_colormap(img, scale="gray"):
+    """
+    This function stretches a 2D uint8 image to the full intensity range, mirroring
+    what px.imshow does with `color_continuous_scale` (auto-scaled to the data range).
+    Returns the stretched image and a (256, 3) palette for `scale`, or None for
+    grayscale. RGB(A) images are returned unchanged with no palette.
+    """
+    if img.ndim != 2:
+        return img, None
+
+    low, high = int(img.min()), int(img.max())
+    if high > low:
+        lut = np.clip(
+            (np.arange(256, dtype=np.float32) - low) * 255.0 / (high - low), 0, 255
+        ).astype(np.uint8)
+        img = lut[img]
+
+    return img, colormap_palette(scale)
+
+
+def colormap_palette(scale="gray"):
+    """
+    This function samples a plotly colorscale into a (256, 3) uint8 palette.
+    Returns None for grayscale.
+    """
+    if scale == "gray":
+        return None
+
+    colorscale = px.colors.get_colorscale(scale)
+    colors = sample_colorscale(colorscale, np.linspace(0, 1, 256), colortype="tuple")
+    return np.round(np.array(colors) * 255).astype(np.uint8)
+
+
+def encode_image(
+    img, render=PREVIEW_RENDER_MODE, quality=PREVIEW_JPEG_QUALITY, palette=None
+):
+    """
+    This function encodes a uint8 image as a base64 PNG or JPEG data URI.
+    A 2D image with a `palette` is written as a paletted PNG (one byte per pixel)
+    or expanded to RGB for JPEG.
+    """
+    if palette is not None and render == "jpeg":
+        img, palette = palette[img], None
+
+    pil_img = Image.fromarray(img)
+    if palette is not None:
+        pil_img.putpalette(palette.flatten().tolist())
+
+    buffer = io.BytesIO()
+    if render == "jpeg":
+        if pil_img.mode not in ["L", "RGB"]:
+            pil_img = pil_img.convert("RGB")
+        pil_img.save(buffer, format="JPEG", quality=quality)
+        mime = "image/jpeg"
+    else:
+        pil_img.save(buffer, format="PNG", compress_level=3)
+        mime = "image/png"
+
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f"data:{mime};base64,{encoded}"
+
+
+def create_encoded_figure(
+    img,
+    scale="gray",
+    render=PREVIEW_RENDER_MODE,
+    quality=PREVIEW_JPEG_QUALITY,
+    display_max_side=PREVIEW_DISPLAY_MAX_SIDE,
+    source_shape=None,
+):
+    """
+    This function creates a figure that embeds the image as a compressed PNG/JPEG
+    (a `go.Image` source) instead of a JSON-encoded pixel matrix.
+    The image is downsampled to display resolution. Axes are in the pixels of
+    `img`, or of the source image when its (height, width) `source_shape` is
+    given (e.g. when `img` was already read at a stride), so zoom/pan and hover
+    positions match the source file.
+    Returns the figure and the display-resolution uint8 array that was encoded.
+    """
+    img = to_uint8(img)
+    display_img, pixel_scale = downsample_to_display(img, display_max_side)
+    if source_shape is not None and display_img.shape[1]:
+        pixel_scale = source_shape[1] / display_img.shape[1]
+    display_img, palette = apply_colormap(display_img, scale)
+
+    fig = go.Figure(
+        go.Image(
+            source=encode_image(display_img, render, quality, palette),
+            dx=pixel_scale,
+            dy=pixel_scale,
+            hoverinfo="x+y",
+        )
+    )
+
+    return fig, display_img
@@ -0,0 +1,112 @@
+# In[1]: Imports
+
+import re
+from collections import namedtuple
+
+# In[2]: Settings
+
+# Word-like tokens of a line; wells are looked up among them in a set
+_TOKEN = re.compile(r"\w+")
+
+# "<well> <i>/<n>": a well starts processing (imagexpress pipelines)
+_WELL_PROGRESS = re.compile(r"^\s*(?P<well>\w+) (?P<current>\d+)/(?P<total>\d+)\s*$")
+
+# "... Image # <n> ...": CellProfiler starts an image
+_IMAGE_NUMBER = re.compile(r"Image # (?P<number>\d+)")
+
+# "Tracking well <well>.<ext>" / "Running well <well>": tracking and AVI pipelines
+_TRACKING_WELL = re.compile(r"\b(?P<kind>Tracking|Running) well\b")
+
+# "[INFO] ... <i>/<n> ... %": per-well progress bars (e.g. cellpose)
+_INFO_PROGRESS = re.compile(r"\[INFO\].*?(?P<current>\d+)/(?P<total>\d+)")
+
+# Python tracebacks, logged errors and "SomethingError: ..." lines
+_ERROR = re.compile(
+    r"Traceback \(most recent call last\)|\[ERROR\]|^\s*\w*(?:Error|Exception)\b:?"
+)
+
+LineEvent = namedtuple(
+    "LineEvent",
+    ["kind", "well", "current", "total", "image_number", "well_count"],
+)
+
+# In[3]: Line Classifier
+
+
+class LineClassifier:
+    """
+    Classifies lines of wrmXpress output, built once per run.
+
+    Each line is tokenized once; the selected wells are found with a set
+    lookup over its tokens (instead of compiling a regex of every well for
+    every line), and the known progress forms are recognized in the same pass.
+    `classify` returns a LineEvent whose kind is:
+      "well_progress"  "<well> <i>/<n>"
+      "image"          "Image # <n>" (CellProfiler)
+      "tracking"       "Tracking well <well>" / "Running well <well>"
+      "reconfiguring"  "Reconfiguring ..."
+      "info_progress"  "[INFO] ... <i>/<n> ... %"
+      "error"          tracebacks, "[ERROR] ..." and "...Error: ..." lines
+      None             anything else
+    `well_count` is the number of selected wells mentioned in the line.
+    """
+
+    def __init__(self, wells):
+        self.wells = frozenset(str(well) for well in wells)
+
+    def count_wells(self, line):
+        """Return the number of selected wells mentioned in a line."""
+        return sum(1 for token in _TOKEN.findall(line) if token in self.wells)
+
+    def classify(self, line):
+        well_count = self.count_wells(line)
+
+        if well_count == 1:
+            match = _WELL_PROGRESS.match(line)
+            if match and match.group("well") in self.wells:
+                return LineEvent(
+                    "well_progress",
+                    match.group("well"),
+                    int(match.group("current")),
+                    int(match.group("total")),
+                    None,
+                    well_count,
+                )
+
+        if "Image #" in line:
+            match = _IMAGE_NUMBER.search(line)
+            if match:
+                return LineEvent(
+                    "image", None, None, None, int(match.group("number")), well_count
+                )
+
+        if " well" in line:
+            match = _TRACKING_WELL.search(line)
+            if match:
+                well = line.split(" ")[-1].strip()
+                if match.group("kind") == "Tracking":
+                    well = well.split(".")[0]
+                return LineEvent("tracking", well, None, None, None, well_count)
+
+        if "Reconfiguring" in line:
+            return LineEvent("reconfiguring", None, None, None, None, well_count)
+
+        if "[INFO]" in line and "%" in line:
+            match = _INFO_PROGRESS.search(line)
+            if match:
+                return LineEvent(
+                    "info_progress",
+                    None,
+                    int(match.group("current")),
+                    int(match.group("total")),
+                    None,
+                    well_count,
+                )
+
+        if any(
+            word in line for word in ("Error", "ERROR", "Exception", "Traceback")
+        ):
+            if _ERROR.search(line):
+                return LineEvent("error", None, None, None, None, well_count)
+
+        return LineEvent(None, None, None, None, None, well_count)
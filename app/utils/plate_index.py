@@ -0,0 +1,201 @@
+# In[1]: Imports
+
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+# In[2]: Settings
+
+# Number of plate indexes kept per process
+MAX_CACHED_INDEXES = 16
+
+# <prefix>_<well>[_s<site>][_w<wavelength>][<rest>].<ext>, e.g. 20240101_A01_s1_w2.TIF
+_IMAGE_NAME = r"_(?P<well>[A-Za-z]{1,2}\d{1,3})(?:_s(?P<site>\d+))?(?:_w(?P<wavelength>\d+))?(?P<rest>.*?)\.(?P<ext>[^.]+)$"
+
+ImageRecord = namedtuple(
+    "ImageRecord",
+    ["path", "timepoint", "well", "site", "wavelength", "suffix"],
+)
+
+_ANY_PREFIX_PATTERN = re.compile(r"^(?P<prefix>.+?)" + _IMAGE_NAME)
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+# In[3]: Plate Index
+
+
+class PlateIndex:
+    """
+    Table of the images of a plate directory, built with one os.scandir pass
+    over the plate directory and each of its (timepoint) subdirectories.
+
+    File names are parsed once into (timepoint, well, site, wavelength)
+    records, so every later lookup (staging, validation, previews, progress)
+    is an in-memory query instead of a glob over the directory. Files directly
+    in the plate directory have timepoint None. `prefix` is the plate prefix of
+    the file names; with None, the prefix is whatever precedes the first well id.
+    """
+
+    def __init__(self, plate_dir, prefix=None):
+        self.plate_dir = Path(plate_dir)
+        self.prefix = prefix
+        self.records = []
+        self.timepoints = []
+        self.signature = None
+
+        if prefix is None:
+            self._pattern = _ANY_PREFIX_PATTERN
+        else:
+            self._pattern = re.compile(
+                r"^(?P<prefix>" + re.escape(prefix) + r")" + _IMAGE_NAME
+            )
+
+        self._by_well = {}
+        self.build()
+
+    def _scan(self, directory, timepoint):
+        """Parse the files of one directory; returns its subdirectories."""
+        subdirectories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirectories.append(entry)
+                    continue
+                match = self._pattern.match(entry.name)
+                if not match:
+                    continue
+                record = ImageRecord(
+                    path=Path(entry.path),
+                    timepoint=timepoint,
+                    well=match.group("well"),
+                    site=int(match.group("site")) if match.group("site") else None,
+                    wavelength=(
+                        f"w{match.group('wavelength')}"
+                        if match.group("wavelength")
+                        else None
+                    ),
+                    suffix="." + match.group("ext"),
+                )
+                self.records.append(record)
+                self._by_well.setdefault(record.well, []).append(record)
+        return subdirectories
+
+    def build(self):
+        """(Re)scan the plate directory and its subdirectories."""
+        self.records = []
+        self._by_well = {}
+
+        # Taken before scanning, so files added during the scan make the index stale
+        self.signature = directory_signature(self.plate_dir)
+        subdirectories = self._scan(self.plate_dir, None)
+        self.timepoints = sorted(entry.name for entry in subdirectories)
+        for entry in subdirectories:
+            self._scan(entry.path, entry.name)
+
+        self.records.sort(key=lambda record: record.path.name)
+        for records in self._by_well.values():
+            records.sort(key=lambda record: record.path.name)
+
+    def is_stale(self):
+        """Check whether files were added or removed since the index was built."""
+        return directory_signature(self.plate_dir) != self.signature
+
+    def find(
+        self,
+        well=None,
+        timepoint=Ellipsis,
+        site=Ellipsis,
+        wavelength=Ellipsis,
+        suffixes=None,
+    ):
+        """
+        Return the records matching every given criterion, sorted by file name.
+        `timepoint`, `site` and `wavelength` may be None (e.g. files outside a
+        timepoint directory); leave them out to match anything. `suffixes` is a
+        list of file extensions (exact case, e.g. [".tif", ".TIF"]).
+        """
+        records = self._by_well.get(well, []) if well is not None else self.records
+        return [
+            record
+            for record in records
+            if (timepoint is Ellipsis or record.timepoint == timepoint)
+            and (site is Ellipsis or record.site == site)
+            and (wavelength is Ellipsis or record.wavelength == wavelength)
+            and (suffixes is None or record.suffix in suffixes)
+        ]
+
+    def paths(self, *args, **kwargs):
+        """Same as `find`, returning the file paths."""
+        return [record.path for record in self.find(*args, **kwargs)]
+
+    def wells(self, timepoint=Ellipsis):
+        """Return the wells that have at least one image (in `timepoint`)."""
+        if timepoint is Ellipsis:
+            return set(self._by_well)
+        return {record.well for record in self.records if record.timepoint == timepoint}
+
+    def wavelengths(self, timepoint=Ellipsis):
+        """Return the wavelengths present (in `timepoint`), e.g. ["w1", "w2"]."""
+        wavelengths = {
+            record.wavelength
+            for record in self.records
+            if record.wavelength
+            and (timepoint is Ellipsis or record.timepoint == timepoint)
+        }
+        return sorted(wavelengths, key=lambda wavelength: int(wavelength[1:]))
+
+
+# In[4]: Helper functions
+
+
+def well_from_filename(name):
+    """
+    This function returns the well id in an image file name
+    (e.g. "A01" for 20240101_A01_s1_w2.TIF), or None.
+    """
+    match = _ANY_PREFIX_PATTERN.match(Path(name).name)
+    return match.group("well") if match else None
+
+
+def directory_signature(plate_dir):
+    """
+    This function returns the modification times of a plate directory and its
+    subdirectories, which change whenever files are added, removed or renamed.
+    Returns None if the directory does not exist.
+    """
+    try:
+        signature = [os.stat(plate_dir).st_mtime_ns]
+        with os.scandir(plate_dir) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    signature.append((entry.name, entry.stat().st_mtime_ns))
+    except OSError:
+        return None
+    return tuple(sorted(signature, key=str))
+
+
+def get_plate_index(plate_dir, prefix=None):
+    """
+    This function returns the index of `plate_dir`, reusing the cached index
+    unless files were added or removed since it was built.
+    """
+    key = (str(Path(plate_dir).resolve()), prefix)
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+
+    if index is not None and not index.is_stale():
+        return index
+
+    index = PlateIndex(plate_dir, prefix)
+
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
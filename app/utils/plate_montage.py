@@ -0,0 +1,231 @@
+# In[1]: Imports
+
+import re
+import time
+import threading
+
+import dash
+import numpy as np
+from PIL import Image
+import plotly.graph_objects as go
+
+from app.utils.callback_functions import read_image_from_filepath
+from app.utils.contrast import apply_window
+from app.utils.image_rendering import encode_image
+from app.utils.run_progress import PROGRESS_RESEND_SECONDS
+
+# In[2]: Settings
+
+# Side length (in pixels) of each well in the montage
+MONTAGE_TILE_SIZE = 96
+
+_WELL_PATTERN = re.compile(r"^([A-Za-z]+)0*(\d+)$")
+
+# In[3]: Helper functions
+
+
+def parse_well(well):
+    """
+    This function converts a well id (e.g. "A01", "P24", "AA3") to a zero-based (row, column).
+    Returns None if the id is not a well.
+    """
+    match = _WELL_PATTERN.match(str(well).strip())
+    if not match:
+        return None
+
+    letters, number = match.groups()
+    row = 0
+    for letter in letters.upper():
+        row = row * 26 + (ord(letter) - ord("A") + 1)
+    return row - 1, int(number) - 1
+
+
+def row_label(row):
+    """
+    This function converts a zero-based row index back to its letter(s).
+    """
+    label = ""
+    row += 1
+    while row > 0:
+        row, remainder = divmod(row - 1, 26)
+        label = chr(ord("A") + remainder) + label
+    return label
+
+
+def render_well_tile(img_path, tile_size=MONTAGE_TILE_SIZE):
+    """
+    This function reads a well image at (about) tile resolution and returns it as
+    a contrast-windowed uint8 image that fits in a `tile_size` square.
+    Returns None if the image cannot be read.
+    """
+    img = read_image_from_filepath(img_path, max_side=tile_size * 2)
+    if img is None:
+        return None
+
+    if img.ndim == 2 or img.dtype != np.uint8:
+        img = apply_window(img)
+
+    tile = Image.fromarray(img)
+    tile.thumbnail((tile_size, tile_size), Image.LANCZOS)
+    return np.array(tile)
+
+
+# In[4]: Plate Montage
+
+
+class PlateMontage:
+    """
+    Well-grid montage of a plate, filled in as wells are processed.
+
+    The montage is a fixed `rows` x `cols` grid of `tile_size` thumbnails. Every
+    well that is added only re-encodes its own tile; `update()` returns the
+    tiles changed since the last update for the `montage.merge_tiles`
+    clientside callback (assets/plate_montage.js), so the plate overview fills
+    in live without the full figure being rebuilt or re-sent. Like
+    ProgressStream, changes (and the base figure, at the start of the run) are
+    repeated for `resend_seconds`, since polled progress only delivers the
+    latest update.
+    """
+
+    def __init__(
+        self,
+        rows,
+        cols,
+        tile_size=MONTAGE_TILE_SIZE,
+        resend_seconds=PROGRESS_RESEND_SECONDS,
+    ):
+        self.rows = int(rows)
+        self.cols = int(cols)
+        self.tile_size = tile_size
+        self.resend_seconds = resend_seconds
+        self.run = f"{time.time():.6f}"
+        self.version = 0
+        self._tiles = {}
+        self._tile_times = {}
+        self._sent_version = 0
+        self._base_time = None
+        self._lock = threading.Lock()
+        self._base = self.base_figure().to_plotly_json()
+
+    def base_figure(self):
+        """
+        This function creates the empty plate figure: one unit per well, with
+        row letters and column numbers as tick labels.
+        """
+        fig = go.Figure(
+            go.Scatter(
+                x=[0, self.cols],
+                y=[0, self.rows],
+                mode="markers",
+                marker={"opacity": 0},
+                hoverinfo="skip",
+            )
+        )
+        fig.update_layout(
+            margin=dict(l=0, r=0, t=0, b=0),
+            xaxis=dict(
+                range=[0, self.cols],
+                side="top",
+                tickvals=[col + 0.5 for col in range(self.cols)],
+                ticktext=[str(col + 1) for col in range(self.cols)],
+                showgrid=False,
+                zeroline=False,
+                fixedrange=True,
+            ),
+            yaxis=dict(
+                range=[self.rows, 0],
+                tickvals=[row + 0.5 for row in range(self.rows)],
+                ticktext=[row_label(row) for row in range(self.rows)],
+                showgrid=False,
+                zeroline=False,
+                fixedrange=True,
+                scaleanchor="x",
+            ),
+            plot_bgcolor="black",
+            paper_bgcolor="white",
+        )
+        return fig
+
+    def add_well(self, well, img_path):
+        """
+        Render `img_path` into the slot of `well`. Returns True if the montage changed.
+        """
+        position = parse_well(well)
+        if position is None:
+            return False
+        row, col = position
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return False
+
+        tile = render_well_tile(img_path, self.tile_size)
+        if tile is None:
+            return False
+
+        # Center the thumbnail in its slot
+        height, width = tile.shape[:2]
+        slot = np.zeros(
+            (self.tile_size, self.tile_size) + tile.shape[2:], dtype=np.uint8
+        )
+        top = (self.tile_size - height) // 2
+        left = (self.tile_size - width) // 2
+        slot[top : top + height, left : left + width] = tile
+
+        with self._lock:
+            self.version += 1
+            self._tiles[well] = {
+                "name": well,
+                "source": encode_image(slot, "png"),
+                "x": col,
+                "y": row,
+                "version": self.version,
+            }
+            self._tile_times[well] = time.monotonic()
+        return True
+
+    def update(self):
+        """
+        Return the payload for the montage store: the tiles changed since the
+        last update or within the resend window, and the base figure during the
+        resend window of the first update. Returns dash.no_update if there is
+        nothing to send.
+        """
+        with self._lock:
+            now = time.monotonic()
+            cutoff = now - self.resend_seconds
+            tiles = sorted(
+                (
+                    tile
+                    for well, tile in self._tiles.items()
+                    if tile["version"] > self._sent_version
+                    or self._tile_times[well] >= cutoff
+                ),
+                key=lambda tile: tile["version"],
+            )
+            if self._base_time is None:
+                self._base_time = now
+            send_base = self._base_time >= cutoff
+            if not tiles and not send_base:
+                return dash.no_update
+
+            self._sent_version = self.version
+            payload = {"run": self.run, "version": self.version, "tiles": tiles}
+            if send_base:
+                payload["base"] = self._base
+            return payload
+
+
+def create_plate_montage(store):
+    """
+    This function creates the montage for the plate configured in `store`.
+    Returns None for non-plate (AVI) runs or missing plate dimensions.
+    """
+    gui_obj = store.get("wrmXpress_gui_obj", {})
+    if store.get("file_structure") != "imagexpress":
+        return None
+    try:
+        rows, cols = int(gui_obj["well_row"]), int(gui_obj["well_col"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if rows <= 0 or cols <= 0:
+        return None
+    return PlateMontage(rows, cols)
@@ -0,0 +1,249 @@
+# In[1]: Imports
+
+import sys
+import queue
+import argparse
+import threading
+from pathlib import Path
+
+import yaml
+
+from app.utils.callback_functions import (
+    clean_input_directory,
+    copy_files_to_input_directory,
+)
+from app.utils.run_lock import RunLock, RunLockError
+from app.utils.staging_manifest import StagingManifest
+from app.utils.trash import trash_reaper
+from app.utils.wrmxpress_process import run_wrmxpress, wrmxpress_command
+
+# In[2]: Settings
+
+# Number of plates staged ahead of the plate being analyzed. Each staged plate
+# holds its input on the volume until it has run, so this bounds disk usage.
+MAX_STAGED_PLATES = 1
+
+# Remove each plate's staged input once it has run (copies would otherwise
+# pile up over a long stack of plates)
+RELEASE_INPUT_AFTER_RUN = True
+
+# In[3]: Helper functions
+
+
+def plate_store_from_yaml(volume, platename):
+    """
+    This function builds the plate settings used for staging from the plate's
+    configuration file (<volume>/<platename>.yml, written by the configure page).
+    """
+    with open(Path(volume, f"{platename}.yml")) as f:
+        config = yaml.safe_load(f)
+
+    file_structure = config["file_structure"]
+    if isinstance(file_structure, list):
+        file_structure = file_structure[0]
+
+    return {
+        "mount": str(volume),
+        "platename": platename,
+        "wells": config["wells"],
+        "file_structure": file_structure,
+    }
+
+
+def stage_plate(store, progress_callback=None):
+    """
+    This function stages the input of one plate into input/<platename>, which
+    no other plate touches. Returns the files that failed, grouped by well.
+    """
+    volume = store["mount"]
+    platename = store["platename"]
+    platename_input_dir = Path(volume, "input", platename)
+
+    if store["file_structure"] == "imagexpress":
+        plate_base = platename.split("_", 1)[0]
+        htd_file = Path(volume, platename, f"{plate_base}.HTD")
+    else:
+        plate_base = platename
+        htd_file = None
+
+    clean_input_directory(platename_input_dir)
+    return copy_files_to_input_directory(
+        platename_input_dir=platename_input_dir,
+        htd_file=htd_file,
+        img_dir=Path(volume, platename),
+        plate_base=plate_base,
+        wells=store["wells"],
+        platename=platename,
+        file_structure=store["file_structure"],
+        progress_callback=progress_callback,
+    )
+
+
+def run_plate(store, on_line=None):
+    """
+    This function runs wrmXpress on a staged plate, writing its output to
+    work/<platename>_run.log. Returns the exit code of wrmXpress.
+    """
+    volume = store["mount"]
+    platename = store["platename"]
+
+    work_dir = Path(volume, "work", platename)
+    trash_reaper.move_to_trash(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    command, _ = wrmxpress_command(volume, platename)
+    return run_wrmxpress(
+        command,
+        Path(volume, "work", f"{platename}_run.log"),
+        (lambda line: on_line(platename, line)) if on_line else None,
+    )
+
+
+# In[4]: Plate Pipeline
+
+
+class PlatePipeline:
+    """
+    Runs wrmXpress on a list of plates, staging the next plates while the
+    current one is analyzed. This is the command line batch runner (see the
+    end of this file); the GUI runs one plate at a time through
+    background_callback.py.
+
+    A stager thread stages plates in order into their own input/<platename>
+    directories, at most `max_staged` ahead of the plate being analyzed (it
+    waits for a plate to start running before staging another one). The
+    calling thread runs wrmXpress on each staged plate in turn, so copying and
+    computing overlap instead of alternating. A plate that fails staging is
+    skipped. The work and output directories are cleaned once, before the
+    first plate, so every plate's results are kept. With `release_input`, a
+    plate's staged input is moved to the trash once it has run. The plates are
+    locked for the whole run (see run_lock.py), and `run` raises RunLockError
+    without touching the volume while another run (GUI or command line) holds
+    a plate of the volume.
+    """
+
+    def __init__(
+        self,
+        volume,
+        platenames,
+        max_staged=MAX_STAGED_PLATES,
+        on_line=None,
+        on_status=None,
+        release_input=RELEASE_INPUT_AFTER_RUN,
+    ):
+        self.volume = volume
+        self.release_input = release_input
+        self.platenames = list(platenames)
+        self.max_staged = max(1, max_staged)
+        self.on_line = on_line
+        self.on_status = on_status or (lambda platename, status: None)
+        self.results = {}
+        self._staged = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.max_staged)
+        self._stop = threading.Event()
+
+    def _stage_all(self):
+        try:
+            for platename in self.platenames:
+                # Wait until fewer than max_staged plates are staged but not running
+                while not self._slots.acquire(timeout=0.5):
+                    if self._stop.is_set():
+                        return
+                if self._stop.is_set():
+                    return
+
+                self.on_status(platename, "staging")
+                try:
+                    store = plate_store_from_yaml(self.volume, platename)
+                    failures = stage_plate(store)
+                except Exception as e:
+                    store, failures = None, {None: [str(e)]}
+                self._staged.put((platename, store, failures))
+        finally:
+            self._staged.put(None)
+
+    def stop(self):
+        """Stop after the plate that is running (plates not started are skipped)."""
+        self._stop.set()
+
+    def run(self):
+        """
+        Stage and run every plate. Returns {platename: status}, where status is
+        the exit code of wrmXpress, or "staging failed" / "skipped".
+        """
+        with RunLock(self.volume, self.platenames):
+            return self._run()
+
+    def _run(self):
+        trash_reaper.move_to_trash(Path(self.volume, "work"))
+        Path(self.volume, "work").mkdir(parents=True, exist_ok=True)
+        if Path(self.volume, "output").exists():
+            trash_reaper.empty_into_trash(Path(self.volume, "output"))
+        Path(self.volume, "output").mkdir(parents=True, exist_ok=True)
+
+        stager = threading.Thread(
+            target=self._stage_all, name="plate-stager", daemon=True
+        )
+        stager.start()
+
+        while True:
+            item = self._staged.get()
+            if item is None:
+                break
+            platename, store, failures = item
+            # The plate leaves the staged-but-not-run count: the next one may be staged
+            self._slots.release()
+
+            if self._stop.is_set():
+                self.results[platename] = "skipped"
+            elif failures:
+                print(f"Staging failed for plate {platename}: {failures}")
+                self.results[platename] = "staging failed"
+            else:
+                self.on_status(platename, "running")
+                self.results[platename] = run_plate(store, self.on_line)
+                if self.release_input:
+                    platename_input_dir = Path(self.volume, "input", platename)
+                    StagingManifest(platename_input_dir).delete()
+                    trash_reaper.move_to_trash(platename_input_dir)
+            self.on_status(platename, self.results[platename])
+
+        stager.join()
+        for platename in self.platenames:
+            self.results.setdefault(platename, "skipped")
+        return self.results
+
+
+# In[5]: Command line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run wrmXpress on several configured plates, "
+        "staging the next plate while one runs. Command line only: refuses to "
+        "start while a GUI run is active on the volume."
+    )
+    parser.add_argument(
+        "volume", help="Mounted volume holding the plates and their .yml files"
+    )
+    parser.add_argument("platenames", nargs="+", help="Plates to run, in order")
+    parser.add_argument(
+        "--max-staged",
+        type=int,
+        default=MAX_STAGED_PLATES,
+        help="Number of plates staged ahead of the running plate",
+    )
+    args = parser.parse_args()
+
+    pipeline = PlatePipeline(
+        args.volume,
+        args.platenames,
+        max_staged=args.max_staged,
+        on_line=lambda platename, line: sys.stdout.write(f"[{platename}] {line}"),
+        on_status=lambda platename, status: print(f"[{platename}] {status}"),
+    )
+    try:
+        results = pipeline.run()
+    except RunLockError as e:
+        sys.exit(str(e))
+    sys.exit(0 if all(status == 0 for status in results.values()) else 1)
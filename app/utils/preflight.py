@@ -0,0 +1,221 @@
+# In[1]: Imports
+
+import os
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.utils.callback_functions import collect_staging_jobs
+from app.utils.staging import STAGING_MAX_WORKERS, STAGING_STRATEGY
+from app.utils.staging_manifest import StagingManifest
+
+# In[2]: Settings
+
+# Bytes written to work/ and output/ per byte of input, per pipeline, measured
+# on previous runs (optical flow only writes small arrays and plots, the
+# segmentation and CellProfiler pipelines write a mask per image, tracking
+# writes per-frame tables, the diagnostics write one plate image per well)
+OUTPUT_SIZE_RATIOS = {
+    "motility": 0.05,
+    "segmentation": 1.0,
+    "cellprofiler": 0.6,
+    "tracking": 0.2,
+    "static_dx": 0.1,
+    "video_dx": 0.1,
+}
+DEFAULT_OUTPUT_SIZE_RATIO = 1.0
+
+# Space needed is multiplied by this margin before comparing with the free space
+PREFLIGHT_SAFETY_MARGIN = 1.2
+
+# Warn when a run would leave less than this fraction of the volume free
+PREFLIGHT_MIN_FREE_FRACTION = 0.05
+
+# Bytes read from the source to measure its sequential read throughput
+PREFLIGHT_THROUGHPUT_SAMPLE_BYTES = 64 * 1024 * 1024
+PREFLIGHT_READ_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Report the predicted staging time when it is longer than this (in seconds)
+PREFLIGHT_REPORT_STAGING_SECONDS = 60
+
+GB = 1024**3
+
+# Measured source throughput per plate ((volume, plate) -> bytes/s): the source
+# is read once per plate and server process rather than on every run
+_throughput_cache = {}
+_throughput_cache_lock = threading.Lock()
+
+# In[3]: Estimates
+
+
+def format_size(num_bytes):
+    """This function formats a number of bytes for messages (e.g. "12.3 GB")."""
+    for unit, size in [("GB", GB), ("MB", 1024**2), ("KB", 1024)]:
+        if num_bytes >= size:
+            return f"{num_bytes / size:.1f} {unit}"
+    return f"{num_bytes} B"
+
+
+def file_sizes(paths, max_workers=STAGING_MAX_WORKERS):
+    """
+    This function returns the sizes of `paths` (0 for missing files), with the
+    stat calls spread over a thread pool since they are round trips on NFS/SMB.
+    """
+
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(size, paths))
+
+
+def staging_needs_space(src, dest_dir, strategy):
+    """
+    This function tells whether staging `src` into `dest_dir` takes new space:
+    links cost nothing, copies (and links that fall back to a copy because
+    source and destination are on different devices) cost the file size.
+    """
+    if strategy == "copy":
+        return True
+    if strategy == "symlink":
+        return False
+    try:
+        return os.stat(src).st_dev != os.stat(existing_parent(dest_dir)).st_dev
+    except OSError:
+        return True
+
+
+def existing_parent(path):
+    """This function returns `path` or its closest existing parent."""
+    path = Path(path)
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def measure_read_throughput(paths, sample_bytes=PREFLIGHT_THROUGHPUT_SAMPLE_BYTES):
+    """
+    This function reads up to `sample_bytes` sequentially from `paths` and returns
+    the throughput in bytes per second (None if nothing could be read).
+    Files already in the page cache read faster than the storage, so the
+    measure is an optimistic estimate of the staging time.
+    """
+    read_bytes = 0
+    elapsed = 0.0
+    for path in paths:
+        try:
+            with open(path, "rb", buffering=0) as f:
+                start = time.perf_counter()
+                while read_bytes < sample_bytes:
+                    chunk = f.read(PREFLIGHT_READ_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    read_bytes += len(chunk)
+                elapsed += time.perf_counter() - start
+        except OSError:
+            continue
+        if read_bytes >= sample_bytes:
+            break
+
+    if not read_bytes or elapsed <= 0:
+        return None
+    return read_bytes / elapsed
+
+
+def plate_read_throughput(volume, plate_name, paths):
+    """
+    This function returns the source throughput of a plate, measured on `paths`
+    the first time it is needed and cached for the following runs.
+    """
+    key = (str(volume), plate_name)
+    with _throughput_cache_lock:
+        if key in _throughput_cache:
+            return _throughput_cache[key]
+    throughput = measure_read_throughput(paths)
+    if throughput is not None:
+        with _throughput_cache_lock:
+            _throughput_cache[key] = throughput
+    return throughput
+
+
+def estimate_run(
+    volume,
+    plate_name,
+    wells,
+    file_structure,
+    pipelines,
+    staging_strategy=STAGING_STRATEGY,
+    measure_throughput=False,
+):
+    """
+    This function estimates the disk space a run needs and how long staging its
+    input takes. Only files that the staging manifest does not already account
+    for are counted. Returns a dictionary with the bytes to stage (and the new
+    space they take), the estimated work/output bytes, the free bytes on the
+    volume and the source throughput (bytes/s, or None). The throughput reads
+    the source, so it is only measured (once per plate) when `measure_throughput`
+    is set, i.e. when a run is started.
+    """
+    if file_structure == "imagexpress":
+        plate_base = plate_name.split("_", 1)[0]
+        htd_file = Path(volume, plate_name, f"{plate_base}.HTD")
+    else:
+        plate_base = plate_name
+        htd_file = None
+    img_dir = Path(volume, plate_name)
+    platename_input_dir = Path(volume, "input", plate_name)
+
+    jobs = collect_staging_jobs(
+        platename_input_dir,
+        htd_file,
+        img_dir,
+        plate_base,
+        wells,
+        plate_name,
+        file_structure,
+    )
+    input_bytes = sum(file_sizes([src for src, _ in jobs]))
+
+    to_stage, _ = StagingManifest.load(platename_input_dir).diff(
+        jobs, staging_strategy
+    )
+    sizes = file_sizes([src for src, _ in to_stage])
+    stage_bytes = sum(sizes)
+    stage_space = sum(
+        size
+        for (src, dest_dir), size in zip(to_stage, sizes)
+        if staging_needs_space(src, dest_dir, staging_strategy)
+    )
+
+    ratio = sum(
+        OUTPUT_SIZE_RATIOS.get(pipeline, DEFAULT_OUTPUT_SIZE_RATIO)
+        for pipeline in pipelines
+    )
+    output_bytes = int(input_bytes * ratio)
+
+    usage = shutil.disk_usage(existing_parent(platename_input_dir))
+
+    throughput = None
+    if measure_throughput and stage_space:
+        # Largest files first: they say the most about sequential throughput
+        largest = sorted(zip(sizes, (src for src, _ in to_stage)), reverse=True)
+        throughput = plate_read_throughput(
+            volume, plate_name, [src for _, src in largest[:8]]
+        )
+
+    return {
+        "input_bytes": input_bytes,
+        "stage_bytes": stage_bytes,
+        "stage_space": stage_space,
+        "output_bytes": output_bytes,
+        "needed_bytes": int((stage_space + output_bytes) * PREFLIGHT_SAFETY_MARGIN),
+        "free_bytes": usage.free,
+        "total_bytes": usage.total,
+        "throughput": throughput,
+        "staging_seconds": stage_space / throughput if throughput else None,
+    }
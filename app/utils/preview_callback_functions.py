@@ -16,6 +16,7 @@ from app.utils.callback_functions import (
     clean_and_create_directories,
     update_yaml_file,
 )
+from app.utils.staging import preview_staging_strategy
 
 ########################################################################
 ####                                                                ####
@@ -109,6 +110,10 @@ def preamble_preview_imgxpress_selection(store):
         wells=first_well,
         platename=platename,
         file_structure=store["file_structure"],
+        staging_strategy=preview_staging_strategy(
+            [store["wrmXpress_gui_obj"].get("pipeline_selection")],
+            store["file_structure"],
+        ),
     )
 
     # Command message
@@ -175,6 +180,10 @@ def preamble_preview_avi_selection(store):
         plate_base=None,
         platename=platename,
         file_structure=store["file_structure"],
+        staging_strategy=preview_staging_strategy(
+            [store["wrmXpress_gui_obj"].get("pipeline_selection")],
+            store["file_structure"],
+        ),
     )
 
     # Command message
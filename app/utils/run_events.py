@@ -0,0 +1,261 @@
+# In[1]: Imports
+
+import json
+import time
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from app.utils.line_classifier import LineClassifier
+
+# In[2]: Settings
+
+# Events of a run are written next to its log: work/<plate>_run.events.jsonl
+RUN_EVENTS_SUFFIX = ".events.jsonl"
+
+# Events kept in memory per run, for consumers that join late
+RUN_EVENTS_MAX_KEPT = 1000
+
+# Event kinds
+RUN_STARTED = "run_started"
+STAGE_STARTED = "stage_started"
+WELL_STARTED = "well_started"
+WELL_FINISHED = "well_finished"
+IMAGE = "image"
+ERROR = "error"
+RUN_FINISHED = "run_finished"
+
+# Stage of the run implied by each kind of line (see line_classifier.py)
+_LINE_STAGES = {
+    "well_progress": "wells",
+    "image": "cellprofiler",
+    "info_progress": "wells",
+    "tracking": "tracking",
+    "reconfiguring": "reconfiguring",
+}
+
+# In[3]: Run Events
+
+
+@dataclass(frozen=True)
+class RunEvent:
+    """
+    One progress event of a wrmXpress run.
+
+    `id` numbers the events of a run from 1, `line` is the sequence number (see
+    RunLog) of the output line the event was parsed from and `time` is a Unix
+    timestamp. The other fields are set depending on the kind of event.
+    """
+
+    id: int
+    kind: str
+    time: float
+    line: int = None
+    stage: str = None
+    well: str = None
+    current: int = None
+    total: int = None
+    image_number: int = None
+    message: str = None
+
+    def to_dict(self):
+        """Return the event as a dictionary, without its unset fields."""
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+class RunEventParser:
+    """
+    Turns the output of a wrmXpress run into RunEvents, one line at a time.
+
+    Lines are classified once (see LineClassifier). A well starts with its
+    "<well> <i>/<n>" or "Tracking well" line and finishes when the next well
+    starts (or when the run ends successfully); a stage starts whenever the
+    kind of progress lines changes (e.g. from reconfiguring to tracking).
+    """
+
+    def __init__(self, wells):
+        self.wells = list(wells)
+        self.classifier = LineClassifier(self.wells)
+        self.stage = None
+        self.well = None
+        self.wells_started = 0
+        self._id = 0
+
+    def _event(self, kind, line_seq=None, **fields):
+        self._id += 1
+        return RunEvent(self._id, kind, time.time(), line_seq, **fields)
+
+    def start(self):
+        """Return the events of the start of the run."""
+        return [self._event(RUN_STARTED, total=len(self.wells))]
+
+    def _finish_well(self, line_seq):
+        if self.well is None:
+            return []
+        well, self.well = self.well, None
+        return [self._event(WELL_FINISHED, line_seq, stage=self.stage, well=well)]
+
+    def parse(self, line, line_seq=None):
+        """Return the events of a line of output (usually none)."""
+        line_event = self.classifier.classify(line)
+        if line_event.kind is None:
+            return []
+
+        if line_event.kind == "error":
+            return [
+                self._event(ERROR, line_seq, stage=self.stage, message=line.strip())
+            ]
+
+        events = []
+        stage = _LINE_STAGES[line_event.kind]
+        if stage != self.stage:
+            events += self._finish_well(line_seq)
+            self.stage = stage
+            events.append(self._event(STAGE_STARTED, line_seq, stage=stage))
+
+        if line_event.kind in ("well_progress", "tracking"):
+            if line_event.well != self.well:
+                events += self._finish_well(line_seq)
+                self.well = line_event.well
+                self.wells_started += 1
+                events.append(
+                    self._event(
+                        WELL_STARTED,
+                        line_seq,
+                        stage=stage,
+                        well=line_event.well,
+                        current=line_event.current or self.wells_started,
+                        total=line_event.total or len(self.wells),
+                    )
+                )
+        elif line_event.kind in ("image", "info_progress"):
+            events.append(
+                self._event(
+                    IMAGE,
+                    line_seq,
+                    stage=stage,
+                    current=line_event.current,
+                    total=line_event.total,
+                    image_number=line_event.image_number,
+                )
+            )
+        return events
+
+    def finish(self, returncode):
+        """Return the events of the end of the run (wrmXpress exit code)."""
+        events = self._finish_well(None) if returncode == 0 else []
+        events.append(self._event(RUN_FINISHED, message=str(returncode)))
+        return events
+
+
+# In[4]: Event Stream
+
+
+class RunEventStream:
+    """
+    Parses the output of a run once and shares the events.
+
+    Every event is appended to a JSON-lines file (one `RunEvent.to_dict()` per
+    line), kept in a bounded deque for late readers (`since(event_id)`) and
+    passed to the subscribed callbacks (UI, metrics, ETA, ...) in order.
+    """
+
+    def __init__(self, path, wells, max_kept=RUN_EVENTS_MAX_KEPT):
+        self.path = Path(path)
+        self.parser = RunEventParser(wells)
+        self.events = deque(maxlen=max_kept)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._file = open(self.path, "w")
+
+    def subscribe(self, callback):
+        """Call `callback(event)` for every following event."""
+        self._subscribers.append(callback)
+
+    def _publish(self, events):
+        with self._lock:
+            for event in events:
+                self._file.write(event.to_json() + "\n")
+                self.events.append(event)
+            self._file.flush()
+        for event in events:
+            for callback in self._subscribers:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Failed to handle {event.kind} event because {e}")
+        return events
+
+    def start(self):
+        return self._publish(self.parser.start())
+
+    def feed(self, line, line_seq=None):
+        """Parse a line of output and publish its events. Returns the events."""
+        return self._publish(self.parser.parse(line, line_seq))
+
+    def finish(self, returncode):
+        return self._publish(self.parser.finish(returncode))
+
+    def since(self, event_id):
+        """Return the kept events after `event_id`."""
+        with self._lock:
+            return [event for event in self.events if event.id > event_id]
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RunEta:
+    """
+    Estimates the time left in a run from its well events: the mean duration
+    of the finished wells times the number of wells not finished yet.
+    """
+
+    def __init__(self, n_wells):
+        self.n_wells = n_wells
+        self.finished = 0
+        self._started = {}
+        self._total_seconds = 0.0
+
+    def __call__(self, event):
+        if event.kind == WELL_STARTED:
+            self._started[event.well] = event.time
+        elif event.kind == WELL_FINISHED and event.well in self._started:
+            self._total_seconds += event.time - self._started.pop(event.well)
+            self.finished += 1
+
+    def seconds_left(self):
+        """Return the estimated seconds left (None until a well has finished)."""
+        if not self.finished:
+            return None
+        remaining = max(self.n_wells - self.finished, 0)
+        return remaining * self._total_seconds / self.finished
+
+
+# In[5]: Helper functions
+
+
+def events_path(log_path):
+    """
+    This function returns the event file of a run log
+    (work/<plate>_run.log -> work/<plate>_run.events.jsonl).
+    """
+    log_path = Path(log_path)
+    return log_path.with_name(log_path.stem + RUN_EVENTS_SUFFIX)
+
+
+def read_events(path):
+    """This function reads the events of a run back from its JSON-lines file."""
+    with open(path) as f:
+        return [RunEvent(**json.loads(line)) for line in f if line.strip()]
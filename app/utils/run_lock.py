@@ -0,0 +1,103 @@
+# In[1]: Imports
+
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# In[2]: Settings
+
+# Runs hold a lock file per plate in <volume>/.run_locks/<platename>.lock
+RUN_LOCK_DIR = ".run_locks"
+
+# In[3]: Run Lock
+
+
+class RunLockError(RuntimeError):
+    """Raised when plates cannot be run because another run is active."""
+
+
+def _try_flock(f):
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def active_runs(volume, exclude=()):
+    """
+    This function returns the plates of `volume` that a run (GUI or command
+    line, in any process) currently holds the lock of, except `exclude`.
+    """
+    if fcntl is None:
+        return []
+    lock_dir = Path(volume, RUN_LOCK_DIR)
+    if not lock_dir.is_dir():
+        return []
+
+    active = []
+    for lock_path in sorted(lock_dir.glob("*.lock")):
+        if lock_path.stem in exclude:
+            continue
+        try:
+            with open(lock_path, "a") as f:
+                if not _try_flock(f):
+                    active.append(lock_path.stem)
+        except OSError:
+            continue
+    return active
+
+
+class RunLock:
+    """
+    Per-plate run locks of a volume.
+
+    A run takes the lock of each of its plates (an flock on the plate's lock
+    file, released by the OS if the process dies) and refuses to start while
+    any other plate of the volume is locked: runs clean the shared work/ and
+    output/ directories of the volume, so two runs cannot overlap. Locks are
+    not enforced where fcntl is not available.
+    """
+
+    def __init__(self, volume, platenames):
+        self.volume = volume
+        self.platenames = list(platenames)
+        self._files = []
+
+    def acquire(self):
+        if fcntl is None:
+            return self
+        lock_dir = Path(self.volume, RUN_LOCK_DIR)
+        lock_dir.mkdir(parents=True, exist_ok=True)
+
+        busy = []
+        for platename in self.platenames:
+            f = open(Path(lock_dir, f"{platename}.lock"), "a")
+            if _try_flock(f):
+                self._files.append(f)
+            else:
+                f.close()
+                busy.append(platename)
+        busy += active_runs(self.volume, exclude=self.platenames)
+
+        if busy:
+            self.release()
+            raise RunLockError(
+                f"A run is already active on {self.volume} (plates: {', '.join(busy)})"
+            )
+        return self
+
+    def release(self):
+        for f in self._files:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+        self._files = []
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,266 @@
+# In[1]: Imports
+
+import time
+import threading
+from collections import deque
+
+import plotly.io as pio
+
+# In[2]: Settings
+
+# Changes made within this many seconds are repeated in every progress update.
+# Background-callback progress is polled (only the latest value is delivered),
+# so repeating recent changes lets the client catch up on updates it missed
+# between two polls; the complete log is delivered with the final result.
+PROGRESS_RESEND_SECONDS = 5.0
+
+# Lines of wrmXpress output kept in memory (and shown in the browser) per run.
+# The complete output is always written to work/<plate>_run.log.
+RUN_LOG_MAX_LINES = 2000
+RUN_LOG_MAX_CHARS = 1024 * 1024
+
+# Progress updates of a run are coalesced to at most one per this many seconds
+# (each update is pickled into the background-callback cache); well transitions
+# and the end of the run are always published
+PROGRESS_MIN_INTERVAL = 0.25
+
+# In[3]: Run Log
+
+
+class RunLog:
+    """
+    Bounded log of a wrmXpress run.
+
+    Lines are kept in a deque capped at `max_lines` lines and `max_chars`
+    characters; older lines are dropped (they remain in the log file at
+    `log_path`). Every line gets a sequence number, increasing from 1 over the
+    whole run, so a reader can ask for the lines after the last one it has seen
+    with `since(seq)` instead of receiving the whole log again.
+    """
+
+    def __init__(
+        self, log_path=None, max_lines=RUN_LOG_MAX_LINES, max_chars=RUN_LOG_MAX_CHARS
+    ):
+        self.log_path = log_path
+        self.max_lines = max(1, max_lines)
+        self.max_chars = max_chars
+        self.seq = 0
+        self._entries = deque()  # (seq, monotonic time, line)
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def append(self, line):
+        """Append a line and return its sequence number."""
+        with self._lock:
+            self.seq += 1
+            self._entries.append((self.seq, time.monotonic(), line))
+            self._chars += len(line)
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_lines or self._chars > self.max_chars
+            ):
+                self._chars -= len(self._entries.popleft()[2])
+            return self.seq
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest line kept (seq + 1 if the log is empty)."""
+        with self._lock:
+            return self._entries[0][0] if self._entries else self.seq + 1
+
+    @property
+    def dropped(self):
+        """Number of lines dropped from memory so far."""
+        return self.first_seq - 1
+
+    def since(self, seq, newer_than=None):
+        """
+        Return (start, lines): the kept lines after sequence number `seq`, and
+        the sequence number of the first of them. With `newer_than` (a
+        time.monotonic() value), lines added after that time are included too.
+        Only the returned lines are visited, newest first.
+        """
+        with self._lock:
+            lines = []
+            for entry_seq, entry_time, line in reversed(self._entries):
+                if entry_seq <= seq and (newer_than is None or entry_time < newer_than):
+                    break
+                lines.append(line)
+            lines.reverse()
+            return self.seq - len(lines) + 1, lines
+
+    def text(self):
+        """Return the kept lines, noting how many earlier lines were dropped."""
+        with self._lock:
+            lines = [line for _, _, line in self._entries]
+            dropped = self._entries[0][0] - 1 if self._entries else self.seq
+        if dropped:
+            where = f" (see {self.log_path})" if self.log_path else ""
+            lines.insert(0, f"[{dropped} earlier lines not shown{where}]\n")
+        return "".join(lines)
+
+
+# In[4]: Progress Stream
+
+
+class ProgressStream:
+    """
+    Delta-encoded progress of a single wrmXpress run.
+
+    Instead of sending the whole log and a new figure with every progress
+    update, `update()` returns only what changed recently: the log lines after
+    the last sequence number sent (see RunLog) and the preview figure if it was
+    swapped. The `progress.merge_update` clientside callback
+    (assets/run_progress.js) appends the lines it has not seen yet, keeping at
+    most the same number of lines as the run log, and swaps the figure in the
+    browser, so polling bandwidth scales with new output rather than with the
+    output so far.
+    """
+
+    def __init__(self, log=None, resend_seconds=PROGRESS_RESEND_SECONDS, run=None):
+        self.log = log if log is not None else RunLog()
+        self.resend_seconds = resend_seconds
+        self.run = run or f"{time.time():.6f}"
+        self.image = None
+        self.image_version = 0
+        self._image_time = 0.0
+        self._sent_seq = 0
+        self._sent_image_version = 0
+        self._lock = threading.Lock()
+
+    def add_line(self, line):
+        """Append a line of wrmXpress output."""
+        self.log.append(line)
+
+    def set_image(self, figure):
+        """Swap the preview figure (serialized once, here)."""
+        if figure is None:
+            return
+        figure_json = (
+            figure if isinstance(figure, str) else pio.to_json(figure, validate=False)
+        )
+        with self._lock:
+            self.image = figure_json
+            self.image_version += 1
+            self._image_time = time.monotonic()
+
+    def text(self):
+        """Return the log kept in memory."""
+        return self.log.text()
+
+    def update(self):
+        """
+        Return the payload for the progress store: the log lines added since the
+        last update or within the resend window, and the preview figure if it
+        changed since the last update or within the resend window.
+        """
+        with self._lock:
+            cutoff = time.monotonic() - self.resend_seconds
+            start, lines = self.log.since(self._sent_seq, newer_than=cutoff)
+            payload = {
+                "run": self.run,
+                "start": start,
+                "lines": lines,
+                "seq": start + len(lines) - 1,
+                "keep": self.log.max_lines,
+            }
+
+            if self.image is not None and (
+                self.image_version > self._sent_image_version
+                or self._image_time >= cutoff
+            ):
+                payload["image"] = {
+                    "version": self.image_version,
+                    "figure": self.image,
+                }
+
+            self._sent_seq = payload["seq"]
+            self._sent_image_version = self.image_version
+            return payload
+
+
+# In[5]: Progress Publisher
+
+
+class ProgressPublisher:
+    """
+    Coalesces the progress updates of a background callback.
+
+    `publish(make_value)` calls `set_progress` at most once per `min_interval`
+    seconds; updates within the window are dropped, except the latest one,
+    which is published by a timer at the end of the window (so a line printed
+    before wrmXpress goes quiet still reaches the page), by the next update
+    past the window, or by `flush()`.
+    `make_value` is only called for updates that are published, so dropped
+    updates cost nothing (and do not consume ProgressStream deltas). Forced
+    updates (`publish(..., force=True)`, or calling the publisher like
+    `set_progress`) are published immediately, for well transitions.
+    `published` and `dropped` count the updates sent and coalesced away.
+    """
+
+    def __init__(self, set_progress, min_interval=PROGRESS_MIN_INTERVAL):
+        self.set_progress = set_progress
+        self.min_interval = min_interval
+        self.published = 0
+        self.dropped = 0
+        self._pending = None
+        self._last_time = None
+        self._timer = None
+        # Held while publishing, so the timer and the run cannot interleave updates
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        self.publish(lambda: value, force=True)
+
+    def publish(self, make_value, force=False):
+        """Publish an update now, or keep it until the window has passed."""
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._last_time is not None
+                and now - self._last_time < self.min_interval
+            ):
+                if self._pending is not None:
+                    self.dropped += 1
+                self._pending = make_value
+                self._schedule_flush(self.min_interval - (now - self._last_time))
+                return
+
+            if self._pending is not None and self._pending is not make_value:
+                self.dropped += 1
+            self._pending = None
+            self._last_time = now
+            self.published += 1
+            self.set_progress(make_value())
+
+    def _schedule_flush(self, delay):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(delay, self._flush_when_due)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_when_due(self):
+        with self._lock:
+            if self._pending is None:
+                return
+            # An update published meanwhile restarted the window
+            wait = self.min_interval - (time.monotonic() - self._last_time)
+            if wait > 0:
+                self._timer = None
+                self._schedule_flush(wait)
+                return
+        self.flush()
+
+    def flush(self):
+        """Publish the update kept back by the window, if any."""
+        with self._lock:
+            if self._pending is not None:
+                make_value, self._pending = self._pending, None
+                self._last_time = time.monotonic()
+                self.published += 1
+                self.set_progress(make_value())
+
+    def stats(self):
+        """Return the number of updates published and dropped."""
+        return {"published": self.published, "dropped": self.dropped}
@@ -0,0 +1,228 @@
+# In[1]: Imports
+
+import re
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+from flask import Response, abort, request
+
+from app.utils.run_progress import RUN_LOG_MAX_LINES
+
+# In[2]: Settings
+
+RUN_STREAM_URL_PREFIX = "/run-stream"
+
+# Registered runs (run id -> log and event files), shared by the background
+# callback process that runs wrmXpress and the server process that streams it
+RUN_STREAM_DIR = Path("./cache", "runs")
+
+# How often the run files are checked for new output (local reads, no polling
+# from the browser)
+RUN_STREAM_POLL_SECONDS = 0.1
+
+# A comment is sent after this many quiet seconds to keep the connection open
+RUN_STREAM_HEARTBEAT_SECONDS = 15
+
+# Each open stream holds a server thread; further clients keep to polling
+RUN_STREAM_MAX_CLIENTS = 4
+
+# Registrations older than this (in seconds) are removed when a run registers
+RUN_STREAM_KEEP_SECONDS = 7 * 24 * 3600
+
+_RUN_ID_PATTERN = re.compile(r"^[0-9a-f]{20}$")
+
+_clients = threading.BoundedSemaphore(RUN_STREAM_MAX_CLIENTS)
+
+# In[3]: Helper functions
+
+
+def register_run(log_path, events_path, stream_dir=RUN_STREAM_DIR):
+    """
+    This function registers the log and event files of a run for streaming and
+    returns its run id (also used as the ProgressStream run, see run_progress.py).
+    """
+    run_id = hashlib.sha1(f"{log_path}:{time.time()}".encode()).hexdigest()[:20]
+    stream_dir = Path(stream_dir)
+    stream_dir.mkdir(parents=True, exist_ok=True)
+
+    cutoff = time.time() - RUN_STREAM_KEEP_SECONDS
+    for registration in stream_dir.glob("*.json"):
+        try:
+            if registration.stat().st_mtime < cutoff:
+                registration.unlink()
+        except OSError:
+            pass
+
+    with open(Path(stream_dir, f"{run_id}.json"), "w") as f:
+        json.dump({"log": str(log_path), "events": str(events_path)}, f)
+    return run_id
+
+
+def registered_run(run_id, stream_dir=RUN_STREAM_DIR):
+    """
+    This function returns the (log path, events path) of a registered run, or None.
+    """
+    if not _RUN_ID_PATTERN.match(run_id):
+        return None
+    try:
+        with open(Path(stream_dir, f"{run_id}.json")) as f:
+            run = json.load(f)
+        return Path(run["log"]), Path(run["events"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class _FileTail:
+    """Reads the complete lines appended to a file since the last read."""
+
+    def __init__(self, path, skip_lines=0):
+        self.path = path
+        self.lines_read = 0
+        self._resumed_at = skip_lines
+        self._skip_lines = skip_lines
+        self._position = 0
+        self._partial = b""
+
+    def read_lines(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._position)
+                data = f.read()
+                self._position = f.tell()
+        except FileNotFoundError:
+            return []
+
+        # Lines are decoded once complete (a write may end mid-character)
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        lines = [line.decode("utf-8", errors="replace") + "\n" for line in lines]
+        self.lines_read += len(lines)
+        if self._skip_lines:
+            skipped = min(self._skip_lines, len(lines))
+            self._skip_lines -= skipped
+            lines = lines[skipped:]
+        return lines
+
+    def flush(self):
+        """
+        Return the unterminated last line of the file as a complete line (once the
+        file is known not to grow any more), or [] if the file ended with a newline.
+        """
+        if not self._partial:
+            return []
+        line = self._partial.decode("utf-8", errors="replace") + "\n"
+        self._partial = b""
+        self.lines_read += 1
+        if self._skip_lines:
+            self._skip_lines -= 1
+            return []
+        return [line]
+
+    @property
+    def lines_seen(self):
+        """Number of lines read or skipped (the position to resume from)."""
+        return max(self.lines_read, self._resumed_at)
+
+
+def _sse(event, data, event_id=None):
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def stream_run(run_id, log_path, events_path, after_line=0, after_event=0):
+    """
+    This function yields the progress of a run as Server-Sent Events:
+      "log"       new log lines, shaped like a ProgressStream update
+      "progress"  a RunEvent (see run_events.py)
+      "end"       the run has finished and its output has been sent
+    Each message id is "<last line>:<last event>", so a reconnecting
+    EventSource resumes where it stopped (Last-Event-ID).
+    """
+    log_tail = _FileTail(log_path, skip_lines=after_line)
+    # Events sent before a reconnect are read again (not sent): a finished run
+    # must still end the stream
+    events_tail = _FileTail(events_path)
+    last_sent = time.monotonic()
+    finished = False
+
+    while True:
+        sent = False
+        event_lines = events_tail.read_lines()
+        events_seen = events_tail.lines_seen - len(event_lines)
+        for line in event_lines:
+            events_seen += 1
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            finished = finished or event.get("kind") == "run_finished"
+            if events_seen <= after_event:
+                continue
+            yield _sse("progress", event, f"{log_tail.lines_seen}:{events_seen}")
+            sent = True
+
+        lines = log_tail.read_lines()
+        # The run log is complete once the run_finished event is written, so a
+        # last line without a newline will not be completed any more
+        if finished:
+            lines += log_tail.flush()
+        lines = lines[-RUN_LOG_MAX_LINES:]
+        if lines:
+            seq = log_tail.lines_seen
+            yield _sse(
+                "log",
+                {
+                    "run": run_id,
+                    "start": seq - len(lines) + 1,
+                    "lines": lines,
+                    "seq": seq,
+                    "keep": RUN_LOG_MAX_LINES,
+                },
+                f"{seq}:{events_tail.lines_seen}",
+            )
+            sent = True
+
+        if finished and not sent:
+            yield _sse("end", {"run": run_id})
+            return
+
+        if sent:
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent > RUN_STREAM_HEARTBEAT_SECONDS:
+            yield ": heartbeat\n\n"
+            last_sent = time.monotonic()
+        time.sleep(RUN_STREAM_POLL_SECONDS)
+
+
+def register_run_stream_routes(server):
+    """
+    This function registers the Flask route that streams the progress of a run.
+    """
+
+    @server.route(f"{RUN_STREAM_URL_PREFIX}/<run_id>")
+    def serve_run_stream(run_id):
+        run = registered_run(run_id)
+        if run is None:
+            abort(404)
+
+        after_line, after_event = 0, 0
+        last_event_id = request.headers.get("Last-Event-ID", "")
+        if re.match(r"^\d+:\d+$", last_event_id):
+            after_line, after_event = map(int, last_event_id.split(":"))
+
+        # Too many open streams: the browser keeps to background-callback polling
+        if not _clients.acquire(blocking=False):
+            abort(503)
+
+        response = Response(
+            stream_run(run_id, *run, after_line, after_event),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(_clients.release)
+        return response
@@ -0,0 +1,375 @@
+# In[1]: Imports
+
+import os
+import time
+import errno
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# In[2]: Settings
+
+# How input files are staged into input/<plate>:
+#   "copy"     full copy (always works, slowest)
+#   "hardlink" new directory entry for the same file (same filesystem only)
+#   "reflink"  copy-on-write clone via the FICLONE ioctl (btrfs, XFS, ...)
+#   "symlink"  relative symbolic link to the source file
+# Any strategy that is not possible for a file (e.g. across devices) falls
+# back along STAGING_FALLBACKS, ending with a plain copy.
+# Copies are the default: a hardlink is the same inode as the source file (and a
+# symlink points at it), so anything that writes into input/<plate> would change
+# the raw acquisition data. Set "hardlink" or "reflink" only for setups where
+# nothing writes to the staged input.
+STAGING_STRATEGY = "copy"
+
+# Previews only read the first well, so for pipelines known to only read their
+# input they are staged as a symlink farm: no data is copied even across
+# devices, and cleanup only ever deletes links. Other previews are copied, since
+# a module that writes or renames files in input/<plate> would write through
+# the links into the source plate (e.g. tracking, and AVI plates, which are
+# reconfigured into TIFFs inside input/<plate>).
+PREVIEW_STAGING_STRATEGY = "symlink"
+READ_ONLY_PIPELINES = ["motility", "segmentation", "static_dx", "video_dx"]
+
+STAGING_STRATEGIES = ["copy", "hardlink", "reflink", "symlink"]
+
+STAGING_FALLBACKS = {
+    "copy": [],
+    "hardlink": ["reflink", "copy"],
+    "reflink": ["copy"],
+    "symlink": ["copy"],
+}
+
+# Number of files staged concurrently (several streams make much better use of NFS/SMB mounts)
+STAGING_MAX_WORKERS = 8
+
+# Copy files with os.copy_file_range / os.sendfile (kernel-side, server-side on NFS 4.2)
+STAGING_KERNEL_COPY = True
+STAGING_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Minimum time (in seconds) between two staging progress reports
+STAGING_PROGRESS_INTERVAL = 0.25
+
+# Hash staged copies against their source before a run (reads every copied
+# byte twice, so it is off by default). Results are cached in the staging
+# manifest, so unchanged files are only ever hashed once.
+STAGING_VERIFY = False
+VERIFY_CHUNK_BYTES = 8 * 1024 * 1024
+
+# FICLONE = _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+# Errors meaning "this strategy cannot be used for this file", as opposed to real I/O errors
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.EMLINK,
+    errno.ENOSYS,
+}
+
+# In[3]: Staging functions
+
+
+def preview_staging_strategy(pipelines, file_structure):
+    """
+    This function returns the staging strategy of a preview: PREVIEW_STAGING_STRATEGY
+    if every pipeline is in READ_ONLY_PIPELINES (and the plate is not an AVI
+    plate), a plain copy otherwise.
+    """
+    pipelines = [pipeline for pipeline in pipelines if pipeline]
+    if (
+        pipelines
+        and file_structure != "avi"
+        and all(pipeline in READ_ONLY_PIPELINES for pipeline in pipelines)
+    ):
+        return PREVIEW_STAGING_STRATEGY
+    return "copy"
+
+
+def _kernel_copy(src, dest, on_bytes=None):
+    """
+    Copy `src` to `dest` in chunks with os.copy_file_range (falling back to
+    os.sendfile), calling `on_bytes(n)` after every chunk.
+    """
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        remaining = os.fstat(src_file.fileno()).st_size
+        offset = 0
+        use_copy_file_range = hasattr(os, "copy_file_range")
+
+        while remaining > 0:
+            count = min(remaining, STAGING_CHUNK_BYTES)
+            copied = None
+            if use_copy_file_range:
+                try:
+                    copied = os.copy_file_range(
+                        src_file.fileno(), dest_file.fileno(), count
+                    )
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED_ERRNOS or offset:
+                        raise
+                    use_copy_file_range = False
+            if copied is None:
+                copied = os.sendfile(
+                    dest_file.fileno(), src_file.fileno(), offset, count
+                )
+            if copied == 0:
+                break
+            offset += copied
+            remaining -= copied
+            if on_bytes:
+                on_bytes(copied)
+
+    # The source ended early (e.g. it shrank, or a short read on NFS)
+    if remaining > 0:
+        raise OSError(
+            errno.EIO, f"Copy of {src} stopped {remaining} bytes short of its size"
+        )
+
+
+def _copy(src, dest, on_bytes=None):
+    if STAGING_KERNEL_COPY and hasattr(os, "sendfile"):
+        try:
+            _kernel_copy(src, dest, on_bytes)
+            shutil.copymode(src, dest)
+            return
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            if dest.exists():
+                dest.unlink()
+    shutil.copy(src, dest)
+    if on_bytes:
+        on_bytes(os.path.getsize(dest))
+
+
+def _hardlink(src, dest):
+    os.link(src, dest)
+
+
+def _reflink(src, dest):
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "reflink is not supported on this platform")
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        try:
+            fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dest_file.close()
+            os.unlink(dest)
+            raise
+    shutil.copymode(src, dest)
+
+
+def _symlink(src, dest):
+    # Relative links keep working when the volume is mounted elsewhere (e.g. in a container)
+    os.symlink(os.path.relpath(Path(src).resolve(), Path(dest).parent.resolve()), dest)
+
+
+_STAGING_FUNCTIONS = {
+    "copy": _copy,
+    "hardlink": _hardlink,
+    "reflink": _reflink,
+    "symlink": _symlink,
+}
+
+
+def stage_file(src, dest_dir, strategy=STAGING_STRATEGY, on_bytes=None):
+    """
+    This function stages `src` into `dest_dir` (keeping its file name) using
+    `strategy`, falling back along STAGING_FALLBACKS when the strategy is not
+    possible for this file. An existing file at the destination is replaced.
+    `on_bytes(n)` is called as copies progress.
+    Returns the path of the staged file and the strategy that was used.
+    """
+    if strategy not in _STAGING_FUNCTIONS:
+        raise ValueError(
+            f"Unknown staging strategy '{strategy}', expected one of {STAGING_STRATEGIES}"
+        )
+
+    src = Path(src)
+    dest = Path(dest_dir, src.name)
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+
+    for attempt in [strategy] + STAGING_FALLBACKS[strategy]:
+        try:
+            if attempt == "copy":
+                _copy(src, dest, on_bytes)
+            else:
+                _STAGING_FUNCTIONS[attempt](src, dest)
+            return dest, attempt
+        except OSError as e:
+            if attempt == "copy" or e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            if dest.is_symlink() or dest.exists():
+                dest.unlink()
+    raise OSError(errno.ENOTSUP, f"Could not stage {src} with '{strategy}'")
+
+
+def stage_files(
+    jobs,
+    strategy=STAGING_STRATEGY,
+    max_workers=STAGING_MAX_WORKERS,
+    progress_callback=None,
+    used_strategies=None,
+):
+    """
+    This function stages a list of (source file, destination directory) jobs
+    with up to `max_workers` files in flight. If a dictionary is given as
+    `used_strategies`, the strategy each staged job actually used (after any
+    fallback, see stage_file) is stored in it.
+    `progress_callback(files_done, files_total, bytes_done, bytes_total)` is
+    called at most every STAGING_PROGRESS_INTERVAL seconds, and once at the end.
+    Links count their whole size as soon as they are made; copies report bytes
+    as they are written. Symlinks are validated in one pass once all of them
+    exist. Returns the jobs that failed to stage.
+    """
+    jobs = [(Path(src), Path(dest_dir)) for src, dest_dir in jobs]
+    sizes = []
+    for src, _ in jobs:
+        try:
+            sizes.append(os.path.getsize(src))
+        except OSError:
+            sizes.append(0)
+
+    state = {
+        "files_done": 0,
+        "bytes_done": 0,
+        "failed": [],
+        "last_report": 0.0,
+    }
+    files_total, bytes_total = len(jobs), sum(sizes)
+    lock = threading.Lock()
+
+    def report(force=False):
+        if progress_callback is None:
+            return
+        with lock:
+            now = time.monotonic()
+            if not force and now - state["last_report"] < STAGING_PROGRESS_INTERVAL:
+                return
+            state["last_report"] = now
+            snapshot = (
+                state["files_done"],
+                files_total,
+                state["bytes_done"],
+                bytes_total,
+            )
+        progress_callback(*snapshot)
+
+    def add_bytes(count):
+        with lock:
+            state["bytes_done"] += count
+        report()
+
+    def stage(job, size):
+        src, dest_dir = job
+        copied = []
+
+        def on_bytes(count):
+            copied.append(count)
+            add_bytes(count)
+
+        try:
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            _, used = stage_file(src, dest_dir, strategy, on_bytes)
+            if used_strategies is not None:
+                with lock:
+                    used_strategies[job] = used
+        except Exception as e:
+            print(f"Error staging {src}: {e}")
+            with lock:
+                state["failed"].append(job)
+        # Count the rest of the file (all of it for links and failures)
+        add_bytes(size - sum(copied))
+        with lock:
+            state["files_done"] += 1
+        report()
+
+    report(force=True)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(stage, jobs, sizes))
+
+        if strategy == "symlink":
+            staged = [job for job in jobs if job not in state["failed"]]
+            dests = [Path(dest_dir, src.name) for src, dest_dir in staged]
+            for job, resolves in zip(staged, executor.map(link_resolves, dests)):
+                if not resolves:
+                    print(f"Error staging {job[0]}: link does not resolve")
+                    state["failed"].append(job)
+    report(force=True)
+
+    return state["failed"]
+
+
+def link_resolves(path):
+    """
+    This function checks that a staged entry can be opened (a symlink whose
+    target is missing or unreachable, e.g. on an unmounted share, does not).
+    """
+    return os.path.isfile(path)
+
+
+def file_digest(path, chunk_bytes=VERIFY_CHUNK_BYTES):
+    """
+    This function returns the blake2b digest of a file, read in chunks into a
+    reused buffer.
+    """
+    digest = hashlib.blake2b()
+    buffer = bytearray(chunk_bytes)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def verify_staged_files(pairs, max_workers=STAGING_MAX_WORKERS):
+    """
+    This function checks (source file, staged file) pairs. Links to the source
+    are complete by construction; copies are hashed, source and destination in
+    parallel. Returns one result per pair: the source digest ("" for links) if
+    the staged file matches, None if it does not (or cannot be read).
+    """
+    results = [None] * len(pairs)
+    to_hash = []
+    for i, (src, dest) in enumerate(pairs):
+        try:
+            if os.path.samefile(src, dest):
+                results[i] = ""
+                continue
+            if os.path.getsize(src) != os.path.getsize(dest):
+                continue
+        except OSError:
+            continue
+        to_hash.append(i)
+
+    def digest_or_none(path):
+        try:
+            return file_digest(path)
+        except OSError as e:
+            print(f"Error hashing {path}: {e}")
+            return None
+
+    paths = [path for i in to_hash for path in pairs[i]]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        digests = list(executor.map(digest_or_none, paths))
+
+    for n, i in enumerate(to_hash):
+        src_digest, dest_digest = digests[2 * n], digests[2 * n + 1]
+        if src_digest is not None and src_digest == dest_digest:
+            results[i] = src_digest
+    return results
@@ -0,0 +1,212 @@
+# In[1]: Imports
+
+import os
+import json
+from pathlib import Path
+
+from app.utils.staging import STAGING_MAX_WORKERS, verify_staged_files
+
+# In[2]: Settings
+
+# Bumped whenever the manifest layout changes; older manifests are ignored
+MANIFEST_VERSION = 2
+
+# In[3]: Staging Manifest
+
+
+class StagingManifest:
+    """
+    Record of the files staged into input/<plate>, kept next to it in
+    input/.<plate>.manifest.json.
+
+    Every staged file is recorded under its path relative to the plate input
+    directory, with the source path, source size and mtime, the staging
+    strategy and the size of the staged entry. The next preview or run diffs
+    the files it needs against the manifest, so only added, removed or changed
+    files are staged again instead of the whole plate. Files checked by
+    `verify` also keep their digest, so they are not hashed again until they
+    are restaged.
+    """
+
+    def __init__(self, platename_input_dir, files=None):
+        self.platename_input_dir = Path(platename_input_dir)
+        self.files = files or {}
+
+    @property
+    def path(self):
+        return manifest_path(self.platename_input_dir)
+
+    @classmethod
+    def load(cls, platename_input_dir):
+        """Load the manifest of a plate input directory (empty if there is none)."""
+        try:
+            with open(manifest_path(platename_input_dir)) as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                raise ValueError("outdated manifest")
+            return cls(platename_input_dir, data["files"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(platename_input_dir)
+
+    def save(self):
+        """Write the manifest atomically (a crash never leaves half a manifest)."""
+        data = {"version": MANIFEST_VERSION, "files": self.files}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        """Forget every staged file (e.g. after the input directory was wiped)."""
+        self.files = {}
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _relative(self, dest):
+        return Path(dest).relative_to(self.platename_input_dir).as_posix()
+
+    def _entry_is_current(self, relative_path, src, strategy):
+        """Check a recorded file against its source and its staged entry."""
+        entry = self.files.get(relative_path)
+        if (
+            entry is None
+            or entry["source"] != str(src)
+            or entry["strategy"] != strategy
+        ):
+            return False
+        try:
+            src_stat = os.stat(src)
+            dest_stat = os.lstat(Path(self.platename_input_dir, relative_path))
+        except OSError:
+            return False
+        return (
+            entry["size"] == src_stat.st_size
+            and entry["mtime_ns"] == src_stat.st_mtime_ns
+            and entry["staged_size"] == dest_stat.st_size
+        )
+
+    def is_intact(self):
+        """Check that every recorded file is still present in the input directory."""
+        if not self.files:
+            return False
+        return all(
+            os.path.lexists(Path(self.platename_input_dir, relative_path))
+            for relative_path in self.files
+        )
+
+    def diff(self, jobs, strategy):
+        """
+        Compare (source file, destination directory) staging jobs with the
+        manifest. Returns the jobs that must be staged (new or changed files, or
+        files staged with another strategy) and the relative paths of recorded
+        files that are no longer wanted.
+        """
+        wanted = {}
+        for src, dest_dir in jobs:
+            wanted[self._relative(Path(dest_dir, Path(src).name))] = (src, dest_dir)
+
+        to_stage = [
+            (src, dest_dir)
+            for relative_path, (src, dest_dir) in wanted.items()
+            if not self._entry_is_current(relative_path, src, strategy)
+        ]
+        to_remove = [
+            relative_path for relative_path in self.files if relative_path not in wanted
+        ]
+        return to_stage, to_remove
+
+    def remove(self, relative_paths):
+        """Delete staged files and drop them from the manifest."""
+        for relative_path in relative_paths:
+            self.files.pop(relative_path, None)
+            try:
+                os.unlink(Path(self.platename_input_dir, relative_path))
+            except FileNotFoundError:
+                pass
+
+    def record(self, jobs, strategy, used_strategies=None):
+        """
+        Record freshly staged (source file, destination directory) jobs, staged
+        with `strategy`. The strategy each job actually used (see stage_files)
+        is kept too, as "staged_as".
+        """
+        used_strategies = used_strategies or {}
+        for src, dest_dir in jobs:
+            dest = Path(dest_dir, Path(src).name)
+            try:
+                src_stat = os.stat(src)
+                dest_stat = os.lstat(dest)
+            except OSError:
+                continue
+            self.files[self._relative(dest)] = {
+                "source": str(src),
+                "size": src_stat.st_size,
+                "mtime_ns": src_stat.st_mtime_ns,
+                "strategy": strategy,
+                "staged_as": used_strategies.get(
+                    (Path(src), Path(dest_dir)), strategy
+                ),
+                "staged_size": dest_stat.st_size,
+            }
+
+    def verify(self, jobs, max_workers=STAGING_MAX_WORKERS):
+        """
+        Check the staged files of (source file, destination directory) jobs
+        against their source, skipping files verified since they were staged.
+        Mismatching files are dropped from the manifest (so the next preview or
+        run stages them again) and returned as jobs.
+        """
+        pending = []
+        for src, dest_dir in jobs:
+            relative_path = self._relative(Path(dest_dir, Path(src).name))
+            entry = self.files.get(relative_path)
+            if entry is not None and "digest" not in entry:
+                pending.append((relative_path, (src, dest_dir)))
+
+        results = verify_staged_files(
+            [
+                (src, Path(self.platename_input_dir, relative_path))
+                for relative_path, (src, _) in pending
+            ],
+            max_workers,
+        )
+
+        mismatches = []
+        for (relative_path, job), digest in zip(pending, results):
+            if digest is None:
+                self.files.pop(relative_path, None)
+                mismatches.append(job)
+            else:
+                self.files[relative_path]["digest"] = digest
+        return mismatches
+
+    def remove_untracked(self):
+        """
+        Delete every file of the input directory that the manifest does not
+        account for (e.g. files written there by a previous wrmXpress run).
+        """
+        for root, _, filenames in os.walk(self.platename_input_dir):
+            for filename in filenames:
+                file_path = Path(root, filename)
+                if self._relative(file_path) not in self.files:
+                    try:
+                        os.unlink(file_path)
+                    except OSError as e:
+                        print(f"Failed to delete {file_path} because {e}")
+
+
+# In[4]: Helper functions
+
+
+def manifest_path(platename_input_dir):
+    """
+    This function returns the manifest path of a plate input directory,
+    input/.<plate>.manifest.json (outside input/<plate>, so wrmXpress never sees it).
+    """
+    platename_input_dir = Path(platename_input_dir)
+    return Path(
+        platename_input_dir.parent, f".{platename_input_dir.name}.manifest.json"
+    )
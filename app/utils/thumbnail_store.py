@@ -0,0 +1,133 @@
+# In[1]: Imports
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import diskcache
+import plotly.io as pio
+
+# In[2]: Settings
+
+THUMBNAIL_STORE_DIR = Path("./cache", "thumbnails")
+THUMBNAIL_STORE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Files are keyed by a hash of their whole content, so a well staged again into
+# input/ (which gets a new mtime) still hits its thumbnail. The hash is read in
+# chunks of this size and memoized per path, mtime and size.
+DIGEST_CHUNK_BYTES = 8 * 1024 * 1024
+
+# In[3]: Thumbnail Store
+
+
+class ThumbnailStore:
+    """
+    Persistent store of rendered thumbnail figures, keyed on the file content
+    (see `file_digest`).
+
+    Backed by a diskcache directory, so thumbnails are shared by every browser
+    session and worker process and survive restarts. The store is capped at
+    `size_limit` bytes with least-recently-used eviction.
+    """
+
+    def __init__(
+        self, directory=THUMBNAIL_STORE_DIR, size_limit=THUMBNAIL_STORE_MAX_BYTES
+    ):
+        self.directory = Path(directory)
+        self.cache = diskcache.Cache(
+            str(self.directory),
+            size_limit=size_limit,
+            eviction_policy="least-recently-used",
+        )
+        self.cache.stats(enable=True)
+        self._digests = {}
+        self._digests_lock = threading.Lock()
+
+    def file_digest(self, img_path):
+        """
+        Return the digest of a file: a blake2b hash of its whole content
+        (memoized per path, mtime and size, so an unchanged file is read once).
+        Returns None if the file cannot be read.
+        """
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return None
+
+        identity = (str(Path(img_path).resolve()), stat.st_mtime_ns, stat.st_size)
+        with self._digests_lock:
+            if identity in self._digests:
+                return self._digests[identity]
+
+        digest = hashlib.blake2b(digest_size=20)
+        try:
+            with open(img_path, "rb") as f:
+                for chunk in iter(lambda: f.read(DIGEST_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        content_key = f"blake2b:{digest.hexdigest()}"
+        with self._digests_lock:
+            if len(self._digests) > 100000:
+                self._digests.clear()
+            self._digests[identity] = content_key
+        return content_key
+
+    def make_key(self, img_path, *options):
+        """
+        Build a store key from the file digest and the rendering options.
+        Returns None if the file cannot be read.
+        """
+        digest = self.file_digest(img_path)
+        if digest is None:
+            return None
+        return json.dumps([digest, *options])
+
+    def get_figure(self, key):
+        """
+        Return the stored figure for `key` as a new go.Figure, or None.
+        """
+        if key is None:
+            return None
+        figure_json = self.cache.get(key)
+        if figure_json is None:
+            return None
+        return pio.from_json(figure_json, skip_invalid=True)
+
+    def put(self, key, figure_json):
+        """
+        Store a serialized figure under `key`.
+        """
+        if key is None:
+            return
+        self.cache.set(key, figure_json)
+
+    def stats(self):
+        """
+        Return the hit/miss counters and the on-disk size of the store.
+        """
+        hits, misses = self.cache.stats()
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": len(self.cache),
+            "bytes": self.cache.volume(),
+        }
+
+
+_thumbnail_store = None
+_thumbnail_store_lock = threading.Lock()
+
+
+def get_thumbnail_store():
+    """
+    This function returns the process-wide store used by
+    create_figure_from_filepath, created (with its cache directory) on first use.
+    """
+    global _thumbnail_store
+    with _thumbnail_store_lock:
+        if _thumbnail_store is None:
+            _thumbnail_store = ThumbnailStore()
+        return _thumbnail_store
@@ -0,0 +1,433 @@
+# In[1]: Imports
+
+import io
+import os
+import re
+import json
+import math
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+import tifffile as tiff
+import plotly.graph_objects as go
+from flask import abort, send_file
+
+from app.utils.contrast import window_limits
+from app.utils.image_rendering import colormap_palette
+from app.utils.image_io import open_tiff_memmap
+
+# In[2]: Settings
+
+TILE_SIZE = 256
+TILE_CACHE_DIR = Path("./cache", "tiles")
+TILE_URL_PREFIX = "/tiles"
+
+# Tiles kept on disk are capped at this size: the least recently viewed
+# pyramids are removed first (see prune_tile_cache)
+TILE_CACHE_MAX_BYTES = 2 * 1024**3
+
+# The cache is pruned whenever a pyramid is created and after every this many
+# bytes of tiles written by the process
+TILE_CACHE_PRUNE_BYTES = 64 * 1024**2
+
+# The last use of a pyramid is recorded at most this often (in seconds)
+TILE_CACHE_TOUCH_SECONDS = 60
+
+# Images with more pixels than this are opened in the tiled viewer
+TILED_VIEW_MIN_PIXELS = 4096 * 4096
+
+# Number of fully decoded (non memory-mappable) sources kept open per process
+MAX_OPEN_SOURCES = 2
+
+_TOKEN_PATTERN = re.compile(r"^[0-9a-f]{20}$")
+_SCALE_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+
+_open_sources = OrderedDict()
+_open_sources_lock = threading.Lock()
+
+_tile_bytes_written = 0
+_tile_bytes_lock = threading.Lock()
+
+# In[3]: Helper functions
+
+
+def get_image_shape(img_path):
+    """
+    This function returns the (height, width) of an image without decoding its pixels.
+    Returns None if the file cannot be read.
+    """
+    try:
+        if Path(img_path).suffix.lower() in [".tif", ".tiff"]:
+            with tiff.TiffFile(img_path) as tif:
+                shape = tif.series[0].shape
+            return shape[0], shape[1]
+        with Image.open(img_path) as img:
+            return img.height, img.width
+    except Exception as e:
+        print(f"Error reading the shape of {img_path}: {e}")
+        return None
+
+
+def use_tiled_viewer(img_path, min_pixels=TILED_VIEW_MIN_PIXELS):
+    """
+    This function decides whether an image is large enough to be shown with the tiled viewer.
+    """
+    shape = get_image_shape(img_path)
+    return shape is not None and shape[0] * shape[1] > min_pixels
+
+
+def _open_source(img_path):
+    """
+    Return an array-like view of the source image. Uncompressed TIFFs are
+    memory-mapped so tiles only touch the bytes they need; anything else is
+    decoded once and kept in a small per-process LRU.
+    """
+    source = open_tiff_memmap(img_path)
+    if source is not None:
+        return source
+
+    key = (str(img_path), os.stat(img_path).st_mtime_ns)
+    with _open_sources_lock:
+        if key in _open_sources:
+            _open_sources.move_to_end(key)
+            return _open_sources[key]
+
+    if Path(img_path).suffix.lower() in [".tif", ".tiff"]:
+        source = tiff.imread(img_path)
+    else:
+        Image.MAX_IMAGE_PIXELS = 1000000000
+        source = np.array(Image.open(img_path))
+
+    with _open_sources_lock:
+        _open_sources[key] = source
+        while len(_open_sources) > MAX_OPEN_SOURCES:
+            _open_sources.popitem(last=False)
+    return source
+
+
+def _squeeze_channels(region):
+    """Drop the second channel of 2-channel images (same handling as the preview figures)."""
+    if region.ndim == 3 and region.shape[2] == 2:
+        return region[:, :, 0]
+    if region.ndim == 3 and region.shape[2] == 4:
+        return region[:, :, :3]
+    return region
+
+
+# In[4]: Tile Pyramid
+
+
+class TilePyramid:
+    """
+    Multi-resolution tile pyramid for a single large image.
+
+    Level 0 is full resolution and every following level halves the resolution,
+    up to the first level that fits in a single tile. Tiles are built lazily on
+    request with a strided read of the source and cached on disk as PNGs under
+    `cache_dir/<token>/`, where the token is derived from the file identity
+    (path, mtime and size) so a rewritten image gets a fresh pyramid. The
+    cache is capped at TILE_CACHE_MAX_BYTES (see prune_tile_cache).
+    """
+
+    def __init__(self, source_path, cache_dir=TILE_CACHE_DIR, tile_size=TILE_SIZE):
+        self.source_path = Path(source_path).resolve()
+        self.cache_dir = Path(cache_dir)
+        self.tile_size = tile_size
+
+        stat = os.stat(self.source_path)
+        identity = f"{self.source_path}:{stat.st_mtime_ns}:{stat.st_size}"
+        self.token = hashlib.sha1(identity.encode()).hexdigest()[:20]
+        self.directory = Path(self.cache_dir, self.token)
+        self.metadata = None
+
+    @classmethod
+    def from_token(cls, token, cache_dir=TILE_CACHE_DIR):
+        """
+        Re-open a pyramid from its token (as used in tile URLs).
+        Returns None if the token is unknown or the source changed since.
+        """
+        if not _TOKEN_PATTERN.match(token):
+            return None
+        metadata_file = Path(cache_dir, token, "pyramid.json")
+        if not metadata_file.exists():
+            return None
+
+        with open(metadata_file, "r") as f:
+            metadata = json.load(f)
+        try:
+            pyramid = cls(metadata["source"], cache_dir, metadata["tile_size"])
+        except OSError:
+            return None
+        if pyramid.token != token:
+            return None
+        pyramid.metadata = metadata
+        _touch(metadata_file)
+        return pyramid
+
+    def prepare(self):
+        """
+        Read (or compute and persist) the pyramid metadata: source dimensions,
+        number of levels and the intensity window shared by every tile.
+        Only a strided sample of the source is read to compute the window.
+        """
+        if self.metadata is not None:
+            return self.metadata
+
+        metadata_file = Path(self.directory, "pyramid.json")
+        if metadata_file.exists():
+            with open(metadata_file, "r") as f:
+                self.metadata = json.load(f)
+            _touch(metadata_file)
+            return self.metadata
+
+        source = _open_source(self.source_path)
+        height, width = source.shape[:2]
+        levels = max(
+            1, math.ceil(math.log2(max(height, width, 1) / self.tile_size)) + 1
+        )
+
+        step = 2 ** (levels - 1)
+        sample = _squeeze_channels(np.asarray(source[::step, ::step]))
+        # Same percentile window as the preview figures, so hot pixels do not
+        # darken every tile
+        low, high = window_limits(sample)
+
+        self.metadata = {
+            "source": str(self.source_path),
+            "width": int(width),
+            "height": int(height),
+            "levels": int(levels),
+            "tile_size": self.tile_size,
+            "low": low,
+            "high": high,
+        }
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_file = metadata_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.metadata, f)
+        os.replace(tmp_file, metadata_file)
+
+        prune_tile_cache(self.cache_dir, keep=[self.token])
+        return self.metadata
+
+    def tile_count(self, level):
+        """Return the number of (columns, rows) of tiles at `level`."""
+        metadata = self.prepare()
+        span = self.tile_size * 2**level
+        return (
+            math.ceil(metadata["width"] / span),
+            math.ceil(metadata["height"] / span),
+        )
+
+    def tile_path(self, level, x, y, scale="gray"):
+        return Path(self.directory, scale, str(level), f"{x}_{y}.png")
+
+    def get_tile(self, level, x, y, scale="gray"):
+        """
+        Return the path of the PNG tile at (`level`, `x`, `y`), building it
+        on first request. Returns None for tiles outside the image.
+        """
+        metadata = self.prepare()
+        columns, rows = self.tile_count(level)
+        if not (0 <= level < metadata["levels"] and 0 <= x < columns and 0 <= y < rows):
+            return None
+
+        tile_file = self.tile_path(level, x, y, scale)
+        if tile_file.exists():
+            return tile_file
+
+        step = 2**level
+        span = self.tile_size * step
+        source = _open_source(self.source_path)
+        region = np.asarray(
+            source[y * span : (y + 1) * span : step, x * span : (x + 1) * span : step]
+        )
+        region = _squeeze_channels(region)
+
+        # Apply the pyramid-wide intensity window so neighbouring tiles match
+        low, high = metadata["low"], metadata["high"]
+        if high > low:
+            region = (region.astype(np.float32) - low) * (255.0 / (high - low))
+        region = np.clip(region, 0, 255).astype(np.uint8)
+
+        tile = Image.fromarray(region)
+        palette = colormap_palette(scale) if region.ndim == 2 else None
+        if palette is not None:
+            tile.putpalette(palette.flatten().tolist())
+
+        buffer = io.BytesIO()
+        tile.save(buffer, format="PNG", compress_level=3)
+
+        tile_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = tile_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_file, tile_file)
+
+        global _tile_bytes_written
+        with _tile_bytes_lock:
+            _tile_bytes_written += buffer.tell()
+            prune = _tile_bytes_written >= TILE_CACHE_PRUNE_BYTES
+            if prune:
+                _tile_bytes_written = 0
+        if prune:
+            prune_tile_cache(self.cache_dir, keep=[self.token])
+
+        return tile_file
+
+
+def _touch(path):
+    """Record the use of a pyramid (its metadata mtime orders the evictions)."""
+    try:
+        if time.time() - os.stat(path).st_mtime > TILE_CACHE_TOUCH_SECONDS:
+            os.utime(path)
+    except OSError:
+        pass
+
+
+def _tree_size(path):
+    size = 0
+    for root, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                size += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def prune_tile_cache(cache_dir=TILE_CACHE_DIR, max_bytes=TILE_CACHE_MAX_BYTES, keep=()):
+    """
+    This function removes the least recently used pyramids (by the mtime of
+    their pyramid.json, see _touch) until the tile cache fits in `max_bytes`.
+    The pyramids in `keep` are never removed. Returns the tokens removed.
+    """
+    cache_dir = Path(cache_dir)
+    pyramids = []
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name in keep:
+                    continue
+                metadata_file = Path(entry.path, "pyramid.json")
+                try:
+                    used = os.stat(metadata_file).st_mtime
+                except OSError:
+                    # Tiles of a pyramid removed while they were being written
+                    used = 0.0
+                pyramids.append((used, entry.name, _tree_size(entry.path)))
+    except OSError:
+        return []
+
+    total = sum(size for _, _, size in pyramids)
+    total += sum(_tree_size(Path(cache_dir, token)) for token in keep)
+
+    removed = []
+    for _, token, size in sorted(pyramids):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(Path(cache_dir, token), ignore_errors=True)
+        total -= size
+        removed.append(token)
+    return removed
+
+
+# In[5]: Figure and route
+
+
+def create_tiled_figure(img_path, graph_id, scale="gray"):
+    """
+    This function creates a figure for the tiled viewer. Only the coarsest
+    level is attached initially; the `tiles.update_tiles` clientside callback
+    (assets/tiled_viewer.js) swaps in the tiles in view as the user zooms/pans.
+    """
+    pyramid = TilePyramid(img_path)
+    metadata = pyramid.prepare()
+    width, height = metadata["width"], metadata["height"]
+    top_level = metadata["levels"] - 1
+
+    # Warm the coarsest tile so the first view is served from disk
+    pyramid.get_tile(top_level, 0, 0, scale)
+
+    fig = go.Figure(
+        go.Scatter(
+            x=[0, width],
+            y=[0, height],
+            mode="markers",
+            marker={"opacity": 0},
+            hoverinfo="x+y",
+        )
+    )
+    fig.update_layout(
+        images=[
+            dict(
+                source=f"{TILE_URL_PREFIX}/{pyramid.token}/{scale}/{top_level}/0/0.png",
+                xref="x",
+                yref="y",
+                x=0,
+                y=0,
+                sizex=width,
+                sizey=height,
+                xanchor="left",
+                yanchor="top",
+                sizing="stretch",
+                layer="below",
+            )
+        ],
+        meta={
+            "tiles": {
+                "graph_id": graph_id,
+                "url": f"{TILE_URL_PREFIX}/{pyramid.token}/{scale}",
+                "width": width,
+                "height": height,
+                "levels": metadata["levels"],
+                "tile_size": metadata["tile_size"],
+                "key": f"{top_level}:0:0:0:0",
+            }
+        },
+        uirevision=pyramid.token,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(
+            range=[0, width], showticklabels=False, showgrid=False, zeroline=False
+        ),
+        yaxis=dict(
+            range=[height, 0],
+            showticklabels=False,
+            showgrid=False,
+            zeroline=False,
+            scaleanchor="x",
+        ),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+    )
+
+    return fig
+
+
+def register_tile_routes(server):
+    """
+    This function registers the Flask route that serves pyramid tiles on demand.
+    """
+
+    @server.route(f"{TILE_URL_PREFIX}/<token>/<scale>/<int:level>/<int:x>/<int:y>.png")
+    def serve_tile(token, scale, level, x, y):
+        if not _SCALE_PATTERN.match(scale):
+            abort(404)
+
+        pyramid = TilePyramid.from_token(token)
+        if pyramid is None:
+            abort(404)
+
+        tile_file = pyramid.get_tile(level, x, y, scale)
+        if tile_file is None:
+            abort(404)
+
+        # Tokens change whenever the source changes, so tiles can be cached aggressively
+        return send_file(tile_file.resolve(), mimetype="image/png", max_age=86400)
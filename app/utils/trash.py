@@ -0,0 +1,206 @@
+# In[1]: Imports
+
+import os
+import time
+import shutil
+import threading
+from collections import deque
+from pathlib import Path
+
+# In[2]: Settings
+
+# Trees moved out of the way are renamed to <parent>/.trash-<name>-<timestamp>
+TRASH_PREFIX = ".trash-"
+
+# Maximum number of trees (not bytes) moved to the trash by this process and
+# waiting to be deleted. Moving one more to the trash waits for the reaper
+# first, so a fast succession of runs cannot pile up trees on the volume.
+# Leftovers of earlier processes are deleted too but never waited for.
+TRASH_MAX_OUTSTANDING = 4
+
+# The reaper pauses after every batch of deletions, so it only takes a
+# fraction of the disk bandwidth away from the run that is starting
+TRASH_REAP_BATCH = 256
+TRASH_REAP_PAUSE = 0.02
+
+# Scheduling priority of the reaper thread (Linux only, 19 is the lowest)
+TRASH_REAPER_NICENESS = 19
+
+# In[3]: Trash Reaper
+
+
+class TrashReaper:
+    """
+    Background deletion of old work/input/output trees.
+
+    `move_to_trash` renames a tree to a hidden sibling, which is a single
+    atomic metadata operation however many files it holds, so the caller can
+    recreate the directory and start the next run straight away. A daemon
+    thread running at the lowest scheduling priority then deletes the trash in
+    small batches. Runs execute in short-lived background-callback processes,
+    so the reaper is often cut off when its process exits; trash left behind
+    that way (or by an interrupted session) is picked up the next time
+    something is moved to the trash in the same directory, without counting
+    towards `max_outstanding`, so a new run never waits for it.
+    """
+
+    def __init__(self, max_outstanding=TRASH_MAX_OUTSTANDING):
+        self.max_outstanding = max_outstanding
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._scanned = set()
+        self._leftovers = set()
+
+    def _enqueue(self, trash_path):
+        with self._condition:
+            if trash_path not in self._pending:
+                self._pending.append(trash_path)
+            self._condition.notify_all()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._reap_forever, name="trash-reaper", daemon=True
+                )
+                self._thread.start()
+
+    def _collect_leftovers(self, parent):
+        """Queue trash left in `parent` by earlier sessions (once per directory)."""
+        with self._condition:
+            if parent in self._scanned:
+                return
+            self._scanned.add(parent)
+        try:
+            with os.scandir(parent) as entries:
+                for entry in entries:
+                    if entry.name.startswith(TRASH_PREFIX) and entry.is_dir():
+                        with self._condition:
+                            self._leftovers.add(Path(entry.path))
+                        self._enqueue(Path(entry.path))
+        except OSError:
+            pass
+
+    def _wait_for_room(self):
+        with self._condition:
+            while (
+                sum(1 for path in self._pending if path not in self._leftovers)
+                >= self.max_outstanding
+            ):
+                self._condition.wait()
+
+    def _trash_path(self, path):
+        return Path(path.parent, f"{TRASH_PREFIX}{path.name}-{time.time_ns()}")
+
+    def move_to_trash(self, path):
+        """
+        Rename the tree at `path` out of the way and queue it for deletion.
+        Falls back to deleting it right away if it cannot be renamed.
+        """
+        path = Path(path)
+        if not os.path.lexists(path):
+            return
+
+        self._collect_leftovers(path.parent)
+        self._wait_for_room()
+
+        trash_path = self._trash_path(path)
+        try:
+            os.rename(path, trash_path)
+        except OSError as e:
+            print(f"Could not move {path} to the trash ({e}), deleting it now")
+            delete_tree(path)
+            return
+        self._enqueue(trash_path)
+
+    def empty_into_trash(self, path):
+        """
+        Move the contents of the directory at `path` to the trash, keeping the
+        directory itself (e.g. the output directory, which other tools may hold).
+        """
+        path = Path(path)
+        if not path.is_dir():
+            return
+
+        self._collect_leftovers(path.parent)
+        self._wait_for_room()
+
+        trash_path = self._trash_path(path)
+        trash_path.mkdir()
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    os.rename(entry.path, Path(trash_path, entry.name))
+                except OSError as e:
+                    print(
+                        f"Could not move {entry.path} to the trash ({e}), "
+                        "deleting it now"
+                    )
+                    delete_tree(entry.path)
+        self._enqueue(trash_path)
+
+    def outstanding(self):
+        """Return the trees still waiting to be deleted."""
+        with self._condition:
+            return list(self._pending)
+
+    def _reap_forever(self):
+        if hasattr(os, "setpriority"):
+            try:
+                os.setpriority(
+                    os.PRIO_PROCESS, threading.get_native_id(), TRASH_REAPER_NICENESS
+                )
+            except OSError:
+                pass
+
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                trash_path = self._pending[0]
+
+            delete_tree(trash_path, TRASH_REAP_BATCH, TRASH_REAP_PAUSE)
+
+            with self._condition:
+                self._pending.popleft()
+                self._leftovers.discard(trash_path)
+                self._condition.notify_all()
+
+
+# In[4]: Helper functions
+
+
+def delete_tree(path, batch=None, pause=0.0):
+    """
+    This function deletes a file or directory tree bottom-up, sleeping `pause`
+    seconds after every `batch` deletions. Errors are printed, not raised.
+    """
+    path = Path(path)
+    if path.is_symlink() or not path.is_dir():
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Failed to delete {path} because {e}")
+        return
+
+    deleted = 0
+    for root, dirnames, filenames in os.walk(path, topdown=False):
+        for name in filenames + dirnames:
+            entry_path = os.path.join(root, name)
+            try:
+                if name in dirnames and not os.path.islink(entry_path):
+                    os.rmdir(entry_path)
+                else:
+                    os.unlink(entry_path)
+            except FileNotFoundError:
+                # Leftovers may be reaped by several processes at once
+                pass
+            except OSError as e:
+                print(f"Failed to delete {entry_path} because {e}")
+            deleted += 1
+            if batch and deleted % batch == 0:
+                time.sleep(pause)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+trash_reaper = TrashReaper()
@@ -6,16 +6,26 @@ import yaml
 import shlex
 import subprocess
 import glob
-import re
 import shutil
 from pathlib import Path
 from app.utils.callback_functions import (
     get_default_value,
     eval_bool,
     clean_and_create_directories,
+    clean_input_directory,
     copy_files_to_input_directory,
     create_figure_from_filepath,
 )
+from app.utils.plate_index import get_plate_index
+from app.utils.htd import find_htd_file, read_htd
+from app.utils.trash import trash_reaper
+from app.utils.staging import STAGING_STRATEGY, preview_staging_strategy
+from app.utils.preflight import (
+    PREFLIGHT_MIN_FREE_FRACTION,
+    PREFLIGHT_REPORT_STAGING_SECONDS,
+    estimate_run,
+    format_size,
+)
 
 
 # In[2]: WrmXpressGui Class
@@ -309,17 +319,50 @@ class WrmXpressGui:
                     "No .HTD file found in the Plate/Folder with ImageXpress file structure. You may have selected the wrong file structure."
                 )
 
-            # Validate subdirectories
-            subdirectories = [x for x in platename_path.iterdir() if x.is_dir()]
-            for subdirectory in subdirectories:
-                files = list(subdirectory.glob("*"))
+            # Validate subdirectories, from a single scan of the plate
+            plate_index = get_plate_index(platename_path)
+            for subdirectory in plate_index.timepoints:
+                wells_found = plate_index.wells(timepoint=subdirectory)
                 for well in self.well_selection_list:
-                    if not any([str(well) in str(file) for file in files]):
+                    if str(well) not in wells_found:
                         self.error_occurred = True
                         self.error_messages.append(
                             f"No images found for well {well}. This may result in unexpected errors or results."
                         )
 
+            self.validate_imagexpress_file_counts(platename_path, plate_index)
+
+    def validate_imagexpress_file_counts(self, platename_path, plate_index):
+        """
+        Warn about selected wells that have fewer images than the HTD file says
+        were acquired (sites x wavelengths per time point).
+        """
+        htd_file = find_htd_file(platename_path, self.plate_name.split("_", 1)[0])
+        if htd_file is None:
+            return
+        try:
+            htd_info = read_htd(htd_file)
+        except (OSError, ValueError):
+            return  # Reported by validate_htd_file_cols_and_rows
+
+        expected = htd_info.expected_files_per_well()
+        wavelength_ids = htd_info.wavelength_ids
+        for subdirectory in plate_index.timepoints:
+            for well in self.well_selection_list:
+                found = [
+                    record
+                    for record in plate_index.find(str(well), timepoint=subdirectory)
+                    if record.suffix.lower() in [".tif", ".tiff"]
+                    and "thumb" not in record.path.stem.lower()
+                    and (not wavelength_ids or record.wavelength in wavelength_ids)
+                ]
+                if found and len(found) < expected:
+                    self.warning_occurred = True
+                    self.warning_messages.append(
+                        f"Well {well} has {len(found)} of the {expected} images expected "
+                        f"in {subdirectory} from the HTD file."
+                    )
+
     def validate_static_dx_mode(self):
         if (
             self.static_dx is not None
@@ -382,86 +425,29 @@ class WrmXpressGui:
             self.error_messages.append(f"HTD file not found: {htd_file}")
             return
 
-        # Read file with multiple encoding attempts
-        htd_data = self._read_file_with_multiple_encodings(htd_file)
-        if htd_data is None:
-            return  # Error already set in _read_file_with_multiple_encodings
-
-        # Parse HTD data using a more robust approach
-        plate_info = self._parse_htd_data(htd_data)
-
-        # Validate dimensions against expected values
-        self._validate_plate_dimensions(plate_info)
-
-    def _read_file_with_multiple_encodings(self, file_path):
-        """Helper method to attempt reading a file with different encodings."""
-        encodings = ["utf-8", "utf-16", "iso-8859-1", "latin-1"]
-
-        for encoding in encodings:
-            try:
-                with open(file_path, "r", encoding=encoding) as f:
-                    return f.read()
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                self.warning_occurred = True
-                self.warning_messages.append(
-                    f"Error reading file with {encoding}: {str(e)}"
-                )
-
-        self.error_occurred = True
-        self.error_messages.append(
-            "Failed to read HTD file. Please check the file encoding."
-        )
-        return None
-
-    def _parse_htd_data(self, htd_content):
-        """Parse HTD file content to extract relevant information."""
-        plate_info = {
-            "x_wells": None,
-            "y_wells": None,
-            "description": None,
-            "plate_type": None,
-            "time_points": None,
-        }
-
-        # Define patterns for each key we want to extract
-        patterns = {
-            "x_wells": r'"XWells"\s*,\s*(\d+)',
-            "y_wells": r'"YWells"\s*,\s*(\d+)',
-            "description": r'"Description"\s*,\s*"([^"]*)"',
-            "plate_type": r'"PlateType"\s*,\s*(\d+)',
-            "time_points": r'"TimePoints"\s*,\s*(\d+)',
-        }
-
-        # Extract each value using regex
-        for key, pattern in patterns.items():
-            match = re.search(pattern, htd_content)
-            if match:
-                try:
-                    # Convert numeric values to integers
-                    if key in ["x_wells", "y_wells", "plate_type", "time_points"]:
-                        plate_info[key] = int(match.group(1))
-                    else:
-                        plate_info[key] = match.group(1)
-                except (ValueError, IndexError):
-                    self.warning_occurred = True
-                    self.warning_messages.append(
-                        f"Failed to parse {key} from HTD file."
-                    )
+        # Parsed once per version of the file (see htd.py)
+        try:
+            htd_info = read_htd(htd_file)
+        except (OSError, ValueError) as e:
+            self.error_occurred = True
+            self.error_messages.append(
+                f"Failed to read HTD file ({e}). Please check the file encoding."
+            )
+            return
 
         # Check if required values were extracted
         for key in ["x_wells", "y_wells"]:
-            if plate_info[key] is None:
+            if not isinstance(getattr(htd_info, key), int):
                 self.warning_occurred = True
                 self.warning_messages.append(f"Failed to extract {key} from HTD file.")
 
-        return plate_info
+        # Validate dimensions against expected values
+        self._validate_plate_dimensions(htd_info)
 
-    def _validate_plate_dimensions(self, plate_info):
+    def _validate_plate_dimensions(self, htd_info):
         """Validate that plate dimensions match expected values."""
-        x_wells = plate_info.get("x_wells")
-        y_wells = plate_info.get("y_wells")
+        x_wells = htd_info.x_wells if isinstance(htd_info.x_wells, int) else None
+        y_wells = htd_info.y_wells if isinstance(htd_info.y_wells, int) else None
 
         # Use default values if necessary
         expected_cols = self.well_col or 12
@@ -482,7 +468,80 @@ class WrmXpressGui:
                 f"the number of rows selected ({expected_rows})."
             )
 
-    def validate(self):
+    def get_selected_pipelines(self):
+        """Return the selected pipeline and the enabled diagnostics."""
+        pipelines = [self.pipeline_selection] if self.pipeline_selection else []
+        for name, diagnostic in [
+            ("static_dx", self.static_dx),
+            ("video_dx", self.video_dx),
+        ]:
+            if (
+                diagnostic is not None
+                and len(diagnostic) == 1
+                and eval_bool(diagnostic[0])
+            ):
+                pipelines.append(name)
+        return pipelines
+
+    def validate_disk_space(self):
+        """
+        Preflight check: estimate the space the run needs on the volume (staged
+        input plus work/output) and the staging time, and compare with the free space.
+        Collecting the staging jobs stats every input file and the staging time
+        reads the source, so this only runs as the preflight of a run.
+        """
+        try:
+            estimate = estimate_run(
+                self.mounted_volume,
+                self.plate_name,
+                self.well_selection_list,
+                self.file_structure,
+                self.get_selected_pipelines(),
+                measure_throughput=True,
+            )
+        except Exception as e:
+            self.warning_occurred = True
+            self.warning_messages.append(
+                f"Could not estimate the disk space needed: {e}"
+            )
+            return
+
+        needed = estimate["needed_bytes"]
+        free = estimate["free_bytes"]
+        details = (
+            f"{format_size(estimate['stage_space'])} of staged input and about "
+            f"{format_size(estimate['output_bytes'])} of work/output files"
+        )
+        if needed > free:
+            self.error_occurred = True
+            self.error_messages.append(
+                f"Not enough free space on the volume: the run needs about {format_size(needed)} "
+                f"({details}, with a safety margin) but only {format_size(free)} is free."
+            )
+        elif free - needed < PREFLIGHT_MIN_FREE_FRACTION * estimate["total_bytes"]:
+            self.warning_occurred = True
+            self.warning_messages.append(
+                f"The volume is almost full: the run needs about {format_size(needed)} ({details}) "
+                f"and will leave {format_size(free - needed)} of {format_size(estimate['total_bytes'])} free."
+            )
+
+        staging_seconds = estimate["staging_seconds"]
+        if staging_seconds and staging_seconds > PREFLIGHT_REPORT_STAGING_SECONDS:
+            self.warning_occurred = True
+            self.warning_messages.append(
+                f"Staging will copy {format_size(estimate['stage_space'])} at about "
+                f"{format_size(estimate['throughput'])}/s (measured on the source), "
+                f"which should take about {staging_seconds / 60:.0f} min."
+            )
+
+    def validate(self, preflight=False):
+        """
+        This function validates the configuration and returns (error occurred,
+        error messages, warning occurred, warning messages). `preflight` is only
+        set by the run callback, which also checks the disk space and staging
+        time of the whole plate (see validate_disk_space); configure and preview
+        validation skip it.
+        """
         self.validate_volume()
         self.validate_platename()
         self.validate_platename_in_volume()
@@ -504,6 +563,10 @@ class WrmXpressGui:
             elif self.file_structure == "avi":
                 self.validate_avi_mode()
 
+        # Only worth estimating once the plate and wells are known to be valid
+        if preflight and not self.error_occurred:
+            self.validate_disk_space()
+
         return (
             self.error_occurred,
             self.error_messages,
@@ -809,9 +872,23 @@ class WrmXpressGui:
     def get_wavelengths_from_files(self, params):
         plate_folder = Path(self.mounted_volume, self.plate_name)
 
+        # The HTD file lists the acquired wavelengths; fall back to the file names
+        htd_file = find_htd_file(plate_folder, self.plate_name.split("_", 1)[0])
+        if htd_file is not None:
+            try:
+                wavelengths = read_htd(htd_file).wavelength_ids
+            except (OSError, ValueError):
+                wavelengths = []
+            if wavelengths:
+                for i, wavelength in enumerate(wavelengths):
+                    params[f"wavelength_{i + 1}"] = wavelength
+                return params
+
+        plate_index = get_plate_index(plate_folder)
+
         # Find the first folder containing "TimePoint_"
         timepoint_folders = [
-            folder for folder in plate_folder.iterdir() if "TimePoint_" in folder.name
+            folder for folder in plate_index.timepoints if "TimePoint_" in folder
         ]
         if not timepoint_folders:
             raise FileNotFoundError(
@@ -820,15 +897,8 @@ class WrmXpressGui:
 
         first_folder = timepoint_folders[0]
 
-        # Find all files in the first folder
-        all_files = list(first_folder.glob("*"))
-
         # Extract unique wavelengths from filenames
-        wavelengths = {
-            file.stem.split("_")[-1]
-            for file in all_files
-            if "w" in file.stem.split("_")[-1]  # Ensure the part contains 'w'
-        }
+        wavelengths = plate_index.wavelengths(timepoint=first_folder)
 
         # add wavelengths to params for each wavelength have a key where its wavelength_{number} with the value of the w{number}
         for i, wavelength in enumerate(wavelengths):
@@ -926,12 +996,20 @@ class WrmXpressGui:
             wells=wells_to_process,
             platename=self.plate_name,
             file_structure=self.file_structure,
+            staging_strategy=(
+                preview_staging_strategy(
+                    self.get_selected_pipelines(), self.file_structure
+                )
+                if first_well
+                else STAGING_STRATEGY
+            ),
         )
 
     def clean_and_create_directories(self, input_path, work_path, output_path=None):
         """
         Cleans and creates the input, work, and optionally output directories.
         Deletes existing contents and recreates the directories as needed.
+        Old trees are renamed to the trash and deleted in the background.
         """
         # Ensure the paths are Path objects
         input_path = Path(input_path)
@@ -939,23 +1017,16 @@ class WrmXpressGui:
         output_path = Path(output_path) if output_path else None
 
         # Clean and create the work directory
-        if work_path.exists():
-            shutil.rmtree(work_path)
+        trash_reaper.move_to_trash(work_path)
         work_path.mkdir(parents=True, exist_ok=True)
 
-        # Clean and create the input directory
-        if input_path.exists():
-            shutil.rmtree(input_path)
-        input_path.mkdir(parents=True, exist_ok=True)
+        # Clean and create the input directory (keeping files the staging manifest accounts for)
+        clean_input_directory(input_path)
 
         # Clean and create the output directory, if specified
         if output_path:
             if output_path.exists():
-                for item in output_path.iterdir():
-                    if item.is_file() or item.is_symlink():
-                        item.unlink()
-                    elif item.is_dir():
-                        shutil.rmtree(item)
+                trash_reaper.empty_into_trash(output_path)
             else:
                 output_path.mkdir(parents=True, exist_ok=True)
 
@@ -0,0 +1,50 @@
+# In[1]: Imports
+
+import subprocess
+
+# In[2]: Settings
+
+WRMXPRESS_WRAPPER = "/root/wrmXpress/wrapper.py"
+
+# In[3]: Helper functions
+
+
+def wrmxpress_command(volume, platename):
+    """
+    This function returns the command that runs wrmXpress on a configured plate
+    (<volume>/<platename>.yml, split for subprocess) and the message that shows
+    it on the run page.
+    """
+    command = [
+        "python",
+        "-u",
+        WRMXPRESS_WRAPPER,
+        f"{volume}/{platename}.yml",
+        platename,
+    ]
+    command_message = f"```python {WRMXPRESS_WRAPPER} {platename}.yml {platename}```"
+    return command, command_message
+
+
+def run_wrmxpress(command, log_path, on_line=None):
+    """
+    This function runs wrmXpress, writing its output line by line to `log_path`
+    (flushed, so the run can be followed from the file, see run_stream.py) and
+    calling `on_line(line)` after each line is written. Returns the exit code.
+    """
+    with open(log_path, "w") as log_file:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        try:
+            for line in iter(process.stdout.readline, ""):
+                log_file.write(line)
+                log_file.flush()
+                if on_line:
+                    on_line(line)
+        finally:
+            process.stdout.close()
+        return process.wait()
@@ -0,0 +1,66 @@
+// Clientside callbacks for the live plate montage (see app/utils/plate_montage.py).
+// The server only pushes the recently changed well tiles (and the base figure
+// at the start of a run); they are merged into the figure already in the browser.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    montage: {
+        merge_tiles: function (update, figure) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!update || !update.run) {
+                return noUpdate;
+            }
+
+            const current =
+                figure && figure.layout && figure.layout.meta && figure.layout.meta.montage;
+            const fresh = !current || current.run !== update.run;
+            if (fresh && !update.base) {
+                return noUpdate;
+            }
+
+            const base = fresh ? update.base : figure;
+            const images = fresh ? [] : (base.layout.images || []).slice();
+            const versions = fresh ? {} : Object.assign({}, current.versions);
+
+            let changed = fresh;
+            (update.tiles || []).forEach(function (tile) {
+                if ((versions[tile.name] || 0) >= tile.version) {
+                    return;
+                }
+                const image = {
+                    name: tile.name,
+                    source: tile.source,
+                    xref: "x",
+                    yref: "y",
+                    x: tile.x,
+                    y: tile.y,
+                    sizex: 1,
+                    sizey: 1,
+                    xanchor: "left",
+                    yanchor: "top",
+                    sizing: "contain",
+                    layer: "above",
+                };
+                const index = images.findIndex(function (other) {
+                    return other.name === tile.name;
+                });
+                if (index >= 0) {
+                    images[index] = image;
+                } else {
+                    images.push(image);
+                }
+                versions[tile.name] = tile.version;
+                changed = true;
+            });
+
+            if (!changed) {
+                return noUpdate;
+            }
+
+            const layout = Object.assign({}, base.layout, {
+                images: images,
+                meta: { montage: { run: update.run, versions: versions } },
+            });
+            return Object.assign({}, base, { layout: layout });
+        },
+    },
+});
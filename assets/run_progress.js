@@ -0,0 +1,102 @@
+// Clientside callbacks for the run progress stream (see app/utils/run_progress.py).
+// Progress updates only carry the recent log lines, numbered by their sequence
+// in the run, and, when it changed, the preview figure; they are merged into
+// what the browser already shows.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    progress: {
+        merge_update: function (update, state) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!update || !update.run) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+
+            const fresh = !state || state.run !== update.run;
+            const lines = fresh ? [] : state.lines.slice();
+            const seq = fresh ? 0 : state.seq;
+            const imageVersion = fresh ? 0 : state.image_version;
+
+            // Append the lines after the last sequence number shown (updates may
+            // overlap). If updates were missed the gap is skipped; the final
+            // result replaces the log with the lines kept by the server.
+            const offset = Math.max(seq + 1 - update.start, 0);
+            let changed = fresh;
+            if (offset < update.lines.length) {
+                Array.prototype.push.apply(lines, update.lines.slice(offset));
+                changed = true;
+            }
+            // Keep as many lines as the server does (the full log is on disk)
+            if (update.keep && lines.length > update.keep) {
+                lines.splice(0, lines.length - update.keep);
+            }
+
+            let figure = noUpdate;
+            let version = imageVersion;
+            if (update.image && update.image.version > imageVersion) {
+                figure = JSON.parse(update.image.figure);
+                version = update.image.version;
+                changed = true;
+            }
+
+            if (!changed) {
+                return [noUpdate, noUpdate, noUpdate];
+            }
+
+            return [
+                {
+                    run: update.run,
+                    lines: lines,
+                    seq: Math.max(seq, update.seq),
+                    image_version: version,
+                },
+                "```" + lines.join("") + "```",
+                figure,
+            ];
+        },
+
+        // Open the Server-Sent Events stream of a run (one per page) when its
+        // first progress update arrives. Log deltas are fed into the same store
+        // as polled updates (merge_update skips lines it has already shown) and
+        // well events move the progress bar without waiting for the next poll.
+        open_stream: function (update, streamedRun) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!update || !update.run || update.run === streamedRun) {
+                return noUpdate;
+            }
+            if (!window.EventSource) {
+                return noUpdate;
+            }
+
+            const setProps = window.dash_clientside.set_props;
+            if (window.wrmXpressRunStream) {
+                window.wrmXpressRunStream.close();
+            }
+            const source = new EventSource("/run-stream/" + update.run);
+            window.wrmXpressRunStream = source;
+
+            source.addEventListener("log", function (message) {
+                setProps("run-progress-update", {data: JSON.parse(message.data)});
+            });
+            source.addEventListener("progress", function (message) {
+                const event = JSON.parse(message.data);
+                if (event.kind === "well_started") {
+                    setProps("progress-bar-run-page", {
+                        value: event.current,
+                        max: event.total,
+                    });
+                }
+            });
+            source.addEventListener("end", function () {
+                source.close();
+            });
+            // Unknown run or too many streams: polled updates still arrive
+            source.onerror = function () {
+                if (source.readyState === EventSource.CLOSED) {
+                    source.close();
+                }
+            };
+
+            return update.run;
+        },
+    },
+});
@@ -0,0 +1,97 @@
+// Clientside callbacks for the tiled image viewer (see app/utils/tile_pyramid.py).
+// On every zoom/pan the tiles covering the visible range are requested at the
+// pyramid level closest to the screen resolution.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    tiles: {
+        update_tiles: function (relayoutData, figure) {
+            const noUpdate = window.dash_clientside.no_update;
+            if (!figure || !figure.layout || !figure.layout.meta || !figure.layout.meta.tiles) {
+                return noUpdate;
+            }
+
+            const tiles = figure.layout.meta.tiles;
+            const xaxis = figure.layout.xaxis || {};
+            const yaxis = figure.layout.yaxis || {};
+
+            // Visible range in source pixels, from the relayout event or the current layout
+            let xRange = xaxis.range || [0, tiles.width];
+            let yRange = yaxis.range || [tiles.height, 0];
+            if (relayoutData) {
+                if (relayoutData["xaxis.autorange"] || relayoutData["autosize"]) {
+                    xRange = [0, tiles.width];
+                    yRange = [tiles.height, 0];
+                }
+                if ("xaxis.range[0]" in relayoutData) {
+                    xRange = [relayoutData["xaxis.range[0]"], relayoutData["xaxis.range[1]"]];
+                } else if (relayoutData["xaxis.range"]) {
+                    xRange = relayoutData["xaxis.range"];
+                }
+                if ("yaxis.range[0]" in relayoutData) {
+                    yRange = [relayoutData["yaxis.range[0]"], relayoutData["yaxis.range[1]"]];
+                } else if (relayoutData["yaxis.range"]) {
+                    yRange = relayoutData["yaxis.range"];
+                }
+            }
+
+            const x0 = Math.max(0, Math.min(xRange[0], xRange[1]));
+            const x1 = Math.min(tiles.width, Math.max(xRange[0], xRange[1]));
+            const y0 = Math.max(0, Math.min(yRange[0], yRange[1]));
+            const y1 = Math.min(tiles.height, Math.max(yRange[0], yRange[1]));
+            if (x1 <= x0 || y1 <= y0) {
+                return noUpdate;
+            }
+
+            // Pick the level where one tile pixel is about one screen pixel
+            const graph = document.getElementById(tiles.graph_id);
+            const screenWidth = (graph && graph.offsetWidth) || 1000;
+            const sourcePerScreenPixel = (x1 - x0) / screenWidth;
+            const level = Math.min(
+                tiles.levels - 1,
+                Math.max(0, Math.floor(Math.log2(Math.max(sourcePerScreenPixel, 1))))
+            );
+            const span = tiles.tile_size * Math.pow(2, level);
+
+            const firstColumn = Math.floor(x0 / span);
+            const lastColumn = Math.floor((x1 - 1) / span);
+            const firstRow = Math.floor(y0 / span);
+            const lastRow = Math.floor((y1 - 1) / span);
+
+            const key = [level, firstColumn, lastColumn, firstRow, lastRow].join(":");
+            if (key === tiles.key) {
+                return noUpdate;
+            }
+
+            const images = [];
+            for (let column = firstColumn; column <= lastColumn; column++) {
+                for (let row = firstRow; row <= lastRow; row++) {
+                    const x = column * span;
+                    const y = row * span;
+                    images.push({
+                        source: `${tiles.url}/${level}/${column}/${row}.png`,
+                        xref: "x",
+                        yref: "y",
+                        x: x,
+                        y: y,
+                        sizex: Math.min(span, tiles.width - x),
+                        sizey: Math.min(span, tiles.height - y),
+                        xanchor: "left",
+                        yanchor: "top",
+                        sizing: "stretch",
+                        layer: "below",
+                    });
+                }
+            }
+
+            const layout = Object.assign({}, figure.layout, {
+                images: images,
+                meta: Object.assign({}, figure.layout.meta, {
+                    tiles: Object.assign({}, tiles, { key: key }),
+                }),
+                xaxis: Object.assign({}, xaxis, { range: [x0, x1] }),
+                yaxis: Object.assign({}, yaxis, { range: [y1, y0] }),
+            });
+            return Object.assign({}, figure, { layout: layout });
+        },
+    },
+});
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from app.utils.htd import parse_htd_text, read_htd
+
+HTD_TEXT = """"HTSInfoFile", Version 1.0
+"Description", "Example plate"
+"PlateType", 6
+"TimePoints", 2
+"ZSteps", 1
+"XWells", 3
+"YWells", 2
+"WellsSelection1", TRUE, FALSE, TRUE
+"WellsSelection2", FALSE, TRUE, FALSE
+"Sites", TRUE
+"XSites", 2
+"YSites", 2
+"SiteSelection1", TRUE, TRUE
+"SiteSelection2", TRUE, FALSE
+"Waves", TRUE
+"NWavelengths", 2
+"WaveName1", "TL-20"
+"WaveCollect1", 1
+"WaveName2", "GFP"
+"WaveCollect2", 0
+"UniquePlateIdentifier", "ABC"
+"EndFile"
+"""
+
+
+def test_parse_plate_layout():
+    htd = parse_htd_text(HTD_TEXT)
+
+    assert htd.description == "Example plate"
+    assert (htd.x_wells, htd.y_wells, htd.time_points) == (3, 2, 2)
+    assert htd.selected_wells == ["A01", "A03", "B02"]
+    assert htd.n_sites == 3
+    assert [wavelength.name for wavelength in htd.wavelengths] == ["TL-20", "GFP"]
+    assert htd.wavelength_ids == ["w1"]
+    assert htd.expected_files_per_well() == 3
+    assert htd.expected_file_count() == 3 * 2 * 3
+    assert htd.expected_file_count(wells=["A01"]) == 2 * 3
+    assert htd.get("UniquePlateIdentifier") == ("ABC",)
+    assert htd.get("Missing") is None
+
+
+def test_defaults_without_sites_and_waves():
+    htd = parse_htd_text('"XWells", 12\n"YWells", 8\n')
+
+    assert htd.n_sites == 1
+    assert htd.wavelength_ids == []
+    assert htd.selected_wells == []
+    assert htd.expected_files_per_well() == 1
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16", "iso-8859-1"])
+def test_read_htd_encodings(tmp_path, encoding):
+    htd_path = tmp_path / "PLATE.HTD"
+    htd_path.write_text(HTD_TEXT.replace("Example", "Exämple"), encoding=encoding)
+
+    htd = read_htd(htd_path)
+
+    assert htd.description == "Exämple plate"
+    assert htd.path == str(htd_path)
+
+
+def test_read_htd_is_reparsed_when_the_file_changes(tmp_path):
+    htd_path = tmp_path / "PLATE.HTD"
+    htd_path.write_text(HTD_TEXT)
+    first = read_htd(htd_path)
+
+    assert read_htd(htd_path) is first
+
+    htd_path.write_text(HTD_TEXT.replace('"TimePoints", 2', '"TimePoints", 5'))
+    os.utime(htd_path, ns=(0, os.stat(htd_path).st_mtime_ns + 1))
+
+    assert read_htd(htd_path).time_points == 5
+
+
+def test_read_htd_missing_file(tmp_path):
+    with pytest.raises(OSError):
+        read_htd(tmp_path / "missing.HTD")
@@ -0,0 +1,67 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from app.utils.image_cache import ImageCache
+
+
+def make_entry(nbytes):
+    return np.zeros(nbytes, dtype=np.uint8), "{}"
+
+
+def test_put_and_get_figure(tmp_path):
+    img_path = tmp_path / "A01.TIF"
+    img_path.write_bytes(b"image")
+    cache = ImageCache()
+    key = cache.make_key(img_path, "jpeg", 90)
+
+    cache.put(key, np.zeros(4, dtype=np.uint8), go.Figure())
+
+    assert isinstance(cache.get_figure(key), go.Figure)
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_changes_when_file_is_rewritten(tmp_path):
+    img_path = tmp_path / "A01.TIF"
+    img_path.write_bytes(b"image")
+    key = ImageCache.make_key(img_path)
+
+    img_path.write_bytes(b"rewritten image")
+
+    assert ImageCache.make_key(img_path) != key
+    assert ImageCache.make_key(tmp_path / "missing.TIF") is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ImageCache(max_bytes=300)
+    cache.put("a", *make_entry(98))
+    cache.put("b", *make_entry(98))
+    cache.put("c", *make_entry(98))
+
+    # "a" is used again, so "b" is the least recently used entry
+    assert cache.get("a") is not None
+    cache.put("d", *make_entry(98))
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ["a", "c", "d"])
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 300
+
+
+def test_entries_larger_than_the_budget_are_not_cached():
+    cache = ImageCache(max_bytes=100)
+    cache.put("a", *make_entry(50))
+    cache.put("big", *make_entry(200))
+
+    assert cache.get("big") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 0
+
+
+def test_replacing_an_entry_keeps_the_size_accounting():
+    cache = ImageCache(max_bytes=1000)
+    cache.put("a", *make_entry(98))
+    cache.put("a", *make_entry(198))
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 200
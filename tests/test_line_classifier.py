@@ -0,0 +1,76 @@
+import pytest
+
+from app.utils.line_classifier import LineClassifier
+
+WELLS = ["A01", "A02", "B01"]
+
+
+@pytest.fixture
+def classifier():
+    return LineClassifier(WELLS)
+
+
+def test_well_progress(classifier):
+    event = classifier.classify("A02 2/3\n")
+
+    assert event.kind == "well_progress"
+    assert (event.well, event.current, event.total) == ("A02", 2, 3)
+    assert event.well_count == 1
+
+
+def test_unselected_well_is_not_progress(classifier):
+    assert classifier.classify("C05 1/3\n").kind is None
+
+
+def test_cellprofiler_image(classifier):
+    event = classifier.classify("Mon Jan 1 Image # 12, module Threshold # 3\n")
+
+    assert event.kind == "image"
+    assert event.image_number == 12
+
+
+@pytest.mark.parametrize(
+    "line, well",
+    [("Tracking well B01.TIF\n", "B01"), ("Running well A01\n", "A01")],
+)
+def test_tracking(classifier, line, well):
+    event = classifier.classify(line)
+
+    assert event.kind == "tracking"
+    assert event.well == well
+
+
+def test_reconfiguring(classifier):
+    assert classifier.classify("Reconfiguring A01.avi\n").kind == "reconfiguring"
+
+
+def test_info_progress(classifier):
+    event = classifier.classify("[INFO] 45%|####    | 9/20 [00:03<00:04]\n")
+
+    assert event.kind == "info_progress"
+    assert (event.current, event.total) == (9, 20)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "Traceback (most recent call last):\n",
+        "[ERROR] could not read A01\n",
+        "ValueError: invalid literal\n",
+        "  FileNotFoundError: missing\n",
+    ],
+)
+def test_errors(classifier, line):
+    assert classifier.classify(line).kind == "error"
+
+
+@pytest.mark.parametrize(
+    "line",
+    ["Loading model\n", "errors: 0\n", "No Error Found in the run log\n", "\n"],
+)
+def test_other_lines(classifier, line):
+    assert classifier.classify(line).kind is None
+
+
+def test_count_wells(classifier):
+    assert classifier.count_wells("A01 and A02, not A03 or A011\n") == 2
@@ -0,0 +1,50 @@
+import dash
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.utils.plate_montage import PlateMontage
+
+
+@pytest.fixture
+def img_path(tmp_path):
+    img_path = tmp_path / "A01.png"
+    Image.fromarray(np.arange(2500, dtype=np.uint8).reshape(50, 50)).save(img_path)
+    return img_path
+
+
+def test_update_sends_only_new_tiles(img_path):
+    montage = PlateMontage(2, 3, resend_seconds=0)
+
+    first = montage.update()
+    assert "base" in first
+    assert first["tiles"] == []
+    assert montage.update() is dash.no_update
+
+    montage.add_well("A01", img_path)
+    montage.add_well("B03", img_path)
+    second = montage.update()
+    assert "base" not in second
+    assert [(tile["name"], tile["x"], tile["y"]) for tile in second["tiles"]] == [
+        ("A01", 0, 0),
+        ("B03", 2, 1),
+    ]
+    assert montage.update() is dash.no_update
+
+
+def test_update_resends_recent_changes(img_path):
+    montage = PlateMontage(2, 3)
+    montage.add_well("A01", img_path)
+    montage.update()
+
+    payload = montage.update()
+
+    assert "base" in payload
+    assert [tile["name"] for tile in payload["tiles"]] == ["A01"]
+
+
+def test_wells_outside_the_plate_are_ignored(img_path):
+    montage = PlateMontage(2, 3)
+
+    assert not montage.add_well("C01", img_path)
+    assert not montage.add_well("not a well", img_path)
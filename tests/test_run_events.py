@@ -0,0 +1,113 @@
+from app.utils.run_events import (
+    RunEta,
+    RunEvent,
+    RunEventParser,
+    RunEventStream,
+    events_path,
+    read_events,
+)
+
+WELLS = ["A01", "A02"]
+
+OUTPUT = [
+    "Loading configuration\n",
+    "A01 1/2\n",
+    "Image # 1, module Threshold # 3\n",
+    "A02 2/2\n",
+    "ValueError: something went wrong\n",
+]
+
+
+def kinds(events):
+    return [event.kind for event in events]
+
+
+def test_parser_events():
+    parser = RunEventParser(WELLS)
+    events = parser.start()
+    for seq, line in enumerate(OUTPUT, start=1):
+        events += parser.parse(line, seq)
+    events += parser.finish(0)
+
+    # A change of stage finishes the running well
+    assert kinds(events) == [
+        "run_started",
+        "stage_started",
+        "well_started",
+        "well_finished",
+        "stage_started",
+        "image",
+        "stage_started",
+        "well_started",
+        "error",
+        "well_finished",
+        "run_finished",
+    ]
+    assert [event.id for event in events] == list(range(1, 12))
+    assert events[0].total == 2
+    assert (events[2].well, events[2].current, events[2].total) == ("A01", 1, 2)
+    assert events[2].line == 2
+    assert (events[3].well, events[3].line) == ("A01", 3)
+    assert events[5].image_number == 1
+    assert events[8].message == "ValueError: something went wrong"
+    assert events[9].well == "A02"
+    assert events[10].message == "0"
+
+
+def test_well_finishes_when_the_next_well_starts():
+    parser = RunEventParser(WELLS)
+    events = parser.parse("Tracking well A01.TIF\n", 1)
+    events += parser.parse("Tracking well A02.TIF\n", 2)
+
+    assert kinds(events) == [
+        "stage_started",
+        "well_started",
+        "well_finished",
+        "well_started",
+    ]
+    assert events[2].well == "A01"
+    assert events[3].current == 2
+
+
+def test_failed_run_does_not_finish_the_running_well():
+    parser = RunEventParser(WELLS)
+    parser.parse("A01 1/2\n")
+
+    assert kinds(parser.finish(1)) == ["run_finished"]
+
+
+def test_event_to_dict_skips_unset_fields():
+    event = RunEvent(1, "run_started", 10.0, total=2)
+
+    assert event.to_dict() == {"id": 1, "kind": "run_started", "time": 10.0, "total": 2}
+
+
+def test_event_stream_writes_and_shares_events(tmp_path):
+    log_path = tmp_path / "PLATE_run.log"
+    received = []
+
+    with RunEventStream(events_path(log_path), WELLS) as stream:
+        stream.subscribe(received.append)
+        stream.start()
+        for seq, line in enumerate(OUTPUT, start=1):
+            stream.feed(line, seq)
+        stream.finish(0)
+        late = stream.since(9)
+
+    assert events_path(log_path) == tmp_path / "PLATE_run.events.jsonl"
+    assert read_events(stream.path) == received
+    assert kinds(late) == ["well_finished", "run_finished"]
+
+
+def test_eta_from_finished_wells():
+    eta = RunEta(4)
+
+    assert eta.seconds_left() is None
+
+    eta(RunEvent(1, "well_started", 0.0, well="A01"))
+    eta(RunEvent(2, "well_finished", 10.0, well="A01"))
+    eta(RunEvent(3, "well_started", 10.0, well="A02"))
+    eta(RunEvent(4, "well_finished", 30.0, well="A02"))
+
+    assert eta.finished == 2
+    assert eta.seconds_left() == 30.0
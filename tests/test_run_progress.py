@@ -0,0 +1,112 @@
+import threading
+import time
+
+from app.utils.run_progress import ProgressPublisher, ProgressStream, RunLog
+
+
+def test_run_log_sequence_numbers():
+    log = RunLog(max_lines=3)
+
+    assert [log.append(f"line {i}\n") for i in range(1, 6)] == [1, 2, 3, 4, 5]
+    assert log.seq == 5
+    assert log.first_seq == 3
+    assert log.dropped == 2
+    assert log.since(3) == (4, ["line 4\n", "line 5\n"])
+    assert log.since(5) == (6, [])
+    # Lines dropped from memory are not returned again
+    assert log.since(0) == (3, ["line 3\n", "line 4\n", "line 5\n"])
+
+
+def test_run_log_char_budget_keeps_the_last_line():
+    log = RunLog(max_lines=10, max_chars=10)
+    log.append("12345\n")
+    log.append("a much longer line\n")
+
+    assert log.first_seq == 2
+    assert log.text() == "[1 earlier lines not shown]\na much longer line\n"
+
+
+def test_empty_run_log():
+    log = RunLog()
+
+    assert log.first_seq == 1
+    assert log.since(0) == (1, [])
+    assert log.text() == ""
+
+
+def test_progress_stream_sends_new_lines_once():
+    stream = ProgressStream(resend_seconds=0, run="run")
+    stream.add_line("a\n")
+    stream.add_line("b\n")
+
+    first = stream.update()
+    assert (first["run"], first["start"], first["seq"]) == ("run", 1, 2)
+    assert first["lines"] == ["a\n", "b\n"]
+
+    stream.add_line("c\n")
+    second = stream.update()
+    assert (second["start"], second["seq"], second["lines"]) == (3, 3, ["c\n"])
+
+    third = stream.update()
+    assert (third["start"], third["seq"], third["lines"]) == (4, 3, [])
+
+
+def test_progress_stream_resends_recent_lines():
+    stream = ProgressStream(resend_seconds=60)
+    stream.add_line("a\n")
+    stream.update()
+    stream.add_line("b\n")
+
+    payload = stream.update()
+
+    assert payload["start"] == 1
+    assert payload["seq"] == 2
+    assert payload["lines"] == ["a\n", "b\n"]
+
+
+def test_progress_stream_sends_changed_images():
+    stream = ProgressStream(resend_seconds=0)
+
+    assert "image" not in stream.update()
+
+    stream.set_image("{}")
+    assert stream.update()["image"] == {"version": 1, "figure": "{}"}
+    assert "image" not in stream.update()
+
+
+def test_publisher_coalesces_updates_within_the_window():
+    published = []
+    publisher = ProgressPublisher(published.append, min_interval=60)
+
+    publisher.publish(lambda: 1)
+    publisher.publish(lambda: 2)
+    publisher.publish(lambda: 3)
+    publisher(4)
+
+    assert published == [1, 4]
+    assert publisher.stats() == {"published": 2, "dropped": 2}
+
+    publisher.publish(lambda: 5)
+    publisher.flush()
+    publisher.flush()
+    assert published == [1, 4, 5]
+
+
+def test_publisher_sends_the_held_update_after_the_window():
+    published = []
+    sent = threading.Event()
+
+    def set_progress(value):
+        published.append(value)
+        if len(published) == 2:
+            sent.set()
+
+    publisher = ProgressPublisher(set_progress, min_interval=0.05)
+    publisher.publish(lambda: "first")
+    start = time.monotonic()
+    publisher.publish(lambda: "held")
+
+    # No further publish or flush: the trailing-edge timer sends it
+    assert sent.wait(timeout=5)
+    assert published == ["first", "held"]
+    assert time.monotonic() - start >= 0.04
@@ -0,0 +1,119 @@
+import errno
+import os
+
+import pytest
+
+from app.utils import staging
+from app.utils.staging import stage_file, stage_files
+
+
+def unsupported(src, dest):
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+def failing(src, dest):
+    raise OSError(errno.EIO, "Input/output error")
+
+
+@pytest.fixture
+def src(tmp_path):
+    src = tmp_path / "source" / "A01.TIF"
+    src.parent.mkdir()
+    src.write_bytes(b"x" * 1024)
+    return src
+
+
+def test_copy(src, tmp_path):
+    dest, used = stage_file(src, tmp_path, "copy")
+
+    assert used == "copy"
+    assert dest == tmp_path / "A01.TIF"
+    assert not dest.is_symlink()
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_hardlink(src, tmp_path):
+    dest, used = stage_file(src, tmp_path, "hardlink")
+
+    assert used == "hardlink"
+    assert os.path.samefile(dest, src)
+
+
+def test_symlink_is_relative(src, tmp_path):
+    dest, used = stage_file(src, tmp_path, "symlink")
+
+    assert used == "symlink"
+    assert not os.path.isabs(os.readlink(dest))
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_hardlink_falls_back_to_reflink_then_copy(src, tmp_path, monkeypatch):
+    monkeypatch.setitem(staging._STAGING_FUNCTIONS, "hardlink", unsupported)
+    monkeypatch.setitem(staging._STAGING_FUNCTIONS, "reflink", unsupported)
+
+    dest, used = stage_file(src, tmp_path, "hardlink")
+
+    assert used == "copy"
+    assert not os.path.samefile(dest, src)
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_symlink_falls_back_to_copy(src, tmp_path, monkeypatch):
+    monkeypatch.setitem(staging._STAGING_FUNCTIONS, "symlink", unsupported)
+
+    dest, used = stage_file(src, tmp_path, "symlink")
+
+    assert used == "copy"
+    assert not dest.is_symlink()
+
+
+def test_real_errors_do_not_fall_back(src, tmp_path, monkeypatch):
+    monkeypatch.setitem(staging._STAGING_FUNCTIONS, "hardlink", failing)
+
+    with pytest.raises(OSError) as excinfo:
+        stage_file(src, tmp_path, "hardlink")
+
+    assert excinfo.value.errno == errno.EIO
+
+
+def test_existing_destination_is_replaced(src, tmp_path):
+    (tmp_path / "A01.TIF").symlink_to(tmp_path / "missing.TIF")
+
+    dest, _ = stage_file(src, tmp_path, "copy")
+
+    assert not dest.is_symlink()
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_unknown_strategy(src, tmp_path):
+    with pytest.raises(ValueError):
+        stage_file(src, tmp_path, "move")
+
+
+def test_stage_files_reports_used_strategies(src, tmp_path, monkeypatch):
+    monkeypatch.setitem(staging._STAGING_FUNCTIONS, "hardlink", unsupported)
+    monkeypatch.setitem(staging._STAGING_FUNCTIONS, "reflink", unsupported)
+    missing = src.with_name("A02.TIF")
+    jobs = [(src, tmp_path / "input"), (missing, tmp_path / "input")]
+    progress = []
+    used_strategies = {}
+
+    failed = stage_files(
+        jobs,
+        "hardlink",
+        progress_callback=lambda *args: progress.append(args),
+        used_strategies=used_strategies,
+    )
+
+    assert failed == [(missing, tmp_path / "input")]
+    assert used_strategies == {(src, tmp_path / "input"): "copy"}
+    assert progress[-1] == (2, 2, 1024, 1024)
+
+
+def test_kernel_copy_stopping_short_raises(src, tmp_path, monkeypatch):
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("os.copy_file_range is not available")
+    monkeypatch.setattr(os, "copy_file_range", lambda *args: 0)
+
+    with pytest.raises(OSError):
+        staging._kernel_copy(src, tmp_path / "A01.TIF")
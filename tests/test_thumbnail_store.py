@@ -0,0 +1,49 @@
+import shutil
+
+import plotly.graph_objects as go
+import plotly.io as pio
+import pytest
+
+from app.utils.thumbnail_store import ThumbnailStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ThumbnailStore(tmp_path / "thumbnails")
+
+
+def test_same_content_shares_a_key(store, tmp_path):
+    src = tmp_path / "A01_w1.TIF"
+    src.write_bytes(bytes(range(256)) * 4096)
+    staged = tmp_path / "input" / "A01_w1.TIF"
+    staged.parent.mkdir()
+    shutil.copy(src, staged)
+
+    assert store.make_key(src, "jpeg") == store.make_key(staged, "jpeg")
+    assert store.make_key(src, "jpeg") != store.make_key(src, "png")
+
+
+def test_same_name_and_size_with_different_content(store, tmp_path):
+    # Uncompressed images of one well at two time points: identical headers,
+    # borders and size, different pixels in the middle
+    data = bytearray(4 * 1024 * 1024)
+    first = tmp_path / "TimePoint_1" / "PLATE_A01_w1.TIF"
+    second = tmp_path / "TimePoint_2" / "PLATE_A01_w1.TIF"
+    first.parent.mkdir()
+    second.parent.mkdir()
+    first.write_bytes(data)
+    data[len(data) // 2] = 1
+    second.write_bytes(data)
+
+    assert store.file_digest(first) != store.file_digest(second)
+
+
+def test_put_and_get_figure(store, tmp_path):
+    img_path = tmp_path / "A01.TIF"
+    img_path.write_bytes(b"image")
+    key = store.make_key(img_path, "jpeg")
+
+    store.put(key, pio.to_json(go.Figure()))
+
+    assert isinstance(store.get_figure(key), go.Figure)
+    assert store.make_key(tmp_path / "missing.TIF") is None
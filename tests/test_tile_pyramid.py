@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import tifffile
+
+from app.utils.contrast import window_limits
+from app.utils.tile_pyramid import TilePyramid, prune_tile_cache
+
+
+def write_image(path):
+    img = np.full((600, 500), 1000, dtype=np.uint16)
+    img[100:200] = 3000
+    img[5, 5] = 65535
+    tifffile.imwrite(path, img)
+    return path
+
+
+def test_window_limits_ignore_hot_pixels():
+    img = np.full((100, 100), 10, dtype=np.uint16)
+    img[50:] = 20
+    img[0, 0] = 65535
+
+    assert window_limits(img) == (10.0, 20.0)
+
+
+def test_window_limits_of_float_images_are_in_image_units():
+    img = np.linspace(-1.0, 1.0, 10000, dtype=np.float32).reshape(100, 100)
+
+    low, high = window_limits(img)
+
+    assert -1.0 <= low < -0.99
+    assert 0.99 < high <= 1.0
+
+
+def test_tiles_use_the_percentile_window(tmp_path):
+    pyramid = TilePyramid(write_image(tmp_path / "A01.tif"), tmp_path / "tiles")
+
+    metadata = pyramid.prepare()
+
+    assert (metadata["low"], metadata["high"]) == (1000.0, 3000.0)
+    assert pyramid.get_tile(0, 0, 0).exists()
+
+
+def test_prune_removes_least_recently_used_pyramids(tmp_path):
+    cache_dir = tmp_path / "tiles"
+    pyramids = []
+    for i in range(3):
+        pyramid = TilePyramid(write_image(tmp_path / f"A0{i}.tif"), cache_dir)
+        pyramid.get_tile(0, 0, 0)
+        os.utime(pyramid.directory / "pyramid.json", (i, i))
+        pyramids.append(pyramid)
+    size = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(pyramids[2].directory)
+        for name in names
+    )
+
+    removed = prune_tile_cache(cache_dir, max_bytes=2 * size, keep=[])
+
+    assert removed == [pyramids[0].token]
+    assert TilePyramid.from_token(pyramids[0].token, cache_dir) is None
+    assert TilePyramid.from_token(pyramids[2].token, cache_dir) is not None
+
+
+def test_prune_keeps_the_pyramids_in_use(tmp_path):
+    cache_dir = tmp_path / "tiles"
+    pyramid = TilePyramid(write_image(tmp_path / "A01.tif"), cache_dir)
+    pyramid.get_tile(0, 0, 0)
+
+    assert prune_tile_cache(cache_dir, max_bytes=0, keep=[pyramid.token]) == []
+    assert pyramid.directory.exists()
@@ -0,0 +1,69 @@
+import errno
+import os
+import time
+
+from app.utils import trash
+from app.utils.trash import TRASH_PREFIX, TrashReaper
+
+
+def wait_until_empty(reaper, timeout=5):
+    deadline = time.monotonic() + timeout
+    while reaper.outstanding() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not reaper.outstanding()
+
+
+def test_move_to_trash(tmp_path):
+    work = tmp_path / "work"
+    (work / "plate").mkdir(parents=True)
+    (work / "plate" / "A01.csv").write_text("x")
+    reaper = TrashReaper()
+
+    reaper.move_to_trash(work)
+
+    assert not work.exists()
+    assert wait_until_empty(reaper)
+    assert os.listdir(tmp_path) == []
+
+
+def test_leftovers_do_not_block_a_new_run(tmp_path):
+    for i in range(4):
+        leftover = tmp_path / f"{TRASH_PREFIX}work-{i}"
+        leftover.mkdir()
+        (leftover / "A01.csv").write_text("x")
+    (tmp_path / "work").mkdir()
+    reaper = TrashReaper(max_outstanding=1)
+    # Hold the reaper back, as if it were still busy with the leftovers
+    with reaper._condition:
+        reaper._scanned.add(tmp_path)
+        reaper._leftovers.update(tmp_path.glob(f"{TRASH_PREFIX}*"))
+        reaper._pending.extend(sorted(reaper._leftovers))
+
+    start = time.monotonic()
+    reaper.move_to_trash(tmp_path / "work")
+
+    assert time.monotonic() - start < 1
+    assert not (tmp_path / "work").exists()
+    assert wait_until_empty(reaper)
+
+
+def test_empty_into_trash_deletes_what_cannot_be_moved(tmp_path, monkeypatch):
+    output = tmp_path / "output"
+    output.mkdir()
+    (output / "kept.csv").write_text("x")
+    (output / "locked.csv").write_text("x")
+    rename = os.rename
+
+    def failing_rename(src, dest):
+        if str(src).endswith("locked.csv"):
+            raise OSError(errno.EBUSY, "Device or resource busy")
+        rename(src, dest)
+
+    monkeypatch.setattr(trash.os, "rename", failing_rename)
+    reaper = TrashReaper()
+
+    reaper.empty_into_trash(output)
+
+    assert output.is_dir()
+    assert os.listdir(output) == []
+    assert wait_until_empty(reaper)